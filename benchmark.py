@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Outreach Pipeline Benchmark Suite
+Runs the drafting, campaign and copy-generation paths end to end against an
+in-process fake Gmail service and records throughput, latency and memory.
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from business_intelligence import BusinessIntelligence
+from business_types import BUSINESS_TYPES
+from email_templates import EMAIL_TEMPLATES, customize_template
+from email_validation import EmailValidator
+from gmail_sender import GmailSender
+from integrated_outreach import IntegratedOutreach, create_full_campaign
+from outreach_campaign import create_campaign_drafts
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_OUTPUT = 'bench_results.json'
+# Mailbox address the fake Gmail service reports for its profile
+FAKE_ACCOUNT = 'bench@example.com'
+
+# One prospect-file category per business type (its primary one, as filed in
+# the registry), so synthetic prospects cover every registered type
+CATEGORY_TYPES = {business_type.categories[0]: key for key, business_type in BUSINESS_TYPES.items()}
+
+SYNTHETIC_LOCATIONS = [
+    "San Francisco, CA", "New York, NY", "Brooklyn, NY", "Los Angeles, CA",
+    "Portland, OR", "Austin, TX", "Denver, CO", "Seattle, WA", "Asheville, NC"
+]
+
+SYNTHETIC_NOTES = [
+    "Small batch production, no current tours",
+    "Open kitchen, visible process, no structured experiences",
+    "Family-owned, traditional methods, no visitor programs yet",
+    "Already offers occasional classes"
+]
+
+
+class FakeGmailError(Exception):
+    """Error raised by the fake Gmail service to simulate API failures."""
+
+
+class _FakeRequest:
+    def __init__(self, service, response: Callable[[], dict]):
+        self._service = service
+        self._response = response
+
+    def execute(self) -> dict:
+        return self._service._execute(self._response)
+
+
+class _FakeResource:
+    def __init__(self, service, kind: str):
+        self._service = service
+        self._kind = kind
+
+    def create(self, userId: str, body: dict) -> _FakeRequest:
+        return _FakeRequest(self._service, lambda: self._service._store(self._kind, body))
+
+    def send(self, userId: str, body: dict) -> _FakeRequest:
+        if self._kind == 'drafts':
+            # Sending a draft removes it from the drafts folder, as in Gmail
+            return _FakeRequest(self._service, lambda: self._service._send_draft(body['id']))
+        return _FakeRequest(self._service, lambda: self._service._store('messages', body))
+
+    def list(self, userId: str, maxResults: int = 100, pageToken: Optional[str] = None) -> _FakeRequest:
+        return _FakeRequest(self._service, lambda: self._service._list(self._kind, maxResults, pageToken))
+
+    def delete(self, userId: str, id: str) -> _FakeRequest:
+        return _FakeRequest(self._service, lambda: self._service._delete(self._kind, id))
+
+
+class _FakeProfileRequest:
+    def execute(self) -> dict:
+        return {'emailAddress': FAKE_ACCOUNT}
+
+
+class _FakeUsers:
+    def __init__(self, service):
+        self._service = service
+
+    def getProfile(self, userId: str) -> _FakeProfileRequest:
+        # Looked up once per sender, outside the timed per-draft requests
+        return _FakeProfileRequest()
+
+    def drafts(self) -> _FakeResource:
+        return _FakeResource(self._service, 'drafts')
+
+    def messages(self) -> _FakeResource:
+        return _FakeResource(self._service, 'messages')
+
+
+class FakeGmailService:
+    """In-process stand-in for the Gmail API client.
+
+    Mirrors the ``service.users().drafts().create(...).execute()`` call chain
+    used by GmailSender, sleeping ``latency`` seconds per request (plus up to
+    ``jitter`` seconds) and failing a ``error_rate`` fraction of requests.
+
+    Each request's duration is kept in ``latencies``. With ``stats_path`` it
+    is also appended there as a JSON line, so a service living in a worker
+    process can report back to the parent (see read_worker_stats).
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: Optional[int] = None,
+                 stats_path: Optional[str] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.stored = {'drafts': {}, 'messages': {}}
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.stats_path = stats_path
+        self._stats_file = None
+        self._next_id = 0
+
+    def users(self) -> _FakeUsers:
+        return _FakeUsers(self)
+
+    def _store(self, kind: str, body: dict) -> dict:
+        self._next_id += 1
+        item_id = f"fake-{kind[:-1]}-{self._next_id}"
+        self.stored[kind][item_id] = body
+        return {'id': item_id, 'message': {'id': f"fake-msg-{self._next_id}"}}
+
+    def _send_draft(self, draft_id: str) -> dict:
+        if draft_id not in self.stored['drafts']:
+            raise FakeGmailError(f"Draft not found: {draft_id}")
+        return self._store('messages', self.stored['drafts'].pop(draft_id))
+
+    def _list(self, kind: str, page_size: int, page_token: Optional[str]) -> dict:
+        ids = list(self.stored[kind])
+        start = int(page_token or 0)
+        result = {kind: [{'id': item_id} for item_id in ids[start:start + page_size]]}
+        if start + page_size < len(ids):
+            result['nextPageToken'] = str(start + page_size)
+        return result
+
+    def _delete(self, kind: str, item_id: str) -> dict:
+        self.stored[kind].pop(item_id, None)
+        return {}
+
+    def _execute(self, response: Callable[[], dict]) -> dict:
+        started = time.perf_counter()
+        failed = True
+        try:
+            delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+            if delay:
+                time.sleep(delay)
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.errors += 1
+                raise FakeGmailError("Simulated Gmail API failure")
+            result = response()
+            failed = False
+            return result
+        finally:
+            latency = time.perf_counter() - started
+            self.latencies.append(latency)
+            if self.stats_path:
+                self._write_stats(latency, failed)
+
+    def _write_stats(self, latency: float, failed: bool) -> None:
+        if self._stats_file is None:
+            # Line-buffered, so stats survive the worker process exiting without cleanup
+            self._stats_file = open(self.stats_path, 'a', buffering=1)
+        self._stats_file.write(json.dumps({"latency": latency, "error": failed}) + '\n')
+
+
+def read_worker_stats(stats_dir: str):
+    """(errors, per-request latencies) written by the fake services of worker processes."""
+    errors = 0
+    latencies = []
+    for name in sorted(os.listdir(stats_dir)):
+        with open(os.path.join(stats_dir, name), 'r') as f:
+            for line in f:
+                entry = json.loads(line)
+                latencies.append(entry["latency"])
+                errors += entry["error"]
+    return errors, latencies
+
+
+def generate_prospects(count: int, seed: int = 0) -> Dict[str, List[dict]]:
+    """Generate a synthetic prospect set shaped like business_prospects.json."""
+    rng = random.Random(seed)
+    categories = list(CATEGORY_TYPES)
+    prospects = {category: [] for category in categories}
+
+    for i in range(count):
+        category = categories[i % len(categories)]
+        slug = f"{category.split('_')[0]}-shop-{i}"
+        prospects[category].append({
+            "name": f"{category.split('_')[0].title()} Shop {i}",
+            "email": f"info@{slug}.example.com",
+            "location": rng.choice(SYNTHETIC_LOCATIONS),
+            "type": CATEGORY_TYPES[category],
+            "notes": rng.choice(SYNTHETIC_NOTES)
+        })
+
+    return prospects
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _summarize(name: str, size: int, items: int, errors: int, seconds: float,
+               latencies: List[float], peak_bytes: int) -> dict:
+    return {
+        "benchmark": name,
+        "size": size,
+        "items": items,
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "throughput_per_s": round(items / seconds, 2) if seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+        "peak_memory_mb": round(peak_bytes / (1024 * 1024), 3)
+    }
+
+
+def _check_created(name: str, size: int, created: int, errors: int) -> None:
+    """Fail the benchmark unless every prospect got a record or an injected error."""
+    if created + errors != size:
+        raise RuntimeError(f"{name}: {created} created + {errors} injected errors != {size} prospects; "
+                           f"the timings would not measure the full run")
+
+
+def _measure(func: Callable[[], object]):
+    """Run func under tracemalloc, returning (seconds, peak_bytes, func's result)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return seconds, peak, result
+
+
+def _fake_sender(service: FakeGmailService) -> GmailSender:
+    return GmailSender(service=service)
+
+
+def _offline_validator() -> EmailValidator:
+    # Synthetic prospects use example.com domains; keep DNS out of the timings
+    return EmailValidator(check_mx=False)
+
+
+def bench_campaign_drafts(prospects: Dict[str, List[dict]], size: int, service_options: dict) -> dict:
+    """Benchmark outreach_campaign.create_campaign_drafts end to end."""
+    service = FakeGmailService(**service_options)
+    sender = _fake_sender(service)
+    with open('business_prospects.json', 'w') as f:
+        json.dump(prospects, f)
+
+    seconds, peak, drafts = _measure(lambda: create_campaign_drafts(sender=sender, validator=_offline_validator()))
+    _check_created("create_campaign_drafts", size, len(drafts), service.errors)
+    return _summarize("create_campaign_drafts", size, size, service.errors, seconds, service.latencies, peak)
+
+
+def bench_full_campaign(prospects: Dict[str, List[dict]], size: int, service_options: dict) -> dict:
+    """Benchmark integrated_outreach.create_full_campaign end to end."""
+    service = FakeGmailService(**service_options)
+    outreach = IntegratedOutreach(bi=BusinessIntelligence(), gmail=_fake_sender(service))
+    with open('business_prospects.json', 'w') as f:
+        json.dump(prospects, f)
+    os.makedirs('landing_pages', exist_ok=True)
+
+    seconds, peak, campaigns = _measure(
+        lambda: create_full_campaign(outreach=outreach, validator=_offline_validator()))
+    _check_created("create_full_campaign", size, len(campaigns), service.errors)
+    return _summarize("create_full_campaign", size, size, service.errors, seconds, service.latencies, peak)
+
+
+def _worker_service(service_options: dict, stats_dir: str) -> FakeGmailService:
+    return FakeGmailService(**service_options, stats_path=os.path.join(stats_dir, f"{os.getpid()}.jsonl"))
+
+
+def _fake_worker_sender(service_options: dict, stats_dir: str) -> GmailSender:
+    """Sender factory for sharded workers; each process gets its own fake service."""
+    return GmailSender(service=_worker_service(service_options, stats_dir))
+
+
+def _fake_outreach(service_options: dict, stats_dir: str) -> IntegratedOutreach:
+    """Outreach factory for sharded workers; each process gets its own fake service."""
+    return IntegratedOutreach(bi=BusinessIntelligence(),
+                              gmail=GmailSender(service=_worker_service(service_options, stats_dir)))
+
+
+def bench_sharded(prospects: Dict[str, List[dict]], size: int, service_options: dict, workers: int) -> List[dict]:
+    """Benchmark the multiprocess modes of both campaign paths.
+
+    Fake services live in the worker processes and report their errors and
+    request latencies through per-process stats files; peak memory covers
+    the parent process only.
+    """
+    with open('business_prospects.json', 'w') as f:
+        json.dump(prospects, f)
+    os.makedirs('landing_pages', exist_ok=True)
+    drafts_stats = tempfile.mkdtemp(prefix='drafts-stats-', dir='.')
+    campaign_stats = tempfile.mkdtemp(prefix='campaign-stats-', dir='.')
+
+    drafts_seconds, drafts_peak, drafts = _measure(
+        lambda: create_campaign_drafts(workers=workers,
+                                       sender_factory=functools.partial(_fake_worker_sender, service_options,
+                                                                        os.path.abspath(drafts_stats)),
+                                       validator=_offline_validator()))
+    campaign_seconds, campaign_peak, campaigns = _measure(
+        lambda: create_full_campaign(workers=workers,
+                                     outreach_factory=functools.partial(_fake_outreach, service_options,
+                                                                        os.path.abspath(campaign_stats)),
+                                     validator=_offline_validator()))
+
+    drafts_errors, drafts_latencies = read_worker_stats(drafts_stats)
+    campaign_errors, campaign_latencies = read_worker_stats(campaign_stats)
+    _check_created(f"create_campaign_drafts[workers={workers}]", size, len(drafts), drafts_errors)
+    _check_created(f"create_full_campaign[workers={workers}]", size, len(campaigns), campaign_errors)
+    return [
+        _summarize(f"create_campaign_drafts[workers={workers}]", size, size, drafts_errors, drafts_seconds,
+                   drafts_latencies, drafts_peak),
+        _summarize(f"create_full_campaign[workers={workers}]", size, size, campaign_errors, campaign_seconds,
+                   campaign_latencies, campaign_peak)
+    ]
+
+
+def _bench_calls(name: str, size: int, calls: List[Callable[[], object]]) -> dict:
+    latencies = []
+
+    def run():
+        for call in calls:
+            call_start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - call_start)
+
+    seconds, peak, _ = _measure(run)
+    return _summarize(name, size, len(calls), 0, seconds, latencies, peak)
+
+
+def bench_customize_template(prospects: Dict[str, List[dict]], size: int) -> dict:
+    """Benchmark email_templates.customize_template."""
+    calls = [
+        (lambda b=business: customize_template(b['type'], b['name'], "Bench Sender",
+                                               "bench@example.com", "+1 (555) 000-0000"))
+        for businesses in prospects.values() for business in businesses
+        if business['type'] in EMAIL_TEMPLATES
+    ]
+    return _bench_calls("customize_template", size, calls)
+
+
+def bench_create_message(prospects: Dict[str, List[dict]], size: int) -> dict:
+    """Benchmark GmailSender.create_message (MIME build + base64 encoding)."""
+    sender = _fake_sender(FakeGmailService())
+    body = EMAIL_TEMPLATES['coffee_roaster']['body']
+    calls = [
+        (lambda b=business: sender.create_message([b['email']], f"Hello {b['name']}", body))
+        for businesses in prospects.values() for business in businesses
+    ]
+    return _bench_calls("create_message", size, calls)
+
+
+def bench_revenue_potential(prospects: Dict[str, List[dict]], size: int) -> dict:
+    """Benchmark BusinessIntelligence.calculate_revenue_potential."""
+    bi = BusinessIntelligence()
+    rng = random.Random(size)
+    calls = []
+    for businesses in prospects.values():
+        for business in businesses:
+            business_data = {
+                "business_type": business['type'],
+                "location_demand": {"local_interest_score": rng.randint(30, 95)},
+                "website_analysis": {"has_open_kitchen": rng.random() < 0.5}
+            }
+            calls.append(lambda d=business_data: bi.calculate_revenue_potential(d))
+    return _bench_calls("calculate_revenue_potential", size, calls)
+
+
+def run_benchmarks(sizes: List[int], service_options: dict, seed: int = 0, workers: int = 1) -> List[dict]:
+    """Run every benchmark for every prospect-set size."""
+    results = []
+    original_dir = os.getcwd()
+
+    for size in sizes:
+        prospects = generate_prospects(size, seed=seed)
+        with tempfile.TemporaryDirectory(prefix='outreach-bench-') as workdir:
+            os.chdir(workdir)
+            try:
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    size_results = [
+                        bench_campaign_drafts(prospects, size, service_options),
+                        bench_full_campaign(prospects, size, service_options),
+                        bench_customize_template(prospects, size),
+                        bench_create_message(prospects, size),
+                        bench_revenue_potential(prospects, size)
+                    ]
+                    if workers > 1:
+                        size_results.extend(bench_sharded(prospects, size, service_options, workers))
+            finally:
+                os.chdir(original_dir)
+
+        for result in size_results:
+            print(f"  {result['benchmark']:<38} n={size:<7} "
+                  f"{result['throughput_per_s']:>12,.1f}/s  "
+                  f"p50 {result['p50_ms']:.3f}ms  p99 {result['p99_ms']:.3f}ms  "
+                  f"peak {result['peak_memory_mb']:.1f}MB  errors {result['errors']}")
+        results.extend(size_results)
+
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.10) -> List[str]:
+    """Return regression descriptions where current is worse than baseline by more than threshold."""
+    baseline_index = {(r['benchmark'], r['size']): r for r in baseline.get('results', [])}
+    regressions = []
+
+    for result in current.get('results', []):
+        previous = baseline_index.get((result['benchmark'], result['size']))
+        if not previous:
+            continue
+        checks = [
+            ("throughput_per_s", previous['throughput_per_s'] > 0 and
+             result['throughput_per_s'] < previous['throughput_per_s'] * (1 - threshold)),
+            ("p99_ms", previous['p99_ms'] > 0 and result['p99_ms'] > previous['p99_ms'] * (1 + threshold)),
+            ("peak_memory_mb", previous['peak_memory_mb'] > 0 and
+             result['peak_memory_mb'] > previous['peak_memory_mb'] * (1 + threshold))
+        ]
+        for metric, regressed in checks:
+            if regressed:
+                regressions.append(f"{result['benchmark']} n={result['size']} {metric}: "
+                                   f"{previous[metric]} -> {result[metric]}")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    """Run the benchmark suite from the command line."""
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description="Benchmark the outreach pipeline against a fake Gmail backend")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Synthetic prospect-set sizes (default: 1000 10000 100000)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Fake Gmail latency per request, seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random latency per request, seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of fake Gmail requests that fail")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Also benchmark the sharded campaign modes with this many processes")
+    parser.add_argument('--label', default=None, help="Version label stored with the results")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Results file (JSON)")
+    parser.add_argument('--compare', default=None, help="Baseline results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Regression threshold (fraction)")
+    args = parser.parse_args(argv)
+
+    service_options = {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "seed": args.seed
+    }
+
+    print(f"Benchmarking outreach pipeline (sizes: {', '.join(map(str, args.sizes))})...\n")
+    results = run_benchmarks(args.sizes, service_options, seed=args.seed, workers=args.workers)
+
+    report = {
+        "label": args.label or _git_revision() or "unlabelled",
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fake_gmail": service_options,
+        "results": results
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📊 Results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n🚨 {len(regressions)} regressions vs {baseline.get('label', args.compare)}:")
+            for regression in regressions:
+                print(f"  • {regression}")
+            sys.exit(1)
+        print(f"\n✅ No regressions vs {baseline.get('label', args.compare)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,12 @@ import time
 import random
 from typing import Dict, List, Optional
 
+from intelligence_records import (IntelligenceReport, LocationDemand, PersonalizedCopy,
+                                  RevenueProjections, ReviewsAnalysis, WebsiteAnalysis)
+from business_types import demand_multiplier, get_business_type, hourly_rate, subject_template
+from locations import demand_range
+from review_analysis import analyze_reviews
+
 class BusinessIntelligence:
     def __init__(self):
         self.session = requests.Session()
@@ -20,45 +26,37 @@ class BusinessIntelligence:
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         })
     
-    def search_google_reviews(self, business_name: str, business_type: str) -> Dict:
-        """Search for Google reviews and extract watching/curiosity mentions."""
+    def reviews_analysis(self, business_name: str, business_type: str,
+                         reviews: Optional[List[str]] = None) -> ReviewsAnalysis:
+        """Search for Google reviews and extract watching/curiosity mentions.
+        
+        When review texts are supplied they are scored with review_analysis;
+        otherwise simulated mentions are returned.
+        """
         try:
+            if reviews is not None:
+                return ReviewsAnalysis.from_dict(analyze_reviews(reviews))
+            
             search_query = f'"{business_name}" reviews "watch" OR "see how" OR "behind scenes" OR "process" OR "making"'
             
             # Note: In production, you'd use Google Places API or SerpAPI
             # This is a simplified example
             
-            curiosity_keywords = [
-                "watch", "see how", "behind the scenes", "process", "making",
-                "curious", "fascinated", "observe", "see them make", "wonder how"
-            ]
-            
             # Simulated data based on business type - replace with real scraping
-            if business_type == "coffee_roaster":
-                mentions = ["wish I could watch the roasting", "love seeing the process", "fascinating to see how they roast"]
-            elif business_type == "bakery":
-                mentions = ["want to see how they make bread", "watched through window", "love the baking process"]
-            elif business_type == "florist":
-                mentions = ["amazing to watch arrangements", "beautiful process", "love seeing flowers arranged"]
-            elif business_type == "brewery":
-                mentions = ["wish we could see brewing", "fascinating process", "want behind scenes tour"]
-            elif business_type == "tea_shop":
-                mentions = ["love watching tea ceremony", "beautiful preparation", "meditative process"]
-            elif business_type == "chocolate_maker":
-                mentions = ["want to see chocolate making", "fascinated by bean to bar", "love watching tempering"]
-            else:
-                mentions = []
+            profile = get_business_type(business_type)
+            mentions = list(profile.sample_mentions) if profile else []
             
-            return {
-                "curiosity_mentions": len(mentions),
-                "sample_quotes": mentions[:3],
-                "total_reviews_analyzed": random.randint(150, 400)
-            }
+            return ReviewsAnalysis(len(mentions), mentions[:3], random.randint(150, 400), None)
         except Exception as e:
             print(f"Error scraping reviews: {e}")
-            return {"curiosity_mentions": 0, "sample_quotes": [], "total_reviews_analyzed": 0}
+            return ReviewsAnalysis.empty()
     
-    def analyze_website(self, business_name: str) -> Dict:
+    def search_google_reviews(self, business_name: str, business_type: str,
+                              reviews: Optional[List[str]] = None) -> Dict:
+        """Dict form of reviews_analysis()."""
+        return self.reviews_analysis(business_name, business_type, reviews).to_dict()
+    
+    def website_analysis(self, business_name: str) -> WebsiteAnalysis:
         """Analyze business website for operational details."""
         try:
             # Search for business website
@@ -68,188 +66,186 @@ class BusinessIntelligence:
             business_lower = business_name.lower()
             
             if "dandelion" in business_lower:
-                return {
-                    "has_open_kitchen": True,
-                    "operating_hours": "Tue-Fri 2-4 PM roasting",
-                    "specialty_process": "Bean-to-bar chocolate making",
-                    "location_type": "Factory storefront",
-                    "foot_traffic": "High (Valencia Street)"
-                }
+                return WebsiteAnalysis(
+                    has_open_kitchen=True,
+                    operating_hours="Tue-Fri 2-4 PM roasting",
+                    specialty_process="Bean-to-bar chocolate making",
+                    location_type="Factory storefront",
+                    foot_traffic="High (Valencia Street)"
+                )
             elif "tartine" in business_lower:
-                return {
-                    "has_open_kitchen": True,
-                    "operating_hours": "Early morning baking",
-                    "specialty_process": "Artisan bread making",
-                    "location_type": "Open kitchen bakery",
-                    "foot_traffic": "Very high"
-                }
+                return WebsiteAnalysis(
+                    has_open_kitchen=True,
+                    operating_hours="Early morning baking",
+                    specialty_process="Artisan bread making",
+                    location_type="Open kitchen bakery",
+                    foot_traffic="Very high"
+                )
             elif "blue bottle" in business_lower:
-                return {
-                    "has_open_kitchen": True,
-                    "operating_hours": "Morning roasting",
-                    "specialty_process": "Single-origin coffee roasting",
-                    "location_type": "Roastery cafe",
-                    "foot_traffic": "High"
-                }
+                return WebsiteAnalysis(
+                    has_open_kitchen=True,
+                    operating_hours="Morning roasting",
+                    specialty_process="Single-origin coffee roasting",
+                    location_type="Roastery cafe",
+                    foot_traffic="High"
+                )
             else:
-                return {
-                    "has_open_kitchen": False,
-                    "operating_hours": "Unknown",
-                    "specialty_process": "Unknown",
-                    "location_type": "Unknown",
-                    "foot_traffic": "Unknown"
-                }
+                return WebsiteAnalysis.unknown()
         except Exception as e:
             print(f"Error analyzing website: {e}")
-            return {}
+            return WebsiteAnalysis.unknown()
     
-    def get_location_demand(self, business_name: str, location: str, business_type: str) -> Dict:
+    def analyze_website(self, business_name: str) -> Dict:
+        """Dict form of website_analysis()."""
+        return self.website_analysis(business_name).to_dict()
+    
+    def location_demand(self, business_name: str, location: str, business_type: str) -> LocationDemand:
         """Estimate local demand for experiences."""
         try:
-            # Simulated location-based demand analysis
-            if "san francisco" in location.lower() or "sf" in location.lower():
-                base_demand = random.randint(80, 150)
-            elif "new york" in location.lower() or "brooklyn" in location.lower():
-                base_demand = random.randint(100, 180)
-            elif "los angeles" in location.lower():
-                base_demand = random.randint(60, 120)
-            else:
-                base_demand = random.randint(30, 80)
+            # Simulated demand within the location's regional range
+            low, high = demand_range(location)
+            base_demand = random.randint(low, high)
             
             # Adjust by business type popularity
-            type_multipliers = {
-                "coffee_roaster": 1.3,
-                "bakery": 1.2,
-                "chocolate_maker": 1.5,
-                "brewery": 1.4,
-                "florist": 0.9,
-                "tea_shop": 0.8
-            }
-            
-            multiplier = type_multipliers.get(business_type, 1.0)
+            multiplier = demand_multiplier(business_type)
             adjusted_demand = int(base_demand * multiplier)
             
-            return {
-                "monthly_searches": adjusted_demand,
-                "local_interest_score": min(95, adjusted_demand),
-                "competitor_gap": random.choice([True, False]),
-                "demographic_match": random.randint(75, 95)
-            }
+            return LocationDemand(
+                monthly_searches=adjusted_demand,
+                local_interest_score=min(95, adjusted_demand),
+                competitor_gap=random.choice([True, False]),
+                demographic_match=random.randint(75, 95)
+            )
         except Exception as e:
             print(f"Error getting location demand: {e}")
-            return {}
+            return LocationDemand.from_dict({})
     
-    def calculate_revenue_potential(self, business_data: Dict) -> Dict:
+    def get_location_demand(self, business_name: str, location: str, business_type: str) -> Dict:
+        """Dict form of location_demand()."""
+        return self.location_demand(business_name, location, business_type).to_dict()
+    
+    def revenue_projections(self, business_type: str, website: WebsiteAnalysis,
+                            demand: LocationDemand) -> RevenueProjections:
         """Calculate personalized revenue projections."""
+        # Base hourly rate by business type
+        base_rate = hourly_rate(business_type)
+        
+        # Adjust based on location and demand
+        if demand.local_interest_score > 80:
+            base_rate += 10  # Premium pricing for high demand areas
+        
+        # Calculate sessions based on business characteristics
+        if website.has_open_kitchen:
+            daily_sessions = 3
+        else:
+            daily_sessions = 2
+        
+        weekly_sessions = daily_sessions * 5  # 5 days per week
+        monthly_sessions = weekly_sessions * 4.3  # Average weeks per month
+        
+        observers_per_session = 2  # Conservative estimate
+        
+        monthly_revenue = int(monthly_sessions * base_rate * observers_per_session)
+        annual_revenue = monthly_revenue * 12
+        
+        return RevenueProjections(
+            hourly_rate=base_rate,
+            daily_sessions=daily_sessions,
+            weekly_sessions=weekly_sessions,
+            monthly_sessions=int(monthly_sessions),
+            monthly_revenue=monthly_revenue,
+            annual_revenue=annual_revenue,
+            observers_per_session=observers_per_session
+        )
+    
+    def calculate_revenue_potential(self, business_data: Dict) -> Dict:
+        """Calculate personalized revenue projections from a business data dict."""
         try:
-            # Base hourly rates by business type
-            hourly_rates = {
-                "coffee_roaster": 40,
-                "bakery": 45,
-                "chocolate_maker": 50,
-                "brewery": 45,
-                "florist": 40,
-                "tea_shop": 40
-            }
-            
-            business_type = business_data.get("business_type", "coffee_roaster")
-            base_rate = hourly_rates.get(business_type, 40)
-            
-            # Adjust based on location and demand
             location_data = business_data.get("location_demand", {})
-            if location_data.get("local_interest_score", 50) > 80:
-                base_rate += 10  # Premium pricing for high demand areas
-            
-            # Calculate sessions based on business characteristics
-            website_data = business_data.get("website_analysis", {})
-            if website_data.get("has_open_kitchen"):
-                daily_sessions = 3
-            else:
-                daily_sessions = 2
-            
-            weekly_sessions = daily_sessions * 5  # 5 days per week
-            monthly_sessions = weekly_sessions * 4.3  # Average weeks per month
-            
-            observers_per_session = 2  # Conservative estimate
-            
-            monthly_revenue = int(monthly_sessions * base_rate * observers_per_session)
-            annual_revenue = monthly_revenue * 12
-            
-            return {
-                "hourly_rate": base_rate,
-                "daily_sessions": daily_sessions,
-                "weekly_sessions": weekly_sessions,
-                "monthly_sessions": int(monthly_sessions),
-                "monthly_revenue": monthly_revenue,
-                "annual_revenue": annual_revenue,
-                "observers_per_session": observers_per_session
-            }
+            demand = LocationDemand.from_dict({"local_interest_score": 50, **location_data})
+            return self.revenue_projections(
+                business_data.get("business_type", "coffee_roaster"),
+                WebsiteAnalysis.from_dict(business_data.get("website_analysis", {})),
+                demand
+            ).to_dict()
         except Exception as e:
             print(f"Error calculating revenue: {e}")
             return {}
     
-    def generate_business_intelligence(self, business_name: str, business_type: str, location: str) -> Dict:
+    def generate_report(self, business_name: str, business_type: str, location: str,
+                        reviews: Optional[List[str]] = None) -> IntelligenceReport:
         """Generate complete intelligence report for a business."""
         print(f"Generating intelligence for {business_name}...")
         
         # Gather all data
-        reviews_data = self.search_google_reviews(business_name, business_type)
-        website_data = self.analyze_website(business_name)
-        location_data = self.get_location_demand(business_name, location, business_type)
-        
-        # Combine all data
-        business_data = {
-            "business_name": business_name,
-            "business_type": business_type,
-            "location": location,
-            "reviews_analysis": reviews_data,
-            "website_analysis": website_data,
-            "location_demand": location_data
-        }
+        reviews_data = self.reviews_analysis(business_name, business_type, reviews)
+        website = self.website_analysis(business_name)
+        demand = self.location_demand(business_name, location, business_type)
         
-        # Calculate revenue potential
-        revenue_data = self.calculate_revenue_potential(business_data)
-        business_data["revenue_projections"] = revenue_data
-        
-        # Add intelligence timestamp
-        business_data["generated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
-        
-        return business_data
+        return IntelligenceReport(
+            business_name=business_name,
+            business_type=business_type,
+            location=location,
+            reviews_analysis=reviews_data,
+            website_analysis=website,
+            location_demand=demand,
+            revenue_projections=self.revenue_projections(business_type, website, demand),
+            generated_at=time.strftime("%Y-%m-%d %H:%M:%S")
+        )
     
-    def create_personalized_copy(self, intelligence: Dict) -> Dict:
-        """Generate personalized marketing copy based on intelligence."""
-        business_name = intelligence["business_name"]
-        business_type = intelligence["business_type"]
-        reviews = intelligence["reviews_analysis"]
-        revenue = intelligence["revenue_projections"]
-        location_demand = intelligence["location_demand"]
+    def generate_business_intelligence(self, business_name: str, business_type: str, location: str,
+                                       reviews: Optional[List[str]] = None) -> Dict:
+        """Dict form of generate_report(), as stored in personalized_campaigns.json."""
+        return self.generate_report(business_name, business_type, location, reviews).to_dict()
+    
+    def personalize_copy(self, report: IntelligenceReport, experiment=None) -> PersonalizedCopy:
+        """Generate personalized marketing copy based on intelligence.
         
-        # Personalized subject line
-        subject_templates = {
-            "coffee_roaster": f"{business_name}: Turn roasting curiosity into ${revenue['monthly_revenue']:,}/month",
-            "bakery": f"{business_name}: Your baking process could earn ${revenue['monthly_revenue']:,}/month",
-            "chocolate_maker": f"{business_name}: Bean-to-bar watchers = ${revenue['monthly_revenue']:,}/month revenue",
-            "brewery": f"{business_name}: Brewing observers could add ${revenue['monthly_revenue']:,}/month",
-            "florist": f"{business_name}: Arrangement watchers = ${revenue['monthly_revenue']:,}/month opportunity",
-            "tea_shop": f"{business_name}: Tea ceremony curiosity = ${revenue['monthly_revenue']:,}/month"
-        }
+        With a subject_experiments.SubjectExperiment, the subject line and
+        opening are variants chosen by the experiment and their ids are
+        recorded in the copy's variants.
+        """
+        business_name = report.business_name
+        business_type = report.business_type
+        reviews = report.reviews_analysis
+        monthly_revenue = report.revenue_projections.monthly_revenue
         
-        subject = subject_templates.get(business_type, f"{business_name}: Outbound partnership opportunity")
+        # Personalized subject line (the type's control variant)
+        subject = subject_template(business_type).format(
+            business_name=business_name,
+            monthly_revenue=monthly_revenue
+        )
         
         # Personalized opening based on reviews
-        if reviews["curiosity_mentions"] > 0:
-            opening = f"Your reviews mention curiosity about your process {reviews['curiosity_mentions']} times. "
-            if reviews["sample_quotes"]:
-                opening += f'Recent quote: "{reviews["sample_quotes"][0]}"'
+        if reviews.curiosity_mentions > 0:
+            opening = f"Your reviews mention curiosity about your process {reviews.curiosity_mentions} times. "
+            if reviews.sample_quotes:
+                opening += f'Recent quote: "{reviews.sample_quotes[0]}"'
         else:
-            opening = f"People are naturally curious about {business_type.replace('_', ' ')} processes."
+            profile = get_business_type(business_type)
+            label = profile.label if profile else business_type.replace('_', ' ')
+            opening = f"People are naturally curious about {label} processes."
+        
+        # A/B variants replace the defaults when an experiment is running
+        variants = None
+        if experiment is not None:
+            variants = {}
+            variants["subject"], subject = experiment.subject(report)
+            opening_variant = experiment.opening(report)
+            if opening_variant is not None:
+                variants["opening"], opening = opening_variant
         
-        return {
-            "subject_line": subject,
-            "personalized_opening": opening,
-            "revenue_hook": f"Based on {location_demand.get('monthly_searches', 50)} monthly local searches, you could earn ${revenue['monthly_revenue']:,}/month",
-            "social_proof": f"Similar businesses in your area earn ${revenue['monthly_revenue']:,}/month on average"
-        }
+        return PersonalizedCopy(
+            subject_line=subject,
+            personalized_opening=opening,
+            revenue_hook=f"Based on {report.location_demand.monthly_searches or 50} monthly local searches, you could earn ${monthly_revenue:,}/month",
+            social_proof=f"Similar businesses in your area earn ${monthly_revenue:,}/month on average",
+            variants=variants
+        )
+    
+    def create_personalized_copy(self, intelligence: Dict, experiment=None) -> Dict:
+        """Dict form of personalize_copy() for an intelligence dict."""
+        return self.personalize_copy(IntelligenceReport.from_dict(intelligence), experiment).to_dict()
 
 def main():
     """Test the business intelligence system."""
@@ -263,19 +259,19 @@ def main():
     ]
     
     for business in test_businesses:
-        intelligence = bi.generate_business_intelligence(
+        report = bi.generate_report(
             business["name"], 
             business["type"], 
             business["location"]
         )
         
-        copy = bi.create_personalized_copy(intelligence)
+        copy = bi.personalize_copy(report)
         
         print(f"\n--- {business['name']} Intelligence Report ---")
-        print(f"Subject: {copy['subject_line']}")
-        print(f"Opening: {copy['personalized_opening']}")
-        print(f"Revenue Projection: ${intelligence['revenue_projections']['monthly_revenue']:,}/month")
-        print(f"Curiosity Mentions: {intelligence['reviews_analysis']['curiosity_mentions']}")
+        print(f"Subject: {copy.subject_line}")
+        print(f"Opening: {copy.personalized_opening}")
+        print(f"Revenue Projection: ${report.revenue_projections.monthly_revenue:,}/month")
+        print(f"Curiosity Mentions: {report.reviews_analysis.curiosity_mentions}")
         print("-" * 50)
 
 if __name__ == "__main__":
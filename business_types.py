@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Business Type Registry
+Everything that varies by vertical, in one table built once at import: the
+category names prospects are filed under, pricing and demand figures,
+subject-line copy and the simulated review mentions. Adding a vertical is
+one BusinessType entry; its initial email is email_templates'
+DEFAULT_EMAIL_TEMPLATE unless EMAIL_TEMPLATES has one keyed the same way.
+
+Category names resolve through a precomputed alias map, with keyword
+matching on whole words as a fallback for names the map doesn't know;
+results are cached, so each distinct category is resolved once.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Pattern, Tuple
+
+# Used for types the registry doesn't know
+DEFAULT_HOURLY_RATE = 40
+DEFAULT_DEMAND_MULTIPLIER = 1.0
+DEFAULT_SUBJECT_VARIANTS = {
+    "partnership": "{business_name}: Outbound partnership opportunity"
+}
+
+# Endings a keyword may take in a category name ("baker" -> "bakeries",
+# "brew" -> "breweries"); anything else must be a separate word
+KEYWORD_SUFFIXES = ("s", "es", "y", "ies", "ing", "ery", "eries")
+
+
+@dataclass(frozen=True)
+class BusinessType:
+    __slots__ = ("key", "label", "categories", "keywords", "hourly_rate", "demand_multiplier",
+                 "subject_variants", "sample_mentions")
+
+    # Template type, e.g. "coffee_roaster"
+    key: str
+    # Human-readable form for copy, e.g. "coffee roaster"
+    label: str
+    # Prospect categories filed under this type (business_prospects.json keys)
+    categories: Tuple[str, ...]
+    # Words that identify the type in category names the aliases miss
+    keywords: Tuple[str, ...]
+    # Base price per observer-hour, before the high-demand premium
+    hourly_rate: int
+    # Popularity of the type's experiences relative to the regional baseline
+    demand_multiplier: float
+    # Subject lines for A/B tests; the first is the control used without an experiment
+    subject_variants: Dict[str, str]
+    # Simulated curiosity mentions used when no review texts are supplied
+    sample_mentions: Tuple[str, ...]
+
+    @property
+    def subject_template(self) -> str:
+        """The control subject line, used without an experiment."""
+        return next(iter(self.subject_variants.values()))
+
+
+def _business_type(key: str, **fields) -> BusinessType:
+    return BusinessType(key=key, label=key.replace('_', ' '), **fields)
+
+
+BUSINESS_TYPES: Dict[str, BusinessType] = {business_type.key: business_type for business_type in (
+    _business_type(
+        "coffee_roaster",
+        categories=("coffee_roasters", "modest_coffee_roasters"),
+        keywords=("coffee",),
+        hourly_rate=40,
+        demand_multiplier=1.3,
+        subject_variants={
+            "revenue": "{business_name}: Turn roasting curiosity into ${monthly_revenue:,}/month",
+            "question": "{business_name}: Do your customers watch you roast?",
+            "guests": "{business_name}: Guests would pay to watch you roast"
+        },
+        sample_mentions=("wish I could watch the roasting", "love seeing the process",
+                         "fascinating to see how they roast")
+    ),
+    _business_type(
+        "bakery",
+        categories=("boutique_bakeries", "modest_bakeries", "artisan_bakeries"),
+        keywords=("baker", "baking"),
+        hourly_rate=45,
+        demand_multiplier=1.2,
+        subject_variants={
+            "revenue": "{business_name}: Your baking process could earn ${monthly_revenue:,}/month",
+            "question": "{business_name}: Do customers peek into your kitchen?",
+            "guests": "{business_name}: Guests would pay to watch you bake"
+        },
+        sample_mentions=("want to see how they make bread", "watched through window", "love the baking process")
+    ),
+    _business_type(
+        "florist",
+        categories=("flower_studios", "flower_workshops"),
+        keywords=("flower", "florist"),
+        hourly_rate=40,
+        demand_multiplier=0.9,
+        subject_variants={
+            "revenue": "{business_name}: Arrangement watchers = ${monthly_revenue:,}/month opportunity",
+            "question": "{business_name}: Do customers linger to watch you arrange?",
+            "guests": "{business_name}: Guests would pay to watch you design"
+        },
+        sample_mentions=("amazing to watch arrangements", "beautiful process", "love seeing flowers arranged")
+    ),
+    _business_type(
+        "brewery",
+        categories=("craft_breweries", "modest_craft_breweries", "small_breweries"),
+        keywords=("brew",),
+        hourly_rate=45,
+        demand_multiplier=1.4,
+        subject_variants={
+            "revenue": "{business_name}: Brewing observers could add ${monthly_revenue:,}/month",
+            "question": "{business_name}: Do visitors ask to see the brewhouse?",
+            "guests": "{business_name}: Guests would pay to watch you brew"
+        },
+        sample_mentions=("wish we could see brewing", "fascinating process", "want behind scenes tour")
+    ),
+    _business_type(
+        "tea_shop",
+        categories=("specialty_tea",),
+        keywords=("tea",),
+        hourly_rate=40,
+        demand_multiplier=0.8,
+        subject_variants={
+            "revenue": "{business_name}: Tea ceremony curiosity = ${monthly_revenue:,}/month",
+            "question": "{business_name}: Are guests curious about your tea preparation?",
+            "guests": "{business_name}: Guests would pay to watch your tea ceremony"
+        },
+        sample_mentions=("love watching tea ceremony", "beautiful preparation", "meditative process")
+    ),
+    _business_type(
+        "chocolate_maker",
+        categories=("chocolate_makers", "modest_chocolate_makers"),
+        keywords=("chocolate",),
+        hourly_rate=50,
+        demand_multiplier=1.5,
+        subject_variants={
+            "revenue": "{business_name}: Bean-to-bar watchers = ${monthly_revenue:,}/month revenue",
+            "question": "{business_name}: Ever been asked how your chocolate is made?",
+            "guests": "{business_name}: Guests would pay to watch bean-to-bar"
+        },
+        sample_mentions=("want to see chocolate making", "fascinated by bean to bar", "love watching tempering")
+    ),
+)}
+
+# Category name (and each type's own key) -> type key
+CATEGORY_ALIASES: Dict[str, str] = {
+    alias: business_type.key for business_type in BUSINESS_TYPES.values()
+    for alias in (business_type.key,) + business_type.categories}
+
+
+def _keyword_pattern(keyword: str) -> Pattern:
+    """Matches keyword as a whole word (or with one of KEYWORD_SUFFIXES) in a category name.
+
+    Category words are separated by underscores, which \\b counts as word
+    characters, so the boundaries are spelled out.
+    """
+    forms = sorted((re.escape(keyword + suffix) for suffix in KEYWORD_SUFFIXES), key=len, reverse=True)
+    return re.compile(rf'(?<![a-z0-9])(?:{"|".join(forms + [re.escape(keyword)])})(?![a-z0-9])')
+
+
+# Keyword fallbacks in registry order, so earlier types win on overlaps
+_KEYWORDS: Tuple[Tuple[Pattern, str], ...] = tuple(
+    (_keyword_pattern(keyword), business_type.key)
+    for business_type in BUSINESS_TYPES.values() for keyword in business_type.keywords)
+
+
+@lru_cache(maxsize=None)
+def resolve_business_type(category: str) -> Optional[str]:
+    """Map a prospect category (or a type key) to a business type key, or None."""
+    key = CATEGORY_ALIASES.get(category)
+    if key is not None:
+        return key
+    category = category.lower()
+    for pattern, key in _KEYWORDS:
+        if pattern.search(category):
+            return key
+    return None
+
+
+def get_business_type(key: str) -> Optional[BusinessType]:
+    return BUSINESS_TYPES.get(key)
+
+
+def hourly_rate(key: str) -> int:
+    business_type = BUSINESS_TYPES.get(key)
+    return business_type.hourly_rate if business_type else DEFAULT_HOURLY_RATE
+
+
+def demand_multiplier(key: str) -> float:
+    business_type = BUSINESS_TYPES.get(key)
+    return business_type.demand_multiplier if business_type else DEFAULT_DEMAND_MULTIPLIER
+
+
+def subject_variants(key: str) -> Dict[str, str]:
+    business_type = BUSINESS_TYPES.get(key)
+    return business_type.subject_variants if business_type else DEFAULT_SUBJECT_VARIANTS
+
+
+def subject_template(key: str) -> str:
+    business_type = BUSINESS_TYPES.get(key)
+    return business_type.subject_template if business_type else next(iter(DEFAULT_SUBJECT_VARIANTS.values()))
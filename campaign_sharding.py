@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Campaign Sharding
+Hash-partitions prospects across a process pool so CPU-bound campaign work
+(template rendering, MIME building, HTML parsing) scales past the GIL.
+"""
+
+import json
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Tuple
+
+from suppression import forget_suppression_lists
+
+# (position in prospect order, category, business record)
+ProspectItem = Tuple[int, str, dict]
+
+
+class ShardError(Exception):
+    """One or more shards failed; results holds the merged output of the ones that succeeded."""
+
+    def __init__(self, failures: List[Tuple[int, BaseException]], results: List[dict]):
+        super().__init__("; ".join(f"shard {index}: {error}" for index, error in failures))
+        self.failures = failures
+        self.results = results
+
+
+def load_business_prospects(path: str = 'business_prospects.json') -> Dict[str, List[dict]]:
+    """Load the {category: [business, ...]} prospect file."""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def enumerate_prospects(prospects: Dict[str, List[dict]]) -> List[ProspectItem]:
+    """Flatten a {category: [business, ...]} prospect file into ordered items."""
+    items = []
+    for category, businesses in prospects.items():
+        for business in businesses:
+            items.append((len(items), category, business))
+    return items
+
+
+def shard_for(business: dict, shards: int) -> int:
+    """Stable shard number for a business, keyed by email (or name)."""
+    key = (business.get('email') or business.get('name', '')).strip().lower()
+    return zlib.crc32(key.encode('utf-8')) % shards
+
+
+def partition(items: List[ProspectItem], shards: int) -> List[List[ProspectItem]]:
+    """Hash-partition prospect items into shards."""
+    buckets = [[] for _ in range(shards)]
+    for item in items:
+        buckets[shard_for(item[2], shards)].append(item)
+    return buckets
+
+
+def run_sharded(worker: Callable, items: List[ProspectItem], workers: int, *worker_args) -> List[dict]:
+    """Run worker(shard, *worker_args) for each shard in a process pool.
+
+    Workers return (position, result) pairs; the merged results come back in
+    the original prospect order regardless of which shard finished first.
+    worker and worker_args must be picklable (module-level functions and
+    classes, or functools.partial of them).
+
+    If any shard raises, the others still run to completion and ShardError
+    is raised afterwards carrying their merged results, so the caller can
+    keep what was created without mistaking it for the full run.
+
+    Each worker process starts without the parent's shared suppression
+    lists, so forked workers never use the parent's SQLite connection.
+    """
+    shards = [shard for shard in partition(items, workers) if shard]
+    merged = []
+    failures = []
+
+    with ProcessPoolExecutor(max_workers=len(shards) or 1, initializer=forget_suppression_lists) as executor:
+        futures = {executor.submit(worker, shard, *worker_args): index for index, shard in enumerate(shards)}
+        for future in as_completed(futures):
+            try:
+                merged.extend(future.result())
+            except Exception as e:
+                print(f"  ✗ Shard {futures[future]} failed: {e}")
+                failures.append((futures[future], e))
+
+    merged.sort(key=lambda pair: pair[0])
+    results = [result for _, result in merged]
+    if failures:
+        raise ShardError(sorted(failures, key=lambda failure: failure[0]), results)
+    return results
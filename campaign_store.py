@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Campaign Store
+Compact SQLite storage for personalized campaigns: one typed row per
+campaign, email bodies kept once per template and re-rendered on load
+(the HTML alternative is rebuilt from the body and its open pixel).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+from config import get_config
+from email_templates import campaign_email_template, html_email_body
+
+DEFAULT_DB = 'campaigns.db'
+
+# (column, SQL type, path into the personalized_campaigns.json record)
+COLUMNS = [
+    ("business_name", "TEXT NOT NULL", ("business_name",)),
+    ("email", "TEXT NOT NULL", ("email",)),
+    ("business_type", "TEXT", ("intelligence", "business_type")),
+    ("location", "TEXT", ("intelligence", "location")),
+    ("landing_url", "TEXT", ("landing_url",)),
+    ("email_link", "TEXT", ("email_link",)),
+    ("draft_id", "TEXT", ("draft_id",)),
+    ("account", "TEXT", ("account",)),
+    ("pixel_url", "TEXT", ("pixel_url",)),
+    ("generated_at", "TEXT", ("intelligence", "generated_at")),
+    ("curiosity_mentions", "INTEGER", ("intelligence", "reviews_analysis", "curiosity_mentions")),
+    ("sample_quotes", "TEXT", ("intelligence", "reviews_analysis", "sample_quotes")),
+    ("total_reviews_analyzed", "INTEGER", ("intelligence", "reviews_analysis", "total_reviews_analyzed")),
+    ("keyword_counts", "TEXT", ("intelligence", "reviews_analysis", "keyword_counts")),
+    ("has_open_kitchen", "INTEGER", ("intelligence", "website_analysis", "has_open_kitchen")),
+    ("operating_hours", "TEXT", ("intelligence", "website_analysis", "operating_hours")),
+    ("specialty_process", "TEXT", ("intelligence", "website_analysis", "specialty_process")),
+    ("location_type", "TEXT", ("intelligence", "website_analysis", "location_type")),
+    ("foot_traffic", "TEXT", ("intelligence", "website_analysis", "foot_traffic")),
+    ("monthly_searches", "INTEGER", ("intelligence", "location_demand", "monthly_searches")),
+    ("local_interest_score", "INTEGER", ("intelligence", "location_demand", "local_interest_score")),
+    ("competitor_gap", "INTEGER", ("intelligence", "location_demand", "competitor_gap")),
+    ("demographic_match", "INTEGER", ("intelligence", "location_demand", "demographic_match")),
+    ("hourly_rate", "INTEGER", ("intelligence", "revenue_projections", "hourly_rate")),
+    ("daily_sessions", "INTEGER", ("intelligence", "revenue_projections", "daily_sessions")),
+    ("weekly_sessions", "INTEGER", ("intelligence", "revenue_projections", "weekly_sessions")),
+    ("monthly_sessions", "INTEGER", ("intelligence", "revenue_projections", "monthly_sessions")),
+    ("monthly_revenue", "INTEGER", ("intelligence", "revenue_projections", "monthly_revenue")),
+    ("annual_revenue", "INTEGER", ("intelligence", "revenue_projections", "annual_revenue")),
+    ("observers_per_session", "INTEGER", ("intelligence", "revenue_projections", "observers_per_session")),
+    ("subject_line", "TEXT", ("personalized_copy", "subject_line")),
+    ("personalized_opening", "TEXT", ("personalized_copy", "personalized_opening")),
+    ("revenue_hook", "TEXT", ("personalized_copy", "revenue_hook")),
+    ("social_proof", "TEXT", ("personalized_copy", "social_proof")),
+    ("variants", "TEXT", ("personalized_copy", "variants")),
+]
+
+# Columns stored as JSON text and booleans stored as 0/1
+_JSON_COLUMNS = {"sample_quotes", "keyword_counts", "variants"}
+_BOOL_COLUMNS = {"has_open_kitchen", "competitor_gap"}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS templates (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS campaigns (
+    id INTEGER PRIMARY KEY,
+    {', '.join(f'{name} {sql_type}' for name, sql_type, _ in COLUMNS)},
+    template_id INTEGER NOT NULL REFERENCES templates(id)
+);
+CREATE INDEX IF NOT EXISTS campaigns_email ON campaigns(email);
+CREATE INDEX IF NOT EXISTS campaigns_type ON campaigns(business_type);
+"""
+
+
+@dataclass
+class CampaignRecord:
+    """One stored campaign. Slotted, so 100k records stay small in memory."""
+
+    __slots__ = tuple(name for name, _, _ in COLUMNS) + ("email_template",)
+
+    business_name: str
+    email: str
+    business_type: Optional[str]
+    location: Optional[str]
+    landing_url: Optional[str]
+    email_link: Optional[str]
+    draft_id: Optional[str]
+    account: Optional[str]
+    pixel_url: Optional[str]
+    generated_at: Optional[str]
+    curiosity_mentions: Optional[int]
+    sample_quotes: Optional[List[str]]
+    total_reviews_analyzed: Optional[int]
+    keyword_counts: Optional[dict]
+    has_open_kitchen: Optional[bool]
+    operating_hours: Optional[str]
+    specialty_process: Optional[str]
+    location_type: Optional[str]
+    foot_traffic: Optional[str]
+    monthly_searches: Optional[int]
+    local_interest_score: Optional[int]
+    competitor_gap: Optional[bool]
+    demographic_match: Optional[int]
+    hourly_rate: Optional[int]
+    daily_sessions: Optional[int]
+    weekly_sessions: Optional[int]
+    monthly_sessions: Optional[int]
+    monthly_revenue: Optional[int]
+    annual_revenue: Optional[int]
+    observers_per_session: Optional[int]
+    subject_line: Optional[str]
+    personalized_opening: Optional[str]
+    revenue_hook: Optional[str]
+    social_proof: Optional[str]
+    variants: Optional[dict]
+    email_template: str
+
+    @property
+    def email_body(self) -> str:
+        """The campaign email, rendered from its shared template."""
+        return render_body(self.email_template, self)
+
+    @property
+    def html_body(self) -> Optional[str]:
+        """The HTML alternative with the open pixel, for campaigns sent with tracking."""
+        return html_email_body(self.email_body, self.pixel_url) if self.pixel_url else None
+
+    def to_draft(self) -> dict:
+        """The campaign's draft in campaign_drafts.json shape, for the send paths."""
+        from lead_scoring import lead_features, score_lead
+
+        return {
+            'business_name': self.business_name,
+            'business_type': self.business_type,
+            'email': self.email,
+            'draft_id': self.draft_id,
+            'account': self.account,
+            'subject': self.subject_line,
+            'template_used': self.business_type,
+            'location': self.location,
+            'notes': '',
+            'priority_score': score_lead(lead_features({}, self))
+        }
+
+    def to_dict(self) -> dict:
+        """The record in personalized_campaigns.json shape."""
+        record = {"business_name": self.business_name, "email": self.email,
+                  "intelligence": {"business_name": self.business_name}}
+        for name, _, path in COLUMNS:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            target = record
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+        record["email_body"] = self.email_body
+        if self.pixel_url:
+            record["html_body"] = self.html_body
+        return record
+
+
+def _lookup(record: dict, path) -> object:
+    """Follow path through nested dicts or intelligence_records objects."""
+    value = record
+    for key in path:
+        if isinstance(value, dict):
+            value = value.get(key)
+        else:
+            value = getattr(value, key, None)
+    return value
+
+
+def render_body(template: str, fields) -> str:
+    """Render a stored email template with a campaign's fields.
+
+    The body links to email_link (the landing page tagged with its campaign,
+    possibly through the click tracker); older campaigns without one link to
+    landing_url directly.
+    """
+    return template.format(
+        business_name=fields.business_name,
+        personalized_opening=fields.personalized_opening,
+        revenue_hook=fields.revenue_hook,
+        landing_url=fields.email_link or fields.landing_url,
+        monthly_revenue=fields.monthly_revenue
+    )
+
+
+class _Fields:
+    """Attribute view over a campaign dict for render_body."""
+
+    __slots__ = ("business_name", "personalized_opening", "revenue_hook", "landing_url", "email_link",
+                 "monthly_revenue")
+
+    def __init__(self, campaign: dict):
+        for name in self.__slots__:
+            path = next(path for column, _, path in COLUMNS if column == name)
+            setattr(self, name, _lookup(campaign, path))
+
+
+class CampaignStore:
+    """SQLite-backed campaign storage."""
+
+    def __init__(self, path: str = DEFAULT_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        # Template digest -> id, for templates committed to the store; ids
+        # inserted by a save still in progress wait in _new_template_ids
+        self._template_ids = {}
+        self._new_template_ids = {}
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _migrate(self) -> None:
+        """Add columns introduced since the store was created; old rows read them as None."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(campaigns)")}
+        with self.conn:
+            for name, sql_type, _ in COLUMNS:
+                if name not in columns:
+                    self.conn.execute(f"ALTER TABLE campaigns ADD COLUMN {name} {sql_type}")
+
+    def _template_id(self, template: str) -> int:
+        digest = hashlib.sha1(template.encode('utf-8')).hexdigest()
+        template_id = self._template_ids.get(digest, self._new_template_ids.get(digest))
+        if template_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO templates (digest, body) VALUES (?, ?)", (digest, template))
+            template_id = self.conn.execute("SELECT id FROM templates WHERE digest = ?", (digest,)).fetchone()[0]
+            self._new_template_ids[digest] = template_id
+        return template_id
+
+    def _template_for(self, campaign: dict) -> str:
+        """The shared template that reproduces this campaign's body, or the body itself."""
+        body = campaign.get("email_body", "")
+        config = get_config()
+        template = campaign_email_template(config.sender_name, config.sender_email, config.sender_phone)
+        try:
+            if render_body(template, _Fields(campaign)) == body:
+                return template
+        except (TypeError, ValueError):
+            pass
+        # Hand-edited or legacy body: store it verbatim as its own template
+        return body.replace('{', '{{').replace('}', '}}')
+
+    def _row(self, campaign: dict) -> tuple:
+        row = []
+        for name, _, path in COLUMNS:
+            value = _lookup(campaign, path)
+            if name in _JSON_COLUMNS and value is not None:
+                value = json.dumps(value)
+            elif name in _BOOL_COLUMNS and value is not None:
+                value = int(bool(value))
+            row.append(value)
+        row.append(self._template_id(self._template_for(campaign)))
+        return tuple(row)
+
+    def save_campaigns(self, campaigns: Iterable[dict], replace: bool = True) -> int:
+        """Store campaigns in one transaction; replace clears the previous run first."""
+        names = [name for name, _, _ in COLUMNS] + ["template_id"]
+        sql = f"INSERT INTO campaigns ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})"
+        try:
+            with self.conn:
+                if replace:
+                    self.conn.execute("DELETE FROM campaigns")
+                cursor = self.conn.executemany(sql, (self._row(campaign) for campaign in campaigns))
+            # Committed; after a rollback the new templates are gone and their ids must not be reused
+            self._template_ids.update(self._new_template_ids)
+        finally:
+            self._new_template_ids = {}
+        return cursor.rowcount
+
+    def iter_campaigns(self, where: str = "", params: tuple = ()) -> Iterator[CampaignRecord]:
+        """Stream stored campaigns as CampaignRecord objects."""
+        columns = ', '.join(f"c.{name}" for name, _, _ in COLUMNS)
+        cursor = self.conn.execute(
+            f"SELECT {columns}, t.body FROM campaigns c JOIN templates t ON t.id = c.template_id "
+            f"{('WHERE ' + where) if where else ''} ORDER BY c.id", params)
+        templates = {}
+        json_indexes = [i for i, (name, _, _) in enumerate(COLUMNS) if name in _JSON_COLUMNS]
+        bool_indexes = [i for i, (name, _, _) in enumerate(COLUMNS) if name in _BOOL_COLUMNS]
+
+        for row in cursor:
+            row = list(row)
+            for i in json_indexes:
+                if row[i] is not None:
+                    row[i] = json.loads(row[i])
+            for i in bool_indexes:
+                if row[i] is not None:
+                    row[i] = bool(row[i])
+            # Share one template string across all records that use it
+            row[-1] = templates.setdefault(row[-1], row[-1])
+            yield CampaignRecord(*row)
+
+    def load_campaigns(self) -> List[CampaignRecord]:
+        """Load every stored campaign."""
+        return list(self.iter_campaigns())
+
+    def find_by_email(self, email: str) -> List[CampaignRecord]:
+        return list(self.iter_campaigns("c.email = ?", (email,)))
+
+
+def save_campaigns(campaigns: Iterable[dict], path: str = DEFAULT_DB, replace: bool = True) -> int:
+    """Store a campaign run, replacing the previous one unless replace is False."""
+    store = CampaignStore(path)
+    try:
+        return store.save_campaigns(campaigns, replace)
+    finally:
+        store.close()
+
+
+def load_campaigns(path: str = DEFAULT_DB) -> List[CampaignRecord]:
+    """Load all campaigns from a store."""
+    store = CampaignStore(path)
+    try:
+        return store.load_campaigns()
+    finally:
+        store.close()
+
+
+def load_campaign_drafts(path: str = DEFAULT_DB) -> List[dict]:
+    """Drafts of the stored campaigns (see CampaignRecord.to_draft); empty if there is no store."""
+    if not os.path.exists(path):
+        return []
+    store = CampaignStore(path)
+    try:
+        return [record.to_draft() for record in store.iter_campaigns("c.draft_id IS NOT NULL")]
+    finally:
+        store.close()
+
+
+def main():
+    """Import or export personalized_campaigns.json."""
+    if len(sys.argv) < 2 or sys.argv[1] not in ('import', 'export'):
+        print("Usage: python campaign_store.py import|export [personalized_campaigns.json] [campaigns.db]")
+        return
+
+    json_path = sys.argv[2] if len(sys.argv) > 2 else 'personalized_campaigns.json'
+    db_path = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DB
+
+    if sys.argv[1] == 'import':
+        with open(json_path, 'r') as f:
+            campaigns = json.load(f)
+        count = save_campaigns(campaigns, db_path)
+        print(f"Imported {count} campaigns into {db_path}")
+    else:
+        with open(json_path, 'w') as f:
+            json.dump([record.to_dict() for record in load_campaigns(db_path)], f, indent=2)
+        print(f"Exported campaigns from {db_path} to {json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Outbound CLI
+Single entry point for the outreach tools:
+
+    python cli.py intelligence|drafts|send|plan|gc|snapshot|status|reconcile|bench|serve ...
+
+Each subcommand imports only the modules it uses, so quick commands like
+status don't pay for the Google client stack. Sender details and other
+settings come from config.py (outreach_config.json / OUTBOUND_* env vars).
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional
+
+PROG = 'cli.py'
+
+
+def cmd_intelligence(args) -> int:
+    """Print intelligence reports for one business or every prospect."""
+    from business_intelligence import BusinessIntelligence
+
+    if args.name:
+        if not args.type or not args.location:
+            print("intelligence NAME needs --type and --location")
+            return 2
+        businesses = [(args.name, args.type, args.location)]
+    else:
+        from business_types import resolve_business_type
+        # campaign_sharding, not outreach_campaign: reading the prospects
+        # shouldn't import the Gmail, scoring and sequence modules
+        from campaign_sharding import enumerate_prospects, load_business_prospects
+        businesses = [(business['name'], resolve_business_type(category), business['location'])
+                      for _, category, business in enumerate_prospects(load_business_prospects())
+                      if resolve_business_type(category)]
+
+    bi = BusinessIntelligence()
+    for name, business_type, location in businesses:
+        report = bi.generate_report(name, business_type, location)
+        if args.json:
+            print(json.dumps(report.to_dict()))
+        else:
+            revenue = report.revenue_projections
+            print(f"{name} ({business_type}, {location}): ${revenue.monthly_revenue:,}/month, "
+                  f"{report.reviews_analysis.curiosity_mentions} curiosity mentions, "
+                  f"interest {report.location_demand.local_interest_score}")
+    return 0
+
+
+def cmd_drafts(args) -> int:
+    """Create campaign drafts (template emails, or personalized campaigns)."""
+    from campaign_sharding import ShardError
+    from email_validation import EmailValidator
+
+    validator = EmailValidator(check_mx=not args.no_mx)
+    if args.personalized:
+        from integrated_outreach import create_full_campaign
+
+        os.makedirs('landing_pages', exist_ok=True)
+        experiment = None
+        if args.experiment:
+            from subject_experiments import SubjectExperiment
+            experiment = SubjectExperiment.load()
+        try:
+            create_full_campaign(workers=args.workers, experiment=experiment, validator=validator)
+        except ShardError as e:
+            print(f"Campaign creation incomplete: {e}")
+            return 1
+        finally:
+            if experiment is not None:
+                experiment.save()
+    else:
+        from outreach_campaign import create_campaign_drafts
+        try:
+            create_campaign_drafts(workers=args.workers, validator=validator)
+        except ShardError as e:
+            print(f"Draft creation incomplete: {e}")
+            return 1
+    return 0
+
+
+def cmd_send(argv: List[str]) -> int:
+    import send_drafts
+    return send_drafts.main(argv, prog=f"{PROG} send")
+
+
+def cmd_plan(argv: List[str]) -> int:
+    import send_planner
+    return send_planner.main(argv, prog=f"{PROG} plan")
+
+
+def cmd_gc(argv: List[str]) -> int:
+    import draft_gc
+    return draft_gc.main(argv, prog=f"{PROG} gc")
+
+
+def cmd_snapshot(argv: List[str]) -> int:
+    import run_snapshots
+    return run_snapshots.main(argv, prog=f"{PROG} snapshot")
+
+
+def cmd_status(args) -> int:
+    """Summarize drafts, sends, follow-up sequences, suppressions and engagement."""
+    try:
+        with open('campaign_drafts.json', 'r') as f:
+            drafts = json.load(f)
+    except FileNotFoundError:
+        print("No campaign drafts found. Run: python cli.py drafts")
+        return 1
+
+    by_type = {}
+    for draft in drafts:
+        by_type[draft['business_type']] = by_type.get(draft['business_type'], 0) + 1
+    print(f"Drafts: {len(drafts)}")
+    for business_type, count in sorted(by_type.items()):
+        print(f"  {business_type}: {count}")
+
+    from send_drafts import JOURNAL_FILE, SendJournal
+    if os.path.exists(JOURNAL_FILE):
+        journal = SendJournal(JOURNAL_FILE)
+        journal.close()
+        states = {}
+        for state in journal.states.values():
+            states[state] = states.get(state, 0) + 1
+        print("Sends: " + ', '.join(f"{count} {state}" for state, count in sorted(states.items())))
+        if journal.in_doubt():
+            print("  (run 'python cli.py reconcile' to settle interrupted sends)")
+
+    from sequence_engine import SEQUENCES_DB, SequenceEngine
+    if os.path.exists(SEQUENCES_DB):
+        engine = SequenceEngine()
+        counts = engine.status_counts()
+        engine.close()
+        print("Sequences: " + ', '.join(f"{count} {status}" for status, count in sorted(counts.items())))
+
+    from suppression import SUPPRESSION_DB
+    if os.path.exists(SUPPRESSION_DB):
+        # Count directly rather than loading the list's Bloom filter
+        import sqlite3
+        conn = sqlite3.connect(SUPPRESSION_DB)
+        print(f"Suppressed: {conn.execute('SELECT COUNT(*) FROM suppressions').fetchone()[0]}")
+        conn.close()
+
+    from event_ingest import EVENT_TYPES, EVENTS_DIR, Rollups
+    if os.path.isdir(EVENTS_DIR):
+        totals = {}
+        for counts in Rollups.load(EVENTS_DIR).slugs.values():
+            for event_type, count in counts.items():
+                totals[event_type] = totals.get(event_type, 0) + count
+        print("Engagement: " + ', '.join(f"{totals.get(t, 0)} {t}" for t in EVENT_TYPES))
+    return 0
+
+
+def cmd_reconcile(args) -> int:
+    """Settle sends left in doubt by an interrupted run against the mailbox."""
+    from send_drafts import SendJournal
+
+    journal = SendJournal(args.journal)
+    try:
+        if not journal.in_doubt():
+            print("Nothing to reconcile")
+            return 0
+        from gmail_sender import GmailSender
+        sender = GmailSender.from_config()
+        for draft_id, state in journal.reconcile(draft['id'] for draft in sender.list_drafts()).items():
+            print(f"  {draft_id}: {state}")
+    finally:
+        journal.close()
+    return 0
+
+
+def cmd_bench(argv: List[str]) -> int:
+    import benchmark
+    benchmark.main(argv, prog=f"{PROG} bench")
+    return 0
+
+
+def cmd_serve(args) -> int:
+    """Serve the static site and landing pages, with event ingestion under /t/."""
+    from event_ingest import EventStore, make_server
+
+    store = EventStore(args.events).start()
+    server = make_server(args.host, args.port, args.directory, store)
+    print(f"Serving {os.path.abspath(args.directory)} on http://{args.host}:{args.port}/ "
+          f"(events in {os.path.abspath(args.events)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=PROG, description="Outbound outreach tools")
+    subcommands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    subcommands.required = True
+
+    intelligence = subcommands.add_parser('intelligence', help="business intelligence reports")
+    intelligence.add_argument('name', nargs='?', help="business name (default: every prospect)")
+    intelligence.add_argument('--type', help="business type, e.g. bakery")
+    intelligence.add_argument('--location', help='"City, ST"')
+    intelligence.add_argument('--json', action='store_true', help="print full reports as JSON lines")
+    intelligence.set_defaults(handler=cmd_intelligence)
+
+    drafts = subcommands.add_parser('drafts', help="create campaign drafts for all prospects")
+    drafts.add_argument('--personalized', action='store_true',
+                        help="intelligence-driven emails with landing pages (integrated_outreach)")
+    drafts.add_argument('--workers', type=int, default=1, help="shard across this many processes")
+    drafts.add_argument('--experiment', action='store_true', help="A/B test subject lines (with --personalized)")
+    drafts.add_argument('--no-mx', action='store_true', help="skip MX lookups when validating emails")
+    drafts.set_defaults(handler=cmd_drafts)
+
+    # send, plan, gc, snapshot and bench are dispatched by main() straight to their modules;
+    # they are listed here for --help
+    subcommands.add_parser('send', help="send drafts non-interactively (see: send --help)")
+    subcommands.add_parser('plan', help="plan and pace sends within account quotas (see: plan --help)")
+
+    status = subcommands.add_parser('status', help="campaign, send, sequence and engagement status")
+    status.set_defaults(handler=cmd_status)
+
+    subcommands.add_parser('gc', help="delete orphaned and duplicate drafts (see: gc --help)")
+    subcommands.add_parser('snapshot', help="take, list and compare run snapshots (see: snapshot --help)")
+
+    reconcile = subcommands.add_parser('reconcile', help="settle sends interrupted mid-flight")
+    reconcile.add_argument('--journal', default='send_journal.jsonl')
+    reconcile.set_defaults(handler=cmd_reconcile)
+
+    subcommands.add_parser('bench', help="run the benchmark suite (see: bench --help)")
+
+    serve = subcommands.add_parser('serve', help="serve the site and landing pages locally")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8000)
+    serve.add_argument('--directory', default='.')
+    serve.add_argument('--events', default='events', help="directory for event logs and rollups")
+    serve.set_defaults(handler=cmd_serve)
+
+    return parser
+
+
+# Subcommands that own their argument parsing
+PASSTHROUGH = {'send': cmd_send, 'plan': cmd_plan, 'gc': cmd_gc, 'snapshot': cmd_snapshot, 'bench': cmd_bench}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in PASSTHROUGH:
+        return PASSTHROUGH[argv[0]](argv[1:])
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Outreach Configuration
+One place for the sender identity and deployment settings. Values come
+from the built-in defaults, then outreach_config.json, then OUTBOUND_*
+environment variables (e.g. OUTBOUND_SENDER_EMAIL), later sources winning.
+"""
+
+import json
+import os
+from dataclasses import dataclass, fields
+from typing import Optional
+
+CONFIG_FILE = 'outreach_config.json'
+ENV_PREFIX = 'OUTBOUND_'
+
+
+@dataclass
+class Config:
+    __slots__ = ("sender_name", "sender_email", "sender_phone", "landing_base_url", "transport_url",
+                 "tracking_base_url")
+
+    sender_name: str
+    sender_email: str
+    sender_phone: str
+    # Landing pages are published under this URL
+    landing_base_url: str
+    # Non-Gmail transport for sends, e.g. "smtp://localhost:8025" (see mail_transport.create_transport)
+    transport_url: Optional[str]
+    # Where event_ingest.py is reachable; when set, email links go through its click redirect
+    tracking_base_url: Optional[str]
+
+
+DEFAULTS = {
+    "sender_name": "Sameera",
+    "sender_email": "sameeramudigonda@gmail.com",
+    "sender_phone": "+1 (916) 607-8474",
+    "landing_base_url": "https://outbound.com",
+    "transport_url": None,
+    "tracking_base_url": None
+}
+
+
+def load_config(path: str = CONFIG_FILE) -> Config:
+    """Build a Config from defaults, the config file (if present) and the environment."""
+    values = dict(DEFAULTS)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            file_values = json.load(f)
+        unknown = set(file_values) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown settings in {path}: {', '.join(sorted(unknown))}")
+        values.update(file_values)
+    for field in fields(Config):
+        env_value = os.environ.get(ENV_PREFIX + field.name.upper())
+        if env_value is not None:
+            values[field.name] = env_value
+    return Config(**values)
+
+
+_config: Optional[Config] = None
+
+
+def get_config() -> Config:
+    """The shared configuration, loaded on first use."""
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Draft Garbage Collection
+Every run of create_campaign_drafts() creates a fresh set of drafts and
+overwrites campaign_drafts.json, so the drafts from earlier runs are left in
+the mailbox with nothing pointing at them. This compares the mailbox's
+drafts with the local campaign records and deletes:
+
+    orphan     a campaign draft to a known prospect that no local record references
+    duplicate  an unreferenced copy (same recipient and subject) of a draft
+               that a local record does reference
+
+Only drafts the campaign tooling provably created are deleted: those
+carrying the X-Outbound-Campaign header, those whose ID a run snapshot,
+the send journal or the tombstone log has seen, and (for drafts made before
+the header existed) those whose subject a campaign template produces.
+Other unreferenced drafts to prospects, such as replies written by hand,
+are reported as unrecognized and left alone, as are drafts to anyone who
+is not a prospect. Local records
+whose draft has vanished (and that the send journal does not show as sent)
+are reported as missing and dropped from campaign_drafts.json.
+
+Headers are fetched and drafts deleted in batches, from several threads,
+under a shared rate limit. Every deletion is appended to a tombstone log,
+and deleted or missing drafts are dropped from the subject experiment's
+pending assignments so they are never counted as sends.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from send_drafts import CLAIMED, DRAFTS_FILE, JOURNAL_FILE, SENT, SendJournal
+from subject_experiments import EXPERIMENTS_FILE, SubjectExperiment
+
+TOMBSTONE_FILE = 'draft_tombstones.jsonl'
+
+ORPHAN = 'orphan'
+DUPLICATE = 'duplicate'
+MISSING = 'missing'
+UNRECOGNIZED = 'unrecognized'
+
+# Gmail allows 250 quota units per user per second; draft reads cost 5 units
+# and deletes 10. Stay under the limit with some headroom.
+QUOTA_UNITS_PER_SECOND = 200
+GET_COST = 5
+DELETE_COST = 10
+
+BATCH_SIZE = 50
+MAX_RETRIES = 5
+
+
+class RateLimiter:
+    """Token bucket shared by worker threads, in Gmail quota units."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, units: float) -> None:
+        """Block until units are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # A request bigger than the bucket waits for a full bucket, then overdraws it
+                if self.tokens >= min(units, self.capacity):
+                    self.tokens -= units
+                    return
+                wait = (min(units, self.capacity) - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class TombstoneLog:
+    """Append-only JSON-lines record of deleted drafts and dropped records."""
+
+    def __init__(self, path: str = TOMBSTONE_FILE):
+        self.path = path
+        self.draft_ids: Set[str] = self.read(path)
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def read(path: str = TOMBSTONE_FILE) -> Set[str]:
+        """Draft IDs already in the log at path."""
+        draft_ids = set()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        draft_ids.add(json.loads(line)["draft_id"])
+                    except (ValueError, KeyError):
+                        # A torn last line from a crash mid-write
+                        continue
+        return draft_ids
+
+    def close(self) -> None:
+        self._file.close()
+
+    def record(self, entries: Iterable[dict]) -> None:
+        """Append a batch of entries and flush them to disk before returning."""
+        now = time.time()
+        with self._lock:
+            for entry in entries:
+                self._file.write(json.dumps(dict(entry, at=now)) + '\n')
+                self.draft_ids.add(entry["draft_id"])
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+
+def _normalize(email: str) -> str:
+    return email.strip().lower()
+
+
+def local_references(drafts: List[dict], campaign_db: Optional[str], journal: Optional[SendJournal]) -> Set[str]:
+    """Draft IDs some local record still points at (or that a send has in flight)."""
+    references = {draft['draft_id'] for draft in drafts if draft.get('draft_id')}
+    if campaign_db and os.path.exists(campaign_db):
+        from campaign_store import CampaignStore
+        store = CampaignStore(campaign_db)
+        try:
+            references.update(record.draft_id for record in store.iter_campaigns() if record.draft_id)
+        finally:
+            store.close()
+    if journal is not None:
+        references.update(journal.in_doubt())
+    return references
+
+
+def known_recipients(drafts: List[dict], campaign_db: Optional[str]) -> Set[str]:
+    """Every address our campaigns could have drafted to."""
+    from campaign_sharding import enumerate_prospects, load_business_prospects
+
+    recipients = {_normalize(draft['email']) for draft in drafts}
+    try:
+        recipients.update(_normalize(business['email'])
+                          for _, _, business in enumerate_prospects(load_business_prospects()))
+    except FileNotFoundError:
+        pass
+    if campaign_db and os.path.exists(campaign_db):
+        from campaign_store import CampaignStore
+        store = CampaignStore(campaign_db)
+        try:
+            recipients.update(_normalize(record.email) for record in store.iter_campaigns())
+        finally:
+            store.close()
+    return recipients
+
+
+def historical_draft_ids(journal: Optional[SendJournal], tombstone_file: Optional[str],
+                         snapshot_dir: Optional[str]) -> Set[str]:
+    """Every draft ID a past run recorded: in run snapshots, the send journal or the tombstone log."""
+    draft_ids = set(journal.states) if journal is not None else set()
+    if tombstone_file:
+        draft_ids.update(TombstoneLog.read(tombstone_file))
+    if snapshot_dir:
+        from run_snapshots import iter_snapshot, list_snapshots
+        for _, path in list_snapshots(snapshot_dir):
+            try:
+                for record in iter_snapshot(path):
+                    draft_ids.update(record.get(key) for key in ("draft_id", "campaign_draft_id"))
+            except (OSError, ValueError):
+                # An unreadable, truncated or older-format snapshot just proves nothing
+                # more (iter_snapshot raises ValueError for a file cut short)
+                continue
+    draft_ids.discard(None)
+    return draft_ids
+
+
+def campaign_subject_patterns() -> List[re.Pattern]:
+    """Subjects the campaign templates produce, with each {field} matching anything."""
+    from string import Formatter
+
+    from business_types import BUSINESS_TYPES, DEFAULT_SUBJECT_VARIANTS
+    from email_templates import DEFAULT_EMAIL_TEMPLATE, EMAIL_TEMPLATES
+
+    templates = {template["subject"] for template in EMAIL_TEMPLATES.values()}
+    templates.add(DEFAULT_EMAIL_TEMPLATE["subject"])
+    templates.update(DEFAULT_SUBJECT_VARIANTS.values())
+    for business_type in BUSINESS_TYPES.values():
+        templates.update(business_type.subject_variants.values())
+    patterns = []
+    for template in sorted(templates):
+        regex = ''.join(re.escape(literal) + ('.+' if field is not None else '')
+                        for literal, field, _, _ in Formatter().parse(template))
+        patterns.append(re.compile(regex + r'\Z', re.IGNORECASE))
+    return patterns
+
+
+def is_campaign_draft(draft_id: str, headers: dict, known_draft_ids: Set[str],
+                      subject_patterns: Iterable[re.Pattern] = ()) -> bool:
+    """Whether the campaign tooling provably created this draft."""
+    if headers.get('campaign') or draft_id in known_draft_ids:
+        return True
+    subject = headers['subject'].strip()
+    return any(pattern.match(subject) for pattern in subject_patterns)
+
+
+def find_garbage(mailbox: Dict[str, dict], references: Set[str], recipients: Set[str],
+                 known_draft_ids: Set[str] = frozenset(),
+                 subject_patterns: Iterable[re.Pattern] = ()) -> List[Tuple[str, str, dict]]:
+    """(draft_id, reason, headers) for each unreferenced draft to a known prospect.
+
+    An unreferenced campaign draft (see is_campaign_draft) is a duplicate
+    when a referenced draft has the same recipients and subject, and an
+    orphan otherwise. Any other unreferenced draft to a prospect is
+    unrecognized: reported, never deleted.
+    """
+    def key(headers: dict) -> tuple:
+        return tuple(sorted(headers['to'])), headers['subject'].strip().lower()
+
+    subject_patterns = list(subject_patterns)
+    kept = {key(headers) for draft_id, headers in mailbox.items() if draft_id in references}
+    garbage = []
+    for draft_id, headers in sorted(mailbox.items(), key=lambda item: item[1].get('date') or 0):
+        if draft_id in references or not headers['to']:
+            continue
+        if not all(address in recipients for address in headers['to']):
+            continue
+        if not is_campaign_draft(draft_id, headers, known_draft_ids, subject_patterns):
+            garbage.append((draft_id, UNRECOGNIZED, headers))
+        else:
+            garbage.append((draft_id, DUPLICATE if key(headers) in kept else ORPHAN, headers))
+    return garbage
+
+
+class DraftCollector:
+    """Scans and deletes drafts with batched, rate-limited, concurrent requests.
+
+    Each worker thread builds its own sender with sender_factory (Gmail API
+    clients are not thread-safe); all threads share one RateLimiter.
+    """
+
+    def __init__(self,
+                 sender_factory: Optional[Callable] = None,
+                 workers: int = 4,
+                 batch_size: int = BATCH_SIZE,
+                 rate: float = QUOTA_UNITS_PER_SECOND):
+        if sender_factory is None:
+            from gmail_sender import GmailSender
+            sender_factory = GmailSender.from_config
+        self.sender_factory = sender_factory
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.limiter = RateLimiter(rate)
+        self._local = threading.local()
+
+    def _sender(self):
+        sender = getattr(self._local, 'sender', None)
+        if sender is None:
+            sender = self._local.sender = self.sender_factory()
+        return sender
+
+    def _batches(self, draft_ids: List[str]) -> List[List[str]]:
+        return [draft_ids[start:start + self.batch_size] for start in range(0, len(draft_ids), self.batch_size)]
+
+    def _with_retries(self, operation: Callable, cost: int, batch: List[str]):
+        from mail_transport import is_quota_error
+
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire(cost * len(batch))
+            try:
+                return operation(batch)
+            except Exception as e:
+                if not is_quota_error(e) or attempt == MAX_RETRIES:
+                    raise
+                time.sleep(2 ** attempt)
+
+    def _headers_batch(self, batch: List[str]) -> Dict[str, dict]:
+        return self._with_retries(self._sender().draft_headers, GET_COST, batch)
+
+    def _delete_batch(self, batch: List[str]) -> Dict[str, Optional[Exception]]:
+        """Delete a batch, retrying the drafts that were rate limited."""
+        from mail_transport import is_missing_draft_error, is_quota_error
+
+        results = {}
+        for attempt in range(MAX_RETRIES + 1):
+            errors = self._with_retries(self._sender().delete_drafts, DELETE_COST, batch)
+            batch = []
+            for draft_id, error in errors.items():
+                if error is not None and is_quota_error(error) and attempt < MAX_RETRIES:
+                    batch.append(draft_id)
+                else:
+                    # A draft that is already gone counts as deleted
+                    results[draft_id] = None if error is None or is_missing_draft_error(error) else error
+            if not batch:
+                break
+            time.sleep(2 ** attempt)
+        return results
+
+    def scan(self) -> Dict[str, dict]:
+        """Headers of every draft in the mailbox."""
+        draft_ids = [draft['id'] for draft in self._sender().list_drafts()]
+        mailbox = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for headers in executor.map(self._headers_batch, self._batches(draft_ids)):
+                mailbox.update(headers)
+        return mailbox
+
+    def delete(self, garbage: List[Tuple[str, str, dict]], tombstones: TombstoneLog) -> Dict[str, Exception]:
+        """Delete garbage drafts, tombstoning each batch as it completes; returns the failures."""
+        details = {draft_id: (reason, headers) for draft_id, reason, headers in garbage}
+        failures = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            batches = self._batches(list(details))
+            for batch, results in zip(batches, executor.map(self._delete_batch, batches)):
+                entries = []
+                for draft_id in batch:
+                    error = results.get(draft_id)
+                    if error is not None:
+                        failures[draft_id] = error
+                        continue
+                    reason, headers = details[draft_id]
+                    entries.append({"draft_id": draft_id, "reason": reason,
+                                    "to": headers['to'], "subject": headers['subject']})
+                tombstones.record(entries)
+        return failures
+
+
+def collect_garbage(dry_run: bool = False,
+                    collector: Optional[DraftCollector] = None,
+                    drafts_file: str = DRAFTS_FILE,
+                    campaign_db: Optional[str] = 'campaigns.db',
+                    journal_file: str = JOURNAL_FILE,
+                    tombstone_file: str = TOMBSTONE_FILE,
+                    snapshot_dir: Optional[str] = 'snapshots',
+                    experiment_file: Optional[str] = EXPERIMENTS_FILE) -> Dict[str, int]:
+    """Find and (unless dry_run) delete orphaned and duplicate campaign drafts."""
+    collector = collector if collector is not None else DraftCollector()
+    try:
+        with open(drafts_file, 'r') as f:
+            drafts = json.load(f)
+    except FileNotFoundError:
+        drafts = []
+
+    journal = SendJournal(journal_file) if os.path.exists(journal_file) else None
+    try:
+        references = local_references(drafts, campaign_db, journal)
+        known_draft_ids = historical_draft_ids(journal, tombstone_file, snapshot_dir)
+        sent_or_sending = {draft_id for draft_id, state in (journal.states.items() if journal else ())
+                           if state in (SENT, CLAIMED)}
+    finally:
+        if journal is not None:
+            journal.close()
+
+    print("Scanning drafts...")
+    mailbox = collector.scan()
+    garbage = find_garbage(mailbox, references, known_recipients(drafts, campaign_db),
+                           known_draft_ids, campaign_subject_patterns())
+    unrecognized = [entry for entry in garbage if entry[1] == UNRECOGNIZED]
+    garbage = [entry for entry in garbage if entry[1] != UNRECOGNIZED]
+    missing = [draft for draft in drafts
+               if draft['draft_id'] not in mailbox and draft['draft_id'] not in sent_or_sending]
+    if missing and len(missing) == len(drafts):
+        # Not one local draft is in this mailbox: most likely the wrong account, not lost drafts
+        print(f"⚠️  None of the {len(drafts)} local drafts are in this mailbox; keeping the local records")
+        missing = []
+
+    counts = {"drafts": len(mailbox), ORPHAN: 0, DUPLICATE: 0, MISSING: len(missing),
+              UNRECOGNIZED: len(unrecognized), "deleted": 0, "failed": 0}
+    for _, reason, _ in garbage:
+        counts[reason] += 1
+    print(f"{len(mailbox)} drafts in the mailbox, {len(references)} referenced locally")
+    print(f"  {counts[ORPHAN]} orphaned, {counts[DUPLICATE]} duplicates, "
+          f"{counts[MISSING]} local records whose draft is gone")
+    if unrecognized:
+        # Possibly the user's own mail to a prospect: report, never delete
+        print(f"  {len(unrecognized)} drafts to prospects not created by a campaign (kept):")
+        for draft_id, _, headers in unrecognized:
+            print(f"    {draft_id}: {', '.join(headers['to'])} - {headers['subject']}")
+
+    if dry_run:
+        for draft_id, reason, headers in garbage:
+            print(f"  would delete {draft_id} ({reason}): {', '.join(headers['to'])} - {headers['subject']}")
+        for draft in missing:
+            print(f"  would drop record {draft['draft_id']} ({MISSING}): {draft['email']}")
+        return counts
+
+    tombstones = TombstoneLog(tombstone_file)
+    try:
+        failures = collector.delete(garbage, tombstones)
+        for draft_id, error in failures.items():
+            print(f"  ✗ Failed to delete {draft_id}: {error}")
+        counts["failed"] = len(failures)
+        counts["deleted"] = len(garbage) - len(failures)
+
+        if missing:
+            tombstones.record({"draft_id": draft['draft_id'], "reason": MISSING,
+                               "to": [draft['email']], "subject": draft.get('subject', '')} for draft in missing)
+            dropped = {draft['draft_id'] for draft in missing}
+            tmp_path = drafts_file + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump([draft for draft in drafts if draft['draft_id'] not in dropped], f, indent=2)
+            os.replace(tmp_path, drafts_file)
+    finally:
+        tombstones.close()
+
+    experiment = SubjectExperiment.load_existing(experiment_file) if experiment_file else None
+    if experiment is not None:
+        gone = [draft_id for draft_id, _, _ in garbage if draft_id not in failures]
+        if experiment.discard_drafts(gone + [draft['draft_id'] for draft in missing]):
+            experiment.save(experiment_file)
+
+    print(f"🗑️  Deleted {counts['deleted']} drafts, dropped {counts[MISSING]} stale records"
+          + (f", {counts['failed']} failed" if counts['failed'] else ""))
+    return counts
+
+
+def build_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description="Delete orphaned and duplicate campaign drafts.")
+    parser.add_argument('--dry-run', action='store_true', help="report what would be deleted without deleting")
+    parser.add_argument('--workers', type=int, default=4, help="concurrent batch requests (default 4)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f"drafts per batch (default {BATCH_SIZE})")
+    parser.add_argument('--rate', type=float, default=QUOTA_UNITS_PER_SECOND,
+                        help=f"Gmail quota units per second (default {QUOTA_UNITS_PER_SECOND})")
+    parser.add_argument('--drafts', default=DRAFTS_FILE, help=f"drafts file (default {DRAFTS_FILE})")
+    parser.add_argument('--tombstones', default=TOMBSTONE_FILE, help=f"tombstone log (default {TOMBSTONE_FILE})")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None) -> int:
+    args = build_parser(prog).parse_args(argv)
+    collector = DraftCollector(workers=args.workers, batch_size=args.batch_size, rate=args.rate)
+    counts = collect_garbage(args.dry_run, collector, drafts_file=args.drafts, tombstone_file=args.tombstones)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,12 +3,16 @@ High-conversion cold email templates for different business types.
 These templates address trust, value, and operational concerns.
 """
 
+import html
+
+from business_types import get_business_type
+
 EMAIL_TEMPLATES = {
     "coffee_roaster": {
         "subject": "Partnership opportunity: Outbound platform launch",
         "body": """Hi {business_name} team,
 
-I'm Sameera, founder of Outbound - a new platform where people can book real, behind-the-scenes experiences at local businesses.
+I'm {sender_name}, founder of Outbound - a new platform where people can book real, behind-the-scenes experiences at local businesses.
 
 Coffee lovers are endlessly curious about roasting. They want to watch the beans transform, smell the aromas, see the timing and precision that goes into each batch. But they rarely get the chance to just... observe.
 
@@ -33,7 +37,7 @@ Founder, Outbound
         "subject": "Outbound platform - early partner invitation",
         "body": """Hi {business_name},
 
-I'm Sameera, founder of Outbound - a platform where people can book behind-the-scenes experiences at local businesses.
+I'm {sender_name}, founder of Outbound - a platform where people can book behind-the-scenes experiences at local businesses.
 
 Baking enthusiasts are fascinated by your process. They want to watch dough transform, see timing techniques, observe the craft that creates those perfect loaves. But they rarely get to just... watch.
 
@@ -58,7 +62,7 @@ Founder, Outbound
         "subject": "Behind-the-scenes experiences platform - invitation",
         "body": """Hi {business_name},
 
-I'm Sameera, founder of Outbound - a platform where people book behind-the-scenes experiences at local businesses.
+I'm {sender_name}, founder of Outbound - a platform where people book behind-the-scenes experiences at local businesses.
 
 Flower arrangement is endlessly fascinating to watch. People are curious about color choices, stem techniques, how you build those stunning compositions. But they rarely get to just... observe the process.
 
@@ -83,7 +87,7 @@ Founder, Outbound
         "subject": "Partnership opportunity: Outbound experiences platform",
         "body": """Hi {business_name},
 
-I'm Sameera, founder of Outbound - a platform where people book behind-the-scenes experiences at local businesses.
+I'm {sender_name}, founder of Outbound - a platform where people book behind-the-scenes experiences at local businesses.
 
 Beer enthusiasts are endlessly curious about brewing. They want to watch the mashing, see fermentation in action, observe the precise timing that creates great beer. But beyond formal tours, they rarely get to just... watch.
 
@@ -108,7 +112,7 @@ Founder, Outbound
         "subject": "Early invitation: Outbound platform launch",
         "body": """Hi {business_name},
 
-I'm Sameera, founder of Outbound - a platform where people book behind-the-scenes experiences at local businesses.
+I'm {sender_name}, founder of Outbound - a platform where people book behind-the-scenes experiences at local businesses.
 
 Tea preparation is naturally meditative to watch. People are curious about steeping techniques, blending processes, the mindful ritual of creating the perfect cup. But they rarely get to just... observe.
 
@@ -133,7 +137,7 @@ Founder, Outbound
         "subject": "Artisan business partnership - Outbound platform",
         "body": """Hi {business_name},
 
-I'm Sameera, founder of Outbound - a platform where people book behind-the-scenes experiences at local businesses.
+I'm {sender_name}, founder of Outbound - a platform where people book behind-the-scenes experiences at local businesses.
 
 Chocolate lovers are fascinated by bean-to-bar transformation. They want to watch beans roasting, see grinding techniques, observe the magic that turns cacao into chocolate. But they rarely get to just... watch.
 
@@ -155,15 +159,139 @@ Founder, Outbound
     }
 }
 
+# Initial email for registered business types without their own entry above;
+# {business_label} and {hourly_rate} come from the business type registry
+DEFAULT_EMAIL_TEMPLATE = {
+    "subject": "Outbound platform - behind-the-scenes partner invitation",
+    "body": """Hi {business_name},
+
+I'm {sender_name}, founder of Outbound - a platform where people can book behind-the-scenes experiences at local businesses.
+
+People are endlessly curious about how a {business_label} works. They want to see the skill, the timing and the care that go into what you make. But they rarely get the chance to just... watch.
+
+Here's the concept: curious guests book 1-hour slots to quietly observe your team during regular operations. No instruction needed - just behind-the-scenes access.
+
+You pick a one-hour slot at a quiet time. A paying guest books that time to observe your work - safely from a designated area. You earn around ${hourly_rate} per hour, and we handle scheduling, payment and promotion.
+
+Simple: they watch, you work normally. No teaching, no disruption to your process.
+
+Would you be open to a quick 10-minute chat this week?
+
+Best regards,
+{sender_name}
+Founder, Outbound
+{sender_email}
+{sender_phone}"""
+}
+
+# Personalized campaign email; campaign_store keeps this once and re-renders
+# bodies from each campaign's fields.
+CAMPAIGN_EMAIL_TEMPLATE = """Hi {business_name},
+
+{personalized_opening}
+
+I'm {sender_name}, founder of Outbound - a platform where people book behind-the-scenes experiences at local businesses.
+
+{revenue_hook}.
+
+Want to see how? I created a personalized revenue calculator just for {business_name}:
+👉 {landing_url}
+
+Takes 2 minutes to see your specific setup analysis and projected earnings.
+
+Many similar businesses are already earning ${monthly_revenue:,}/month - they love the effortless additional income while sharing their craft.
+
+Best,
+{sender_name}
+Founder, Outbound
+{sender_email}
+{sender_phone}"""
+
+# Follow-up touches sent by sequence_engine after the first email.
+# {original_subject} threads the follow-up under the first message.
+FOLLOW_UP_TEMPLATES = {
+    "follow_up_1": {
+        "subject": "Re: {original_subject}",
+        "body": """Hi {business_name},
+
+Just following up on my note from earlier this week about Outbound.
+
+The short version: guests book a one-hour slot to quietly watch your team at work, you keep working as normal, and you earn for every hour hosted. We handle scheduling, payment and promotion.
+
+Would a quick 10-minute call this week or next work for you?
+
+Best,
+{sender_name}
+Founder, Outbound
+{sender_email}
+{sender_phone}"""
+    },
+
+    "follow_up_2": {
+        "subject": "Re: {original_subject}",
+        "body": """Hi {business_name},
+
+I know things get busy, so this will be my last note for now.
+
+If hosting curious guests behind the scenes ever sounds interesting, just reply to this email and I'll send over the details - no commitment needed.
+
+Thanks for your time,
+{sender_name}
+Founder, Outbound
+{sender_email}
+{sender_phone}"""
+    }
+}
+
+def campaign_email_template(sender_name, sender_email, sender_phone):
+    """CAMPAIGN_EMAIL_TEMPLATE with the sender filled in and the per-business fields left as placeholders."""
+    def literal(value):
+        return value.replace('{', '{{').replace('}', '}}')
+    
+    return (CAMPAIGN_EMAIL_TEMPLATE
+            .replace('{sender_name}', literal(sender_name))
+            .replace('{sender_email}', literal(sender_email))
+            .replace('{sender_phone}', literal(sender_phone)))
+
+def html_email_body(body, pixel_url):
+    """HTML alternative of a plain-text email body, carrying the open-tracking pixel."""
+    return (f'<div style="white-space: pre-wrap">{html.escape(body)}</div>'
+            f'<img src="{html.escape(pixel_url)}" width="1" height="1" alt="">')
+
 # Template customization function
 def customize_template(business_type, business_name, sender_name, sender_email, sender_phone):
-    """Customize email template for specific business."""
+    """Customize email template for specific business.
+    
+    Registered business types without their own EMAIL_TEMPLATES entry get
+    DEFAULT_EMAIL_TEMPLATE.
+    """
+    registered = get_business_type(business_type)
     template = EMAIL_TEMPLATES.get(business_type)
     if not template:
-        raise ValueError(f"No template found for business type: {business_type}")
+        if registered is None:
+            raise ValueError(f"No template found for business type: {business_type}")
+        template = DEFAULT_EMAIL_TEMPLATE
     
     return {
         "subject": template["subject"],
+        "body": template["body"].format(
+            business_name=business_name,
+            sender_name=sender_name,
+            sender_email=sender_email,
+            sender_phone=sender_phone,
+            business_label=registered.label if registered else business_type,
+            hourly_rate=registered.hourly_rate if registered else ""
+        )
+    }
+
+def customize_follow_up(template_name, business_name, original_subject, sender_name, sender_email, sender_phone):
+    """Customize a follow-up template for a specific business."""
+    template = FOLLOW_UP_TEMPLATES.get(template_name)
+    if not template:
+        raise ValueError(f"No follow-up template found: {template_name}")
+    
+    return {
+        "subject": template["subject"].format(original_subject=original_subject),
         "body": template["body"].format(
             business_name=business_name,
             sender_name=sender_name,
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Email Validation
+Pre-send checks for prospect addresses: syntax, role accounts, disposable
+domains and MX records. DNS lookups go through a small stdlib UDP client
+(any resolver with lookup_mx() can be plugged in instead), are cached per
+domain for the record's TTL (failed lookups briefly), and run concurrently
+across domains.
+"""
+
+import random
+import re
+import socket
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Pragmatic subset of RFC 5322: dot-atom local part, dotted domain with a TLD
+_EMAIL_PATTERN = re.compile(
+    r"^[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63}$"
+)
+MAX_LOCAL_LENGTH = 64
+MAX_EMAIL_LENGTH = 254
+
+# Shared mailboxes: deliverable, but read by whoever is on shift
+ROLE_ACCOUNTS = {
+    "admin", "contact", "enquiries", "hello", "help", "info", "inquiries", "office",
+    "orders", "sales", "support", "team"
+}
+
+# Never deliverable to a business owner
+UNDELIVERABLE_ROLES = {
+    "abuse", "donotreply", "do-not-reply", "mailer-daemon", "no-reply", "noreply", "postmaster"
+}
+
+DISPOSABLE_DOMAINS = {
+    "10minutemail.com", "discard.email", "dispostable.com", "emailondeck.com", "fakeinbox.com",
+    "getnada.com", "guerrillamail.com", "maildrop.cc", "mailinator.com", "mintemail.com",
+    "mohmal.com", "sharklasers.com", "temp-mail.org", "tempmail.com", "throwawaymail.com",
+    "trashmail.com", "yopmail.com"
+}
+
+# Cache lifetime bounds for DNS answers, and the lifetime of negative answers
+MIN_TTL = 60
+MAX_TTL = 24 * 60 * 60
+NEGATIVE_TTL = 5 * 60
+# How long a failed lookup (timeout, unreachable server) is remembered, so a
+# batch doesn't retry a dead resolver once per address
+FAILURE_TTL = 30
+
+DNS_PORT = 53
+DEFAULT_NAMESERVER = '8.8.8.8'
+RESOLV_CONF = '/etc/resolv.conf'
+
+_TYPE_A = 1
+_TYPE_MX = 15
+_TYPE_AAAA = 28
+_RCODE_NXDOMAIN = 3
+
+
+class DnsError(Exception):
+    """A DNS lookup failed (timeout, server failure, malformed reply)."""
+
+
+@dataclass
+class MxAnswer:
+    __slots__ = ("hosts", "ttl", "exists")
+
+    # Mail exchangers by preference; [domain] for an implicit MX (A record only)
+    hosts: List[str]
+    ttl: int
+    # False when the domain does not exist (NXDOMAIN)
+    exists: bool
+
+
+@dataclass
+class ValidationResult:
+    __slots__ = ("email", "valid", "reason", "role_account", "mx_hosts")
+
+    email: str
+    valid: bool
+    reason: Optional[str]
+    role_account: bool
+    mx_hosts: Optional[List[str]]
+
+
+def system_nameserver(path: str = RESOLV_CONF) -> str:
+    """First nameserver in resolv.conf, or DEFAULT_NAMESERVER."""
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    return parts[1]
+    except OSError:
+        pass
+    return DEFAULT_NAMESERVER
+
+
+def _encode_name(name: str) -> bytes:
+    encoded = b''
+    for label in name.rstrip('.').split('.'):
+        label = label.encode('idna')
+        if not 0 < len(label) < 64:
+            raise DnsError(f"Invalid domain name: {name}")
+        encoded += bytes([len(label)]) + label
+    return encoded + b'\x00'
+
+
+def _decode_name(packet: bytes, offset: int) -> Tuple[str, int]:
+    """Read a possibly compressed name; returns (name, offset after it)."""
+    labels = []
+    end = None
+    for _ in range(128):
+        length = packet[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | packet[offset + 1]
+        elif length == 0:
+            return '.'.join(labels), (end if end is not None else offset + 1)
+        else:
+            labels.append(packet[offset + 1:offset + 1 + length].decode('ascii', 'replace'))
+            offset += 1 + length
+    raise DnsError("DNS name compression loop")
+
+
+class DnsResolver:
+    """Minimal DNS-over-UDP client for MX lookups.
+
+    host/port default to the system nameserver; point them at a local fake
+    server to test without network access.
+    """
+
+    def __init__(self, host: Optional[str] = None, port: int = DNS_PORT, timeout: float = 3.0, retries: int = 2):
+        self.host = host or system_nameserver()
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+
+    def query(self, name: str, qtype: int) -> Tuple[int, List[Tuple[int, int, int, int]], bytes]:
+        """Send one query; returns (rcode, [(type, ttl, rdata offset, rdlength)], packet)."""
+        query_id = random.getrandbits(16)
+        # Header: id, flags (recursion desired), 1 question
+        request = (struct.pack('>HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+                   + _encode_name(name) + struct.pack('>HH', qtype, 1))
+
+        with socket.socket(socket.AF_INET6 if ':' in self.host else socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(self.timeout)
+            for attempt in range(self.retries + 1):
+                try:
+                    sock.sendto(request, (self.host, self.port))
+                    while True:
+                        packet, _ = sock.recvfrom(4096)
+                        if len(packet) >= 12 and struct.unpack('>H', packet[:2])[0] == query_id:
+                            break
+                    break
+                except socket.timeout:
+                    if attempt == self.retries:
+                        raise DnsError(f"DNS query for {name} timed out")
+
+        try:
+            _, flags, qdcount, ancount, _, _ = struct.unpack('>HHHHHH', packet[:12])
+            offset = 12
+            for _ in range(qdcount):
+                _, offset = _decode_name(packet, offset)
+                offset += 4
+            answers = []
+            for _ in range(ancount):
+                _, offset = _decode_name(packet, offset)
+                rtype, _, ttl, rdlength = struct.unpack('>HHIH', packet[offset:offset + 10])
+                offset += 10
+                answers.append((rtype, ttl, offset, rdlength))
+                offset += rdlength
+        except (IndexError, struct.error) as e:
+            raise DnsError(f"Malformed DNS reply for {name}: {e}")
+        return flags & 0x000F, answers, packet
+
+    def lookup_mx(self, domain: str) -> MxAnswer:
+        """MX hosts for a domain, falling back to an implicit MX on its A or AAAA record (RFC 5321).
+
+        A domain publishing a null MX gets no hosts, so it fails validation.
+        """
+        rcode, answers, packet = self.query(domain, _TYPE_MX)
+        if rcode == _RCODE_NXDOMAIN:
+            return MxAnswer([], NEGATIVE_TTL, False)
+        if rcode != 0:
+            raise DnsError(f"DNS server returned rcode {rcode} for {domain}")
+
+        records = []
+        for rtype, ttl, offset, _ in answers:
+            if rtype == _TYPE_MX:
+                preference = struct.unpack('>H', packet[offset:offset + 2])[0]
+                records.append((preference, _decode_name(packet, offset + 2)[0], ttl))
+        if records:
+            records.sort()
+            ttl = min(ttl for _, _, ttl in records)
+            # A null MX (RFC 7505: "0 ." decodes to an empty host) says the
+            # domain accepts no mail; it must not fall back to the A record
+            hosts = [host for _, host, _ in records if host not in ('', '.')]
+            return MxAnswer(hosts, ttl, True)
+
+        for qtype in (_TYPE_A, _TYPE_AAAA):
+            # An IPv6-only domain takes mail on its AAAA record just the same
+            rcode, answers, _ = self.query(domain, qtype)
+            address_ttls = [ttl for rtype, ttl, _, _ in answers if rtype == qtype]
+            if rcode == 0 and address_ttls:
+                return MxAnswer([domain], min(address_ttls), True)
+            if rcode != 0:
+                break
+        return MxAnswer([], NEGATIVE_TTL, rcode != _RCODE_NXDOMAIN)
+
+
+class MxCache:
+    """Thread-safe per-domain cache of MX answers, honouring their TTLs.
+
+    Failed lookups are remembered for FAILURE_TTL seconds (see failed()).
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._entries: Dict[str, Tuple[float, MxAnswer]] = {}
+        self._failures: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, domain: str) -> Optional[MxAnswer]:
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[domain]
+                return None
+            return entry[1]
+
+    def put(self, domain: str, answer: MxAnswer) -> None:
+        ttl = max(MIN_TTL, min(MAX_TTL, answer.ttl))
+        with self._lock:
+            self._entries[domain] = (self.clock() + ttl, answer)
+            self._failures.pop(domain, None)
+
+    def failed(self, domain: str) -> bool:
+        """Whether a lookup for domain failed within the last FAILURE_TTL seconds."""
+        with self._lock:
+            expires = self._failures.get(domain)
+            if expires is None:
+                return False
+            if expires <= self.clock():
+                del self._failures[domain]
+                return False
+            return True
+
+    def put_failure(self, domain: str, ttl: float = FAILURE_TTL) -> None:
+        with self._lock:
+            self._failures[domain] = self.clock() + ttl
+
+
+_shared_cache = MxCache()
+
+
+class EmailValidator:
+    """Validates addresses before they cost a draft or a send.
+
+    resolver is any object with lookup_mx(domain) -> MxAnswer; with
+    check_mx=False only the offline checks run.
+    """
+
+    def __init__(self,
+                 resolver=None,
+                 cache: Optional[MxCache] = None,
+                 check_mx: bool = True,
+                 allow_role_accounts: bool = True,
+                 workers: int = 16):
+        self.resolver = resolver if resolver is not None else (DnsResolver() if check_mx else None)
+        self.cache = cache if cache is not None else _shared_cache
+        self.check_mx = check_mx
+        self.allow_role_accounts = allow_role_accounts
+        self.workers = workers
+
+    def lookup_mx(self, domain: str) -> Optional[MxAnswer]:
+        """Cached MX answer for domain, or None if DNS could not be reached (now or very recently)."""
+        answer = self.cache.get(domain)
+        if answer is None:
+            if self.cache.failed(domain):
+                return None
+            try:
+                answer = self.resolver.lookup_mx(domain)
+            except (DnsError, OSError):
+                self.cache.put_failure(domain)
+                return None
+            self.cache.put(domain, answer)
+        return answer
+
+    def _offline_check(self, email: str) -> Tuple[Optional[str], bool]:
+        """(reason the address is invalid or None, is a role account)."""
+        if len(email) > MAX_EMAIL_LENGTH or not _EMAIL_PATTERN.match(email):
+            return "invalid syntax", False
+        local, _, domain = email.rpartition('@')
+        if len(local) > MAX_LOCAL_LENGTH:
+            return "invalid syntax", False
+        role = local.lower().split('+')[0]
+        if role in UNDELIVERABLE_ROLES:
+            return "unmonitored mailbox", True
+        if domain.lower() in DISPOSABLE_DOMAINS:
+            return "disposable domain", False
+        is_role = role in ROLE_ACCOUNTS
+        if is_role and not self.allow_role_accounts:
+            return "role account", True
+        return None, is_role
+
+    def validate(self, email: str) -> ValidationResult:
+        email = email.strip()
+        reason, is_role = self._offline_check(email)
+        if reason or not self.check_mx:
+            return ValidationResult(email, reason is None, reason, is_role, None)
+
+        answer = self.lookup_mx(email.rpartition('@')[2].lower())
+        if answer is None:
+            # DNS unavailable: don't reject on a transient failure
+            return ValidationResult(email, True, None, is_role, None)
+        if not answer.exists:
+            return ValidationResult(email, False, "domain does not exist", is_role, [])
+        if not answer.hosts:
+            return ValidationResult(email, False, "no mail server", is_role, [])
+        return ValidationResult(email, True, None, is_role, answer.hosts)
+
+    def validate_many(self, emails: Iterable[str]) -> Dict[str, ValidationResult]:
+        """Validate many addresses, resolving each distinct domain once, concurrently."""
+        emails = list(emails)
+        if self.check_mx:
+            domains = {email.strip().rpartition('@')[2].lower() for email in emails
+                       if self._offline_check(email.strip())[0] is None}
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(domains)))) as executor:
+                list(executor.map(self.lookup_mx, domains))
+        return {email: self.validate(email) for email in emails}
+
+
+def filter_valid_prospects(items: list, validator: Optional[EmailValidator] = None) -> list:
+    """Drop (position, category, business) items whose email fails validation."""
+    validator = validator if validator is not None else EmailValidator()
+    results = validator.validate_many(business['email'] for _, _, business in items)
+    valid = []
+    for item in items:
+        business = item[2]
+        result = results[business['email']]
+        if result.valid:
+            valid.append(item)
+        else:
+            print(f"  - Skipped {business['name']}: {business['email']} ({result.reason})")
+    return valid
+
+
+def main():
+    """Validate addresses given on the command line, or every prospect email."""
+    emails = sys.argv[1:]
+    if not emails:
+        import json
+        with open('business_prospects.json', 'r') as f:
+            prospects = json.load(f)
+        emails = [business['email'] for businesses in prospects.values() for business in businesses]
+
+    for email, result in EmailValidator().validate_many(emails).items():
+        status = "✓" if result.valid else "✗"
+        details = result.reason or ', '.join(result.mx_hosts or []) or "MX not checked"
+        role = " [role account]" if result.role_account else ""
+        print(f"  {status} {email}{role}: {details}")
+
+
+if __name__ == '__main__':
+    main()
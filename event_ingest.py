@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Event Ingestion
+Local endpoint for engagement events: tracking-pixel opens, link-redirect
+clicks, landing page views and form posts. Requests only append to an
+in-memory buffer, so a burst of opens after a large send never waits on
+disk; a background thread flushes the buffer in batches to append-only
+JSON-lines files (one per day) and keeps rollups per slug and campaign.
+
+    GET  /t/open.gif?s=SLUG&c=CAMPAIGN&e=EMAIL   1x1 pixel, records an open
+    GET  /t/view.gif?s=SLUG&c=CAMPAIGN           1x1 pixel, records a page view
+    GET  /t/click?u=URL&s=SLUG&c=CAMPAIGN&e=...  records a click, 302 to URL
+    POST /t/event                                JSON {"type", "slug", "campaign", ...}
+    POST /t/form                                 JSON or form-encoded form fields
+    GET  /t/rollups                              rollups as JSON
+
+cli.py serve mounts these next to the static site.
+"""
+
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+EVENTS_DIR = 'events'
+ROLLUPS_FILE = 'rollups.json'
+
+OPEN = 'open'
+CLICK = 'click'
+VIEW = 'view'
+FORM = 'form'
+EVENT_TYPES = (OPEN, CLICK, VIEW, FORM)
+
+# Flush when this many events are buffered, or every FLUSH_INTERVAL seconds
+FLUSH_BATCH_SIZE = 2000
+FLUSH_INTERVAL = 1.0
+
+# Request bodies and stored field values are capped; tracking data is small
+MAX_BODY_BYTES = 64 * 1024
+MAX_FIELD_LENGTH = 2000
+
+PIXEL_GIF = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+
+def _events_file(at: float) -> str:
+    return 'events-' + datetime.fromtimestamp(at, timezone.utc).strftime('%Y%m%d') + '.jsonl'
+
+
+def make_event(event_type: str, slug: Optional[str] = None, campaign: Optional[str] = None,
+               email: Optional[str] = None, **details) -> dict:
+    """A normalized event; unknown types raise ValueError."""
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Unknown event type: {event_type}")
+    event = {"type": event_type, "at": round(time.time(), 3)}
+    for key, value in (("slug", slug), ("campaign", campaign), ("email", email)):
+        if value:
+            event[key] = str(value)[:MAX_FIELD_LENGTH]
+    for key, value in details.items():
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            value = {str(k)[:100]: str(v)[:MAX_FIELD_LENGTH] for k, v in value.items()}
+        else:
+            value = str(value)[:MAX_FIELD_LENGTH]
+        event[key] = value
+    return event
+
+
+class Rollups:
+    """Event counts per slug and per campaign.
+
+    offsets records how far into each events file the counts go, so a
+    restart replays only the tail written after the last saved rollup.
+    """
+
+    def __init__(self):
+        self.slugs: Dict[str, Dict[str, int]] = {}
+        self.campaigns: Dict[str, Dict[str, int]] = {}
+        self.offsets: Dict[str, int] = {}
+
+    def add(self, events: Iterable[dict]) -> None:
+        for event in events:
+            for key, table in (("slug", self.slugs), ("campaign", self.campaigns)):
+                name = event.get(key)
+                if name:
+                    counts = table.setdefault(name, {})
+                    counts[event["type"]] = counts.get(event["type"], 0) + 1
+
+    def to_dict(self) -> dict:
+        return {"slugs": self.slugs, "campaigns": self.campaigns, "offsets": self.offsets}
+
+    def save(self, path: str) -> None:
+        # Write-then-rename so a crash never leaves half a rollup behind
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, directory: str) -> 'Rollups':
+        """Saved rollups plus whatever the events files hold beyond them."""
+        rollups = cls()
+        path = os.path.join(directory, ROLLUPS_FILE)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            rollups.slugs = data.get("slugs", {})
+            rollups.campaigns = data.get("campaigns", {})
+            rollups.offsets = data.get("offsets", {})
+
+        for name in sorted(os.listdir(directory)):
+            if not (name.startswith('events-') and name.endswith('.jsonl')):
+                continue
+            with open(os.path.join(directory, name), 'rb') as f:
+                f.seek(rollups.offsets.get(name, 0))
+                offset = f.tell()
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # A torn last line; it is counted once the file is repaired
+                        break
+                    offset += len(line)
+                    try:
+                        rollups.add([json.loads(line)])
+                    except ValueError:
+                        continue
+                rollups.offsets[name] = offset
+        return rollups
+
+
+class EventStore:
+    """Buffers events in memory and flushes them in batches on a background thread.
+
+    record() never touches disk, so request handlers stay fast however
+    bursty the traffic. A failed write puts the batch back at the head of
+    the buffer to be retried on the next flush, so events are not lost.
+    """
+
+    def __init__(self, directory: str = EVENTS_DIR,
+                 batch_size: int = FLUSH_BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+        self.rollups = Rollups.load(directory)
+        self._buffer = deque()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'EventStore':
+        self._thread = threading.Thread(target=self._run, name='event-flusher', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Stop the flusher and write out everything still buffered."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def snapshot(self) -> dict:
+        """Current per-slug and per-campaign counts."""
+        with self._flush_lock:
+            return json.loads(json.dumps({"slugs": self.rollups.slugs, "campaigns": self.rollups.campaigns}))
+
+    def record(self, event: dict) -> None:
+        # deque.append is atomic, so handler threads need no lock here
+        self._buffer.append(event)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Event flush failed, will retry: {e}", file=sys.stderr)
+                time.sleep(self.flush_interval)
+
+    def flush(self) -> int:
+        """Append buffered events to the day's file; returns the number written."""
+        with self._flush_lock:
+            batch = []
+            while True:
+                try:
+                    batch.append(self._buffer.popleft())
+                except IndexError:
+                    break
+            if not batch:
+                return 0
+
+            by_file: Dict[str, List[dict]] = {}
+            for event in batch:
+                by_file.setdefault(_events_file(event["at"]), []).append(event)
+            written = []
+            try:
+                for name, events in by_file.items():
+                    with open(os.path.join(self.directory, name), 'ab') as f:
+                        f.write(''.join(json.dumps(event) + '\n' for event in events).encode('utf-8'))
+                        f.flush()
+                        os.fsync(f.fileno())
+                        self.rollups.offsets[name] = f.tell()
+                    written.append(name)
+            except OSError:
+                # Requeue what was not written, in order, ahead of newer events
+                unwritten = [event for name, events in by_file.items() if name not in written for event in events]
+                self._buffer.extendleft(reversed(unwritten))
+                for name in written:
+                    self.rollups.add(by_file[name])
+                raise
+            self.rollups.add(batch)
+            self.rollups.save(os.path.join(self.directory, ROLLUPS_FILE))
+            return len(batch)
+
+
+def redirect_target(url: str, allowed_hosts: Iterable[str]) -> Optional[str]:
+    """The Location for a click redirect to url, or None if it is not ours to redirect to.
+
+    Only site-relative paths and our own hosts are accepted, never an open
+    redirect. The Location is rebuilt from the validated parts, so nothing
+    else in url can reach the response headers.
+    """
+    # No control characters (header injection), spaces or backslashes
+    # (browsers read '/\evil.com' as '//evil.com')
+    if not url or not url.isascii() or not url.isprintable() or ' ' in url or '\\' in url:
+        return None
+    parts = urlsplit(url)
+    if not parts.scheme and not parts.netloc:
+        if not parts.path.startswith('/') or parts.path[1:2] == '/':
+            return None
+        return urlunsplit(('', '', parts.path, parts.query, parts.fragment))
+    if parts.scheme not in ('http', 'https') or parts.username is not None or parts.password is not None:
+        return None
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    host = parts.hostname or ''
+    if host not in set(allowed_hosts):
+        return None
+    netloc = f"{host}:{port}" if port is not None else host
+    return urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+
+
+def default_allowed_hosts() -> List[str]:
+    from config import get_config
+    config = get_config()
+    return [urlsplit(url).hostname for url in (config.landing_base_url, config.tracking_base_url) if url]
+
+
+def tracked_link(tracking_base_url: str, url: str, slug: Optional[str] = None,
+                 campaign: Optional[str] = None, email: Optional[str] = None) -> str:
+    """A click-tracking URL that redirects to url."""
+    params = {"u": url, "s": slug, "c": campaign, "e": email}
+    return tracking_base_url.rstrip('/') + '/t/click?' + urlencode({k: v for k, v in params.items() if v})
+
+
+def pixel_url(tracking_base_url: str, slug: Optional[str] = None,
+              campaign: Optional[str] = None, email: Optional[str] = None) -> str:
+    """An open-tracking pixel URL."""
+    params = {"s": slug, "c": campaign, "e": email}
+    return tracking_base_url.rstrip('/') + '/t/open.gif?' + urlencode({k: v for k, v in params.items() if v})
+
+
+class TrackingRequestHandler(SimpleHTTPRequestHandler):
+    """Static files plus the /t/ event endpoints.
+
+    Bind store and allowed_hosts with functools.partial (see make_server).
+    """
+
+    # Keep-alive, so a client firing many beacons reuses one connection
+    protocol_version = 'HTTP/1.1'
+
+    def __init__(self, *args, store: EventStore, allowed_hosts: Iterable[str] = (), **kwargs):
+        self.store = store
+        self.allowed_hosts = list(allowed_hosts)
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        # Pixel hits would drown the console; only log static requests
+        if not self.path.startswith('/t/'):
+            super().log_message(format, *args)
+
+    def _query(self) -> Dict[str, str]:
+        return {key: values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+
+    def _reply(self, status: int, body: bytes = b'', content_type: str = 'application/json',
+               headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Cache-Control', 'no-store')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_OPTIONS(self):
+        self._reply(204, headers={'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                                  'Access-Control-Allow-Headers': 'Content-Type'})
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if not path.startswith('/t/'):
+            return super().do_GET()
+        query = self._query()
+        if path in ('/t/open.gif', '/t/view.gif'):
+            event_type = OPEN if path == '/t/open.gif' else VIEW
+            self.store.record(make_event(event_type, query.get('s'), query.get('c'), query.get('e')))
+            self._reply(200, PIXEL_GIF, 'image/gif')
+        elif path == '/t/click':
+            location = redirect_target(query.get('u', ''), self.allowed_hosts)
+            if location is None:
+                return self._reply(400, b'{"error": "redirect target not allowed"}')
+            self.store.record(make_event(CLICK, query.get('s'), query.get('c'), query.get('e'), url=location))
+            self._reply(302, headers={'Location': location})
+        elif path == '/t/rollups':
+            self._reply(200, json.dumps(self.store.snapshot()).encode('utf-8'))
+        else:
+            self._reply(404, b'{"error": "not found"}')
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path not in ('/t/event', '/t/form'):
+            return self._reply(404, b'{"error": "not found"}')
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            # The body can't be framed, so the connection can't be reused either
+            return self._reply(400, b'{"error": "invalid Content-Length"}', headers={'Connection': 'close'})
+        if length > MAX_BODY_BYTES:
+            return self._reply(413, b'{"error": "body too large"}', headers={'Connection': 'close'})
+        body = self.rfile.read(length).decode('utf-8', 'replace')
+        try:
+            if (self.headers.get('Content-Type') or '').startswith('application/x-www-form-urlencoded'):
+                payload = {key: values[0] for key, values in parse_qs(body).items()}
+            else:
+                payload = json.loads(body or '{}')
+            if not isinstance(payload, dict):
+                raise ValueError("expected an object")
+            query = self._query()
+            slug = payload.pop('slug', None) or query.get('s')
+            campaign = payload.pop('campaign', None) or query.get('c')
+            email = payload.pop('recipient', None) or query.get('e')
+            if path == '/t/form':
+                fields = payload.pop('fields', None) or payload
+                event = make_event(FORM, slug, campaign, email, fields=fields)
+            else:
+                event = make_event(payload.pop('type', ''), slug, campaign, email,
+                                   target=payload.get('target'), url=payload.get('url'))
+        except ValueError as e:
+            return self._reply(400, json.dumps({"error": str(e)}).encode('utf-8'))
+        self.store.record(event)
+        self._reply(202, b'{"ok": true}')
+
+
+def make_server(host: str, port: int, directory: str = '.', store: Optional[EventStore] = None,
+                allowed_hosts: Optional[Iterable[str]] = None) -> ThreadingHTTPServer:
+    """A threaded server for the static site and the event endpoints (store must be started)."""
+    import functools
+
+    if allowed_hosts is None:
+        allowed_hosts = default_allowed_hosts()
+    handler = functools.partial(TrackingRequestHandler, directory=directory,
+                                store=store, allowed_hosts=allowed_hosts)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    """Run the ingestion server, or print rollups."""
+    usage = "Usage: python event_ingest.py serve [--port N] [--directory DIR] | rollups [--json]"
+    if len(sys.argv) < 2 or sys.argv[1] not in ('serve', 'rollups'):
+        print(usage)
+        return
+
+    if sys.argv[1] == 'rollups':
+        if not os.path.isdir(EVENTS_DIR):
+            print("No events recorded yet")
+            return
+        rollups = Rollups.load(EVENTS_DIR)
+        if '--json' in sys.argv:
+            print(json.dumps({"slugs": rollups.slugs, "campaigns": rollups.campaigns}, indent=2))
+            return
+        for title, table in (("Slugs", rollups.slugs), ("Campaigns", rollups.campaigns)):
+            print(f"{title}:")
+            for name, counts in sorted(table.items()):
+                print(f"  {name}: " + ', '.join(f"{counts.get(t, 0)} {t}" for t in EVENT_TYPES))
+        return
+
+    port = int(sys.argv[sys.argv.index('--port') + 1]) if '--port' in sys.argv else 8000
+    directory = sys.argv[sys.argv.index('--directory') + 1] if '--directory' in sys.argv else '.'
+    store = EventStore().start()
+    server = make_server('127.0.0.1', port, directory, store)
+    print(f"Serving {os.path.abspath(directory)} with event ingestion on http://127.0.0.1:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
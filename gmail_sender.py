@@ -4,64 +4,196 @@ Gmail API Email Sender
 Sends emails using Google Gmail API with OAuth2 authentication.
 """
 
-import base64
-import json
+import functools
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
-SCOPES = ['https://www.googleapis.com/auth/gmail.send', 'https://www.googleapis.com/auth/gmail.compose']
+from config import get_config
+from mail_transport import (CAMPAIGN_HEADER, GmailApiTransport, MailTransport, MailTransportError,
+                            SmtpTransport, create_transport, encode_message, is_quota_error)
+from suppression import SuppressedRecipientError, SuppressionList, get_suppression_list
+
+# gmail.readonly lets sequence_engine.py read the inbox for replies and bounces
+SCOPES = ['https://www.googleapis.com/auth/gmail.send', 'https://www.googleapis.com/auth/gmail.compose',
+          'https://www.googleapis.com/auth/gmail.readonly']
 CREDENTIALS_FILE = 'credentials.json'
 TOKEN_FILE = 'token.json'
 
-class GmailSender:
-    def __init__(self):
-        self.service = None
-        self.authenticate()
-    
-    def authenticate(self):
-        """Authenticate with Gmail API using OAuth2."""
-        creds = None
-        
-        # Load existing token
-        if os.path.exists(TOKEN_FILE):
-            creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-        
-        # If no valid credentials, get new ones
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                if not os.path.exists(CREDENTIALS_FILE):
-                    raise FileNotFoundError(
-                        f"Please download your OAuth2 credentials from Google Cloud Console "
-                        f"and save as '{CREDENTIALS_FILE}'"
-                    )
-                
-                flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
-                creds = flow.run_local_server(port=0)
+# Gmail SMTP relay; XOAUTH2 there requires the token to carry SMTP_SCOPE in
+# addition to SCOPES, which enable_smtp_pool() asks for
+SMTP_HOST = 'smtp.gmail.com'
+SMTP_PORT = 587
+SMTP_SCOPE = 'https://mail.google.com/'
+
+
+def load_credentials(token_file: str = TOKEN_FILE, scopes: List[str] = SCOPES):
+    """OAuth2 credentials from token_file, asking for consent if the token lacks any of scopes.
+    
+    Refreshed or newly granted credentials are saved back to token_file.
+    """
+    # The OAuth stack is slow to import; only load it when authenticating
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    
+    creds = None
+    
+    # Load existing token with the scopes it was granted; a token from
+    # before a scope was added to scopes can't be refreshed for it, so ask
+    # for consent again instead
+    if os.path.exists(token_file):
+        creds = Credentials.from_authorized_user_file(token_file)
+        if not creds.has_scopes(scopes):
+            print(f"{token_file} is missing some of the Gmail permissions this tool needs; "
+                  f"re-authorizing...")
+            creds = None
+    
+    # If no valid credentials, get new ones
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            if not os.path.exists(CREDENTIALS_FILE):
+                raise FileNotFoundError(
+                    f"Please download your OAuth2 credentials from Google Cloud Console "
+                    f"and save as '{CREDENTIALS_FILE}'"
+                )
             
-            # Save credentials for next run
-            with open(TOKEN_FILE, 'w') as token:
-                token.write(creds.to_json())
+            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, scopes)
+            creds = flow.run_local_server(port=0)
         
-        self.service = build('gmail', 'v1', credentials=creds)
+        # Save credentials for next run
+        with open(token_file, 'w') as token:
+            token.write(creds.to_json())
     
-    def create_message(self, 
-                      to_emails: List[str], 
-                      subject: str, 
-                      body: str, 
-                      cc_emails: Optional[List[str]] = None,
-                      bcc_emails: Optional[List[str]] = None,
-                      html_body: Optional[str] = None) -> dict:
-        """Create email message."""
+    return creds
+
+
+class GmailSender:
+    def __init__(self, service=None, transport: Optional[MailTransport] = None,
+                 suppression: Optional[SuppressionList] = None, token_file: str = TOKEN_FILE):
+        self.service = service
+        # One token file per Gmail account (see send_planner.py for multi-account sending)
+        self.token_file = token_file
+        self.transport = transport
+        self.suppression = suppression if suppression is not None else get_suppression_list()
+        self.credentials = None
+        self.bulk_transport: Optional[MailTransport] = None
+        self.bulk_workers = 1
+        self._credentials_lock = threading.Lock()
+        self._account: Optional[str] = None
+        if self.transport is None:
+            if self.service is None:
+                self.authenticate()
+            self.transport = GmailApiTransport(self.service)
+    
+    @classmethod
+    def from_transport_url(cls, url: str) -> 'GmailSender':
+        """Create a sender backed by a non-Gmail transport, e.g. 'smtp://localhost:8025'."""
+        return cls(transport=create_transport(url))
+    
+    @classmethod
+    def from_config(cls) -> 'GmailSender':
+        """Create a sender for the configured transport_url, or the Gmail API if none is set."""
+        transport_url = get_config().transport_url
+        return cls.from_transport_url(transport_url) if transport_url else cls()
+    
+    @classmethod
+    def authorize_from_config(cls) -> None:
+        """Make sure the token file from_config() senders need exists, without building a sender.
+        
+        Run before starting worker processes so they reuse the saved token
+        instead of each starting an OAuth flow; a no-op for non-Gmail transports.
+        """
+        if not get_config().transport_url:
+            load_credentials(TOKEN_FILE)
+    
+    def authenticate(self, scopes: List[str] = SCOPES):
+        """Authenticate with Gmail API using OAuth2, asking for consent if the token lacks any of scopes."""
+        # The discovery stack is slow to import; only load it when authenticating
+        from googleapiclient.discovery import build
+        
+        self.credentials = load_credentials(self.token_file, scopes)
+        self.service = build('gmail', 'v1', credentials=self.credentials)
+    
+    def _access_token(self) -> str:
+        """Current OAuth2 access token, refreshed if it has expired."""
+        from google.auth.transport.requests import Request
+        
+        with self._credentials_lock:
+            if not self.credentials.valid:
+                self.credentials.refresh(Request())
+                with open(self.token_file, 'w') as token:
+                    token.write(self.credentials.to_json())
+            return self.credentials.token
+    
+    @property
+    def account(self) -> str:
+        """The mailbox this sender creates drafts in (send_planner.py plans drafts by it)."""
+        if self._account is None:
+            self._account = (self.transport.account() or get_config().sender_email).lower()
+        return self._account
+    
+    def enable_smtp_pool(self, email_address: Optional[str] = None, pool_size: int = 4) -> None:
+        """Send bulk emails over a pool of persistent Gmail SMTP connections.
+        
+        Connections authenticate with XOAUTH2 using the token file credentials,
+        pipeline their envelopes and reconnect transparently when Gmail closes
+        an idle session. Only send_bulk_emails uses the pool; drafts still go
+        through the Gmail API.
+        
+        XOAUTH2 needs SMTP_SCOPE; a token without it is re-authorized here
+        (once: the saved token keeps the scope).
+        """
+        smtp_scopes = SCOPES + [SMTP_SCOPE]
+        if self.credentials is None or not self.credentials.has_scopes(smtp_scopes):
+            self.authenticate(smtp_scopes)
+            if isinstance(self.transport, GmailApiTransport):
+                # Drafts and single sends go through the re-authorized service too
+                self.transport = GmailApiTransport(self.service)
+        if email_address is None:
+            email_address = self.account
+        
+        self.bulk_transport = SmtpTransport(
+            host=SMTP_HOST,
+            port=SMTP_PORT,
+            username=email_address,
+            from_address=email_address,
+            starttls=True,
+            pool_size=pool_size,
+            oauth2_token=self._access_token
+        )
+        self.bulk_workers = pool_size
+    
+    def close(self) -> None:
+        """Close any pooled connections."""
+        self.transport.close()
+        if self.bulk_transport is not None:
+            self.bulk_transport.close()
+    
+    def build_mime_message(self, 
+                           to_emails: List[str], 
+                           subject: str, 
+                           body: str, 
+                           cc_emails: Optional[List[str]] = None,
+                           bcc_emails: Optional[List[str]] = None,
+                           html_body: Optional[str] = None,
+                           campaign: Optional[str] = None,
+                           in_reply_to: Optional[str] = None,
+                           from_address: Optional[str] = None) -> Message:
+        """Build the MIME message for an email.
+        
+        campaign marks it as a campaign message; in_reply_to (a Message-ID)
+        threads it under an earlier message. From is from_address, or the
+        sender's account (SMTP servers don't add one the way the Gmail API does).
+        """
         
         if html_body:
             message = MIMEMultipart('alternative')
@@ -72,6 +204,7 @@ class GmailSender:
         else:
             message = MIMEText(body)
         
+        message['from'] = from_address or self.account
         message['to'] = ', '.join(to_emails)
         message['subject'] = subject
         
@@ -81,8 +214,25 @@ class GmailSender:
         if bcc_emails:
             message['bcc'] = ', '.join(bcc_emails)
         
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        return {'raw': raw_message}
+        if campaign:
+            message[CAMPAIGN_HEADER] = campaign
+        
+        if in_reply_to:
+            message['In-Reply-To'] = in_reply_to
+            message['References'] = in_reply_to
+        
+        return message
+    
+    def create_message(self, 
+                      to_emails: List[str], 
+                      subject: str, 
+                      body: str, 
+                      cc_emails: Optional[List[str]] = None,
+                      bcc_emails: Optional[List[str]] = None,
+                      html_body: Optional[str] = None) -> dict:
+        """Create email message."""
+        message = self.build_mime_message(to_emails, subject, body, cc_emails, bcc_emails, html_body)
+        return encode_message(message)
     
     def send_email(self, 
                    to_emails: List[str], 
@@ -90,81 +240,137 @@ class GmailSender:
                    body: str,
                    cc_emails: Optional[List[str]] = None,
                    bcc_emails: Optional[List[str]] = None,
-                   html_body: Optional[str] = None) -> dict:
-        """Send email to multiple recipients."""
+                   html_body: Optional[str] = None,
+                   in_reply_to: Optional[str] = None) -> dict:
+        """Send email to multiple recipients.
+        
+        Raises SuppressedRecipientError, without sending, if any recipient is
+        unsubscribed, bounced or otherwise suppressed.
+        """
+        recipients = self.check_recipients(to_emails + (cc_emails or []) + (bcc_emails or []), include_recent=False)
         try:
-            message = self.create_message(to_emails, subject, body, cc_emails, bcc_emails, html_body)
-            result = self.service.users().messages().send(userId='me', body=message).execute()
+            message = self.build_mime_message(to_emails, subject, body, cc_emails, bcc_emails, html_body,
+                                              in_reply_to=in_reply_to)
+            result = self.transport.send(message)
             print(f"Email sent successfully! Message ID: {result['id']}")
+            self.suppression.record_contact(recipients)
             return result
-        except HttpError as error:
+        except (HttpError, MailTransportError) as error:
             print(f"An error occurred: {error}")
             raise
     
+    def check_recipients(self, emails: List[str], include_recent: bool = True) -> List[str]:
+        """Raise SuppressedRecipientError for the first suppressed address; returns emails."""
+        for email in emails:
+            reason = self.suppression.check(email, include_recent)
+            if reason:
+                raise SuppressedRecipientError(email, reason)
+        return emails
+    
     def create_draft(self, 
                      to_emails: List[str], 
                      subject: str, 
                      body: str,
                      cc_emails: Optional[List[str]] = None,
                      bcc_emails: Optional[List[str]] = None,
-                     html_body: Optional[str] = None) -> dict:
-        """Create email draft without sending."""
+                     html_body: Optional[str] = None,
+                     campaign: Optional[str] = None) -> dict:
+        """Create email draft without sending; campaign drafts pass their campaign (business type)."""
         try:
-            message = self.create_message(to_emails, subject, body, cc_emails, bcc_emails, html_body)
-            draft = {'message': message}
-            result = self.service.users().drafts().create(userId='me', body=draft).execute()
+            message = self.build_mime_message(to_emails, subject, body, cc_emails, bcc_emails, html_body, campaign)
+            result = self.transport.create_draft(message)
             print(f"Draft created successfully! Draft ID: {result['id']}")
             print(f"To: {', '.join(to_emails)}")
             print(f"Subject: {subject}")
             return result
-        except HttpError as error:
+        except (HttpError, MailTransportError) as error:
             print(f"An error occurred creating draft: {error}")
             raise
     
     def send_draft(self, draft_id: str) -> dict:
         """Send a previously created draft."""
         try:
-            result = self.service.users().drafts().send(userId='me', body={'id': draft_id}).execute()
+            result = self.transport.send_draft(draft_id)
             print(f"Draft sent successfully! Message ID: {result['id']}")
             return result
-        except HttpError as error:
+        except (HttpError, MailTransportError) as error:
             print(f"An error occurred sending draft: {error}")
             raise
     
     def list_drafts(self) -> List[dict]:
         """List all drafts."""
         try:
-            result = self.service.users().drafts().list(userId='me').execute()
-            drafts = result.get('drafts', [])
+            drafts = self.transport.list_drafts()
             print(f"Found {len(drafts)} drafts")
             return drafts
-        except HttpError as error:
+        except (HttpError, MailTransportError) as error:
             print(f"An error occurred listing drafts: {error}")
             raise
     
     def delete_draft(self, draft_id: str) -> None:
         """Delete a draft."""
         try:
-            self.service.users().drafts().delete(userId='me', id=draft_id).execute()
+            self.transport.delete_draft(draft_id)
             print(f"Draft {draft_id} deleted successfully")
-        except HttpError as error:
+        except (HttpError, MailTransportError) as error:
             print(f"An error occurred deleting draft: {error}")
             raise
+    
+    def draft_headers(self, draft_ids: List[str]) -> Dict[str, dict]:
+        """To/Subject/Date of several drafts, fetched in batches."""
+        return self.transport.draft_headers(draft_ids)
+    
+    def delete_drafts(self, draft_ids: List[str]) -> Dict[str, Optional[Exception]]:
+        """Delete several drafts in batches; maps each ID to None, or the error deleting it."""
+        return self.transport.delete_drafts(draft_ids)
+    
+    def inbound_messages(self, since: float) -> List[dict]:
+        """Summaries of inbox messages received since a time (for reply and bounce detection)."""
+        return self.transport.inbound_messages(since)
+    
+    def sent_message_id(self, result: dict) -> Optional[str]:
+        """Message-ID header of a sent message, from send_email()/send_draft()'s result."""
+        return self.transport.sent_message_id(result)
 
     def send_bulk_emails(self, recipients: List[dict]) -> List[dict]:
         """Send individual emails to multiple recipients.
         
         Args:
             recipients: List of dicts with keys: to_emails, subject, body, cc_emails, bcc_emails, html_body
+        
+        When enable_smtp_pool() has been called, messages are sent concurrently
+        over the SMTP pool; results keep the order of recipients either way.
+        Suppressed and recently contacted recipients are reported as failures
+        without being sent. Once Gmail reports a rate limit or the daily cap,
+        the remaining recipients are failed without further attempts; plan
+        large sends with send_planner.py instead.
         """
-        results = []
-        for recipient_data in recipients:
-            try:
+        quota_hit = threading.Event()
+        send_one = functools.partial(self._send_bulk_one, quota_hit=quota_hit)
+        if self.bulk_transport is None:
+            return [send_one(recipient_data) for recipient_data in recipients]
+        
+        with ThreadPoolExecutor(max_workers=self.bulk_workers) as executor:
+            return list(executor.map(send_one, recipients))
+    
+    def _send_bulk_one(self, recipient_data: dict, quota_hit: Optional[threading.Event] = None) -> dict:
+        if quota_hit is not None and quota_hit.is_set():
+            return {'success': False, 'error': 'not sent: sending quota reached', 'recipient': recipient_data}
+        try:
+            recipients = self.check_recipients(recipient_data['to_emails'] + (recipient_data.get('cc_emails') or [])
+                                               + (recipient_data.get('bcc_emails') or []))
+            if self.bulk_transport is None:
                 result = self.send_email(**recipient_data)
-                results.append({'success': True, 'result': result, 'recipient': recipient_data})
-            except Exception as e:
-                results.append({'success': False, 'error': str(e), 'recipient': recipient_data})
-        return results
+            else:
+                message = self.build_mime_message(**recipient_data, from_address=self.bulk_transport.account())
+                result = self.bulk_transport.send(message)
+                print(f"Email sent successfully! Message ID: {result['id']}")
+                self.suppression.record_contact(recipients)
+            return {'success': True, 'result': result, 'recipient': recipient_data}
+        except Exception as e:
+            if quota_hit is not None and is_quota_error(e):
+                quota_hit.set()
+            return {'success': False, 'error': str(e), 'recipient': recipient_data}
     
     def create_bulk_drafts(self, recipients: List[dict]) -> List[dict]:
         """Create drafts for multiple recipients.
@@ -188,7 +394,7 @@ def main():
         
         # Test email
         test_result = sender.send_email(
-            to_emails=['sameeramudigonda@gmail.com'],
+            to_emails=[get_config().sender_email],
             subject='Test Email from Gmail API',
             body='Hello! This is a test email sent using the Gmail API implementation.',
             html_body='<h2>Hello!</h2><p>This is a <strong>test email</strong> sent using the Gmail API implementation.</p>'
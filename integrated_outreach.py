@@ -4,58 +4,87 @@ Integrated Outreach System - Combines intelligence + email + landing pages
 """
 
 import json
+import sys
+from typing import Optional
+from urllib.parse import urlencode
 from business_intelligence import BusinessIntelligence
-from email_templates import EMAIL_TEMPLATES
+from business_types import resolve_business_type
+from config import get_config
+from email_templates import EMAIL_TEMPLATES, campaign_email_template, html_email_body
 from gmail_sender import GmailSender
+from campaign_sharding import ShardError, enumerate_prospects, run_sharded
+from campaign_store import save_campaigns
+from email_validation import filter_valid_prospects
+from event_ingest import pixel_url, tracked_link
+from intelligence_records import IntelligenceReport
+from run_snapshots import snapshot_run
+
+def business_slug(business_name: str) -> str:
+    """URL slug for a business; also its slug in engagement events."""
+    return business_name.lower().replace(' ', '-').replace('&', 'and')
+
 
 class IntegratedOutreach:
-    def __init__(self):
-        self.bi = BusinessIntelligence()
-        self.gmail = GmailSender()
-        self.base_url = "https://outbound.com"  # Your landing page domain
+    def __init__(self, bi=None, gmail=None, experiment=None):
+        self.bi = bi if bi is not None else BusinessIntelligence()
+        self.gmail = gmail if gmail is not None else GmailSender.from_config()
+        self.experiment = experiment  # optional subject_experiments.SubjectExperiment
+        config = get_config()
+        self.base_url = config.landing_base_url
+        self.tracking_base_url = config.tracking_base_url
+        self.email_template = campaign_email_template(config.sender_name, config.sender_email, config.sender_phone)
     
     def create_personalized_campaign(self, business_name: str, business_type: str, 
-                                   location: str, email: str):
-        """Create complete personalized campaign for a business."""
+                                   location: str, email: str, account: Optional[str] = None):
+        """Create complete personalized campaign for a business.
+        
+        The campaign's intelligence and personalized_copy are typed records;
+        dump campaigns with intelligence_records.json_default to get the dict form.
+        account is the mailbox the draft lands in (self.gmail.account); pass it
+        in, looked up before drafting, when creating many campaigns.
+        """
+        if account is None:
+            account = self.gmail.account
         
         # Step 1: Generate business intelligence
         print(f"Analyzing {business_name}...")
-        intelligence = self.bi.generate_business_intelligence(business_name, business_type, location)
+        intelligence = self.bi.generate_report(business_name, business_type, location)
         
         # Step 2: Create personalized copy
-        copy = self.bi.create_personalized_copy(intelligence)
+        copy = self.bi.personalize_copy(intelligence, self.experiment)
         
         # Step 3: Generate landing page URL
-        business_slug = business_name.lower().replace(' ', '-').replace('&', 'and')
-        landing_url = f"{self.base_url}/{business_slug}-preview"
+        slug = business_slug(business_name)
+        landing_url = f"{self.base_url}/{slug}-preview"
+        # The landing page tags its events with the campaign from ?c=, so they
+        # roll up with the email's opens and clicks
+        email_link = f"{landing_url}?{urlencode({'c': business_type})}"
+        if self.tracking_base_url:
+            # Route the link through event_ingest.py so clicks are counted
+            email_link = tracked_link(self.tracking_base_url, email_link, slug=slug,
+                                      campaign=business_type, email=email)
         
         # Step 4: Create personalized email
-        email_body = f"""Hi {business_name},
-
-{copy['personalized_opening']}
-
-I'm Sameera, founder of Outbound - a platform where people book behind-the-scenes experiences at local businesses.
-
-{copy['revenue_hook']}.
-
-Want to see how? I created a personalized revenue calculator just for {business_name}:
-👉 {landing_url}
-
-Takes 2 minutes to see your specific setup analysis and projected earnings.
-
-Many similar businesses are already earning ${intelligence['revenue_projections']['monthly_revenue']:,}/month - they love the effortless additional income while sharing their craft.
-
-Best,
-Sameera
-Founder, Outbound
-sameeramudigonda@gmail.com
-+1 (916) 607-8474"""
+        email_body = self.email_template.format(
+            business_name=business_name,
+            personalized_opening=copy.personalized_opening,
+            revenue_hook=copy.revenue_hook,
+            landing_url=email_link,
+            monthly_revenue=intelligence.revenue_projections.monthly_revenue
+        )
+        pixel = html_body = None
+        if self.tracking_base_url:
+            # An HTML alternative of the same text, carrying the open pixel
+            pixel = pixel_url(self.tracking_base_url, slug=slug, campaign=business_type, email=email)
+            html_body = html_email_body(email_body, pixel)
 
         # Step 5: Create email draft
         draft_result = self.gmail.create_draft(
             to_emails=[email],
-            subject=copy['subject_line'],
-            body=email_body
+            subject=copy.subject_line,
+            body=email_body,
+            html_body=html_body,
+            campaign=business_type
         )
         
         # Step 6: Save campaign data
@@ -65,102 +94,167 @@ sameeramudigonda@gmail.com
             "intelligence": intelligence,
             "personalized_copy": copy,
             "landing_url": landing_url,
+            "email_link": email_link,
             "draft_id": draft_result['id'],
-            "email_body": email_body
+            "account": account,
+            "email_body": email_body,
+            "pixel_url": pixel,
+            "html_body": html_body
         }
         
         return campaign_data
     
-    def generate_landing_page_data(self, intelligence: dict) -> dict:
+    def generate_landing_page_data(self, intelligence: IntelligenceReport) -> dict:
         """Generate all data needed for landing page."""
-        business_name = intelligence["business_name"]
-        revenue = intelligence["revenue_projections"]
-        reviews = intelligence["reviews_analysis"]
-        location_demand = intelligence["location_demand"]
-        website = intelligence["website_analysis"]
+        if isinstance(intelligence, dict):
+            intelligence = IntelligenceReport.from_dict(intelligence)
+        business_name = intelligence.business_name
+        revenue = intelligence.revenue_projections
+        reviews = intelligence.reviews_analysis
+        location_demand = intelligence.location_demand
+        website = intelligence.website_analysis
         
         return {
-            "hero_title": f"{business_name}: Your process could earn ${revenue['monthly_revenue']:,}/month",
+            "hero_title": f"{business_name}: Your process could earn ${revenue.monthly_revenue:,}/month",
             "setup_analysis": {
-                "has_open_kitchen": website.get("has_open_kitchen", False),
-                "operating_hours": website.get("operating_hours", "Unknown"),
-                "specialty_process": website.get("specialty_process", "Unknown"),
-                "foot_traffic": website.get("foot_traffic", "Unknown")
+                "has_open_kitchen": website.has_open_kitchen,
+                "operating_hours": website.operating_hours,
+                "specialty_process": website.specialty_process,
+                "foot_traffic": website.foot_traffic
             },
             "demand_proof": {
-                "monthly_searches": location_demand.get("monthly_searches", 0),
-                "curiosity_mentions": reviews.get("curiosity_mentions", 0),
-                "interest_score": location_demand.get("local_interest_score", 0),
-                "sample_quotes": reviews.get("sample_quotes", [])
+                "monthly_searches": location_demand.monthly_searches,
+                "curiosity_mentions": reviews.curiosity_mentions,
+                "interest_score": location_demand.local_interest_score,
+                "sample_quotes": reviews.sample_quotes
             },
             "revenue_calculator": {
-                "hourly_rate": revenue["hourly_rate"],
-                "daily_sessions": revenue["daily_sessions"],
-                "weekly_sessions": revenue["weekly_sessions"],
-                "monthly_revenue": revenue["monthly_revenue"],
-                "annual_revenue": revenue["annual_revenue"]
+                "hourly_rate": revenue.hourly_rate,
+                "daily_sessions": revenue.daily_sessions,
+                "weekly_sessions": revenue.weekly_sessions,
+                "monthly_revenue": revenue.monthly_revenue,
+                "annual_revenue": revenue.annual_revenue
             },
-            "cta_text": f"Join {business_name} in earning ${revenue['monthly_revenue']:,}/month"
+            "cta_text": f"Join {business_name} in earning ${revenue.monthly_revenue:,}/month"
         }
 
-def create_full_campaign():
-    """Create complete campaigns for all prospect businesses."""
-    outreach = IntegratedOutreach()
+# Categories the registry can't place are pitched as coffee roasters
+FALLBACK_BUSINESS_TYPE = 'coffee_roaster'
+
+def create_business_campaign(outreach: IntegratedOutreach, business: dict, business_type: str,
+                             account: Optional[str] = None) -> dict:
+    """Create the campaign and landing page data for one business."""
+    campaign = outreach.create_personalized_campaign(
+        business_name=business['name'],
+        business_type=business_type,
+        location=business['location'],
+        email=business['email'],
+        account=account
+    )
+    
+    # Generate landing page data
+    landing_data = outreach.generate_landing_page_data(campaign['intelligence'])
+    
+    # Save landing page data
+    with open(f'landing_pages/{business_slug(business["name"])}.json', 'w') as f:
+        json.dump(landing_data, f, indent=2)
+    
+    return campaign
+
+def _create_campaigns(outreach: IntegratedOutreach, items) -> list:
+    """Create campaigns for (position, category, business) items; returns (position, campaign) pairs."""
+    campaigns = []
+    # Before any draft exists: a failed lookup must not strand drafts without records
+    account = outreach.gmail.account
+    for position, category, business in items:
+        business_type = resolve_business_type(category) or FALLBACK_BUSINESS_TYPE
+        reason = outreach.gmail.suppression.check(business['email'])
+        if reason:
+            print(f"  - Skipped {business['name']}: {business['email']} is suppressed ({reason})")
+            continue
+        try:
+            campaign = create_business_campaign(outreach, business, business_type, account)
+            campaigns.append((position, campaign))
+            print(f"  ✓ Created campaign for {business['name']}")
+        except Exception as e:
+            print(f"  ✗ Failed for {business['name']}: {e}")
+    return campaigns
+
+def _campaign_shard(items, outreach_factory, experiment=None) -> list:
+    """Process-pool worker: build one shard of campaigns with its own clients."""
+    outreach = outreach_factory()
+    if experiment is not None:
+        # Each worker gets a pickled copy of the experiment; reseed so shards draw independently
+        experiment.rng.seed()
+    outreach.experiment = experiment
+    return _create_campaigns(outreach, items)
+
+def create_full_campaign(outreach=None, workers: int = 1, outreach_factory=IntegratedOutreach, experiment=None,
+                         validator=None):
+    """Create complete campaigns for all prospect businesses.
+    
+    With workers > 1 the prospects are hash-partitioned across a process pool;
+    each worker builds its own IntegratedOutreach (and so its own GmailSender
+    and BusinessIntelligence) and the shards are merged back into prospect order.
+    
+    With an experiment, subject lines and openings are A/B variants; workers
+    sample from a snapshot of its posteriors and each draft's variants are
+    assigned here once the shards are merged. They count as sends only when
+    the send path sends the draft.
+    
+    Prospect emails are validated up front with validator (an
+    email_validation.EmailValidator, MX checks included by default).
     
+    If a shard fails, the campaigns the other shards created are added to
+    campaigns.db alongside the previous run instead of replacing it, and the
+    ShardError is re-raised once they are saved.
+    """
     # Load business prospects
     with open('business_prospects.json', 'r') as f:
         prospects = json.load(f)
     
-    all_campaigns = []
+    items = filter_valid_prospects(enumerate_prospects(prospects), validator)
+    shard_error = None
     
-    # Process each business
-    for category, businesses in prospects.items():
-        print(f"\nProcessing {category}...")
-        
-        # Map category to business type
-        business_type_mapping = {
-            'coffee_roasters': 'coffee_roaster',
-            'boutique_bakeries': 'bakery',
-            'flower_studios': 'florist',
-            'craft_breweries': 'brewery',
-            'specialty_tea': 'tea_shop',
-            'chocolate_makers': 'chocolate_maker'
-        }
-        
-        business_type = business_type_mapping.get(category, 'coffee_roaster')
-        
-        for business in businesses:
-            try:
-                campaign = outreach.create_personalized_campaign(
-                    business_name=business['name'],
-                    business_type=business_type,
-                    location=business['location'],
-                    email=business['email']
-                )
-                
-                all_campaigns.append(campaign)
-                print(f"  ✓ Created campaign for {business['name']}")
-                
-                # Generate landing page data
-                landing_data = outreach.generate_landing_page_data(campaign['intelligence'])
-                
-                # Save landing page data
-                business_slug = business['name'].lower().replace(' ', '-').replace('&', 'and')
-                with open(f'landing_pages/{business_slug}.json', 'w') as f:
-                    json.dump(landing_data, f, indent=2)
-                
-            except Exception as e:
-                print(f"  ✗ Failed for {business['name']}: {e}")
-    
-    # Save all campaign data
-    with open('personalized_campaigns.json', 'w') as f:
-        json.dump(all_campaigns, f, indent=2)
+    if workers > 1:
+        if outreach is None and outreach_factory is IntegratedOutreach:
+            # Authorize once up front so workers reuse the saved token. No
+            # clients are built here: forked workers would inherit their connections.
+            GmailSender.authorize_from_config()
+        print(f"Sharding {len(items)} businesses across {workers} worker processes...")
+        try:
+            all_campaigns = run_sharded(_campaign_shard, items, workers, outreach_factory, experiment)
+        except ShardError as e:
+            shard_error = e
+            all_campaigns = e.results
+    else:
+        if outreach is None:
+            outreach = outreach_factory()
+        if experiment is not None:
+            outreach.experiment = experiment
+        all_campaigns = [campaign for _, campaign in _create_campaigns(outreach, items)]
+    
+    if experiment is not None:
+        experiment.assign_campaigns(all_campaigns)
+    
+    if shard_error is not None:
+        # A partial run must not replace the previous one's records
+        save_campaigns(all_campaigns, replace=False)
+        print(f"\n⚠️  Some shards failed; added {len(all_campaigns)} campaigns to campaigns.db "
+              f"alongside the previous run.")
+        raise shard_error
+    
+    # Save all campaign data (python campaign_store.py export writes it out as JSON)
+    save_campaigns(all_campaigns)
+    snapshot_run("campaigns")
     
     print(f"\n🎉 Created {len(all_campaigns)} personalized campaigns!")
     print("Each business gets:")
     print("1. Personalized email with their specific revenue numbers")
     print("2. Custom landing page URL with their intelligence data")
     print("3. Real review mentions and local demand proof")
+    print("Campaigns stored in campaigns.db (load with campaign_store.load_campaigns(), "
+          "or export to JSON with python campaign_store.py export)")
     
     return all_campaigns
 
@@ -169,14 +263,24 @@ if __name__ == "__main__":
     import os
     os.makedirs('landing_pages', exist_ok=True)
     
-    # Run full campaign creation
-    campaigns = create_full_campaign()
+    # Run full campaign creation (--workers N shards it across processes,
+    # --experiment A/B tests subject lines and openings)
+    workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else 1
+    experiment = None
+    if '--experiment' in sys.argv:
+        from subject_experiments import SubjectExperiment
+        experiment = SubjectExperiment.load()
+    try:
+        campaigns = create_full_campaign(workers=workers, experiment=experiment)
+    finally:
+        if experiment is not None:
+            experiment.save()
     
     # Show sample campaign
     if campaigns:
         sample = campaigns[0]
         print(f"\n--- Sample Campaign: {sample['business_name']} ---")
-        print(f"Subject: {sample['personalized_copy']['subject_line']}")
+        print(f"Subject: {sample['personalized_copy'].subject_line}")
         print(f"Landing URL: {sample['landing_url']}")
-        print(f"Revenue Projection: ${sample['intelligence']['revenue_projections']['monthly_revenue']:,}/month")
+        print(f"Revenue Projection: ${sample['intelligence'].revenue_projections.monthly_revenue:,}/month")
         print(f"Draft ID: {sample['draft_id']}")
\ No newline at end of file
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Intelligence Records
+Typed, slotted records for the business intelligence pipeline. Each record
+converts to and from the dict shape written to personalized_campaigns.json
+and landing_pages/*.json, so existing output files stay compatible.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class ReviewsAnalysis:
+    __slots__ = ("curiosity_mentions", "sample_quotes", "total_reviews_analyzed", "keyword_counts")
+
+    curiosity_mentions: int
+    sample_quotes: List[str]
+    total_reviews_analyzed: int
+    keyword_counts: Optional[Dict[str, int]]
+
+    @classmethod
+    def empty(cls) -> 'ReviewsAnalysis':
+        return cls(0, [], 0, None)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ReviewsAnalysis':
+        return cls(
+            data.get("curiosity_mentions", 0),
+            data.get("sample_quotes", []),
+            data.get("total_reviews_analyzed", 0),
+            data.get("keyword_counts")
+        )
+
+    def to_dict(self) -> Dict:
+        data = {
+            "curiosity_mentions": self.curiosity_mentions,
+            "sample_quotes": self.sample_quotes,
+            "total_reviews_analyzed": self.total_reviews_analyzed
+        }
+        if self.keyword_counts is not None:
+            data["keyword_counts"] = self.keyword_counts
+        return data
+
+
+@dataclass
+class WebsiteAnalysis:
+    __slots__ = ("has_open_kitchen", "operating_hours", "specialty_process", "location_type", "foot_traffic")
+
+    has_open_kitchen: bool
+    operating_hours: str
+    specialty_process: str
+    location_type: str
+    foot_traffic: str
+
+    @classmethod
+    def unknown(cls) -> 'WebsiteAnalysis':
+        return cls(False, "Unknown", "Unknown", "Unknown", "Unknown")
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'WebsiteAnalysis':
+        return cls(
+            data.get("has_open_kitchen", False),
+            data.get("operating_hours", "Unknown"),
+            data.get("specialty_process", "Unknown"),
+            data.get("location_type", "Unknown"),
+            data.get("foot_traffic", "Unknown")
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "has_open_kitchen": self.has_open_kitchen,
+            "operating_hours": self.operating_hours,
+            "specialty_process": self.specialty_process,
+            "location_type": self.location_type,
+            "foot_traffic": self.foot_traffic
+        }
+
+
+@dataclass
+class LocationDemand:
+    __slots__ = ("monthly_searches", "local_interest_score", "competitor_gap", "demographic_match")
+
+    monthly_searches: int
+    local_interest_score: int
+    competitor_gap: bool
+    demographic_match: int
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LocationDemand':
+        return cls(
+            data.get("monthly_searches", 0),
+            data.get("local_interest_score", 0),
+            data.get("competitor_gap", False),
+            data.get("demographic_match", 0)
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "monthly_searches": self.monthly_searches,
+            "local_interest_score": self.local_interest_score,
+            "competitor_gap": self.competitor_gap,
+            "demographic_match": self.demographic_match
+        }
+
+
+@dataclass
+class RevenueProjections:
+    __slots__ = ("hourly_rate", "daily_sessions", "weekly_sessions", "monthly_sessions",
+                 "monthly_revenue", "annual_revenue", "observers_per_session")
+
+    hourly_rate: int
+    daily_sessions: int
+    weekly_sessions: int
+    monthly_sessions: int
+    monthly_revenue: int
+    annual_revenue: int
+    observers_per_session: int
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RevenueProjections':
+        return cls(
+            data.get("hourly_rate", 0),
+            data.get("daily_sessions", 0),
+            data.get("weekly_sessions", 0),
+            data.get("monthly_sessions", 0),
+            data.get("monthly_revenue", 0),
+            data.get("annual_revenue", 0),
+            data.get("observers_per_session", 0)
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "hourly_rate": self.hourly_rate,
+            "daily_sessions": self.daily_sessions,
+            "weekly_sessions": self.weekly_sessions,
+            "monthly_sessions": self.monthly_sessions,
+            "monthly_revenue": self.monthly_revenue,
+            "annual_revenue": self.annual_revenue,
+            "observers_per_session": self.observers_per_session
+        }
+
+
+@dataclass
+class PersonalizedCopy:
+    __slots__ = ("subject_line", "personalized_opening", "revenue_hook", "social_proof", "variants")
+
+    subject_line: str
+    personalized_opening: str
+    revenue_hook: str
+    social_proof: str
+    # Experiment variant ids by slot ("subject", "opening"), if assigned by an experiment
+    variants: Optional[Dict[str, str]]
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PersonalizedCopy':
+        return cls(data["subject_line"], data["personalized_opening"], data["revenue_hook"], data["social_proof"],
+                   data.get("variants"))
+
+    def to_dict(self) -> Dict:
+        data = {
+            "subject_line": self.subject_line,
+            "personalized_opening": self.personalized_opening,
+            "revenue_hook": self.revenue_hook,
+            "social_proof": self.social_proof
+        }
+        if self.variants is not None:
+            data["variants"] = self.variants
+        return data
+
+
+@dataclass
+class IntelligenceReport:
+    __slots__ = ("business_name", "business_type", "location", "reviews_analysis", "website_analysis",
+                 "location_demand", "revenue_projections", "generated_at")
+
+    business_name: str
+    business_type: str
+    location: str
+    reviews_analysis: ReviewsAnalysis
+    website_analysis: WebsiteAnalysis
+    location_demand: LocationDemand
+    revenue_projections: RevenueProjections
+    generated_at: str
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'IntelligenceReport':
+        return cls(
+            data["business_name"],
+            data["business_type"],
+            data.get("location", ""),
+            ReviewsAnalysis.from_dict(data.get("reviews_analysis", {})),
+            WebsiteAnalysis.from_dict(data.get("website_analysis", {})),
+            LocationDemand.from_dict(data.get("location_demand", {})),
+            RevenueProjections.from_dict(data.get("revenue_projections", {})),
+            data.get("generated_at", "")
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "business_name": self.business_name,
+            "business_type": self.business_type,
+            "location": self.location,
+            "reviews_analysis": self.reviews_analysis.to_dict(),
+            "website_analysis": self.website_analysis.to_dict(),
+            "location_demand": self.location_demand.to_dict(),
+            "revenue_projections": self.revenue_projections.to_dict(),
+            "generated_at": self.generated_at
+        }
+
+
+def json_default(obj):
+    """``json.dump(..., default=json_default)`` hook that serializes records."""
+    to_dict = getattr(obj, "to_dict", None)
+    if to_dict is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return to_dict()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Lead Scoring
+Combines demand, review curiosity, setup, projected revenue and prospect
+notes into one priority score, and keeps prospects in a heap-backed queue
+so each day's send quota goes to the strongest leads first.
+"""
+
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+SCORES_FILE = 'lead_scores.json'
+
+# Weights of each signal in the 0-100 score
+WEIGHTS = {
+    "local_interest": 30,
+    "curiosity": 20,
+    "open_kitchen": 15,
+    "revenue": 25,
+    "notes": 10
+}
+
+# Caps used to normalize raw values into 0..1
+MAX_INTEREST_SCORE = 95
+MAX_CURIOSITY_MENTIONS = 10
+MAX_MONTHLY_REVENUE = 8000
+
+# Phrases in the free-text notes and how much they move the notes signal.
+# Longer phrases win over the shorter ones they contain ("no current classes"
+# is positive even though "classes" alone is not).
+NOTE_SIGNALS = {
+    "no current tours": 1.0,
+    "no formal tours": 1.0,
+    "no tours": 1.0,
+    "no visitor programs": 1.0,
+    "no visitor experiences": 1.0,
+    "no structured experiences": 1.0,
+    "no current classes": 0.8,
+    "perfect for adding experiences": 1.0,
+    "open roastery": 0.8,
+    "open kitchen": 0.8,
+    "visible": 0.6,
+    "small batch": 0.4,
+    "small operation": 0.4,
+    "family-owned": 0.3,
+    "handmade": 0.3,
+    "traditional methods": 0.3,
+    "already offers": -1.0,
+    "offers tours": -1.0,
+    "offers classes": -0.6,
+    "multiple locations": -0.3
+}
+
+_NOTES_PATTERN = re.compile(
+    r'\b(?:' + '|'.join(re.escape(phrase) for phrase in sorted(NOTE_SIGNALS, key=len, reverse=True)) + r')\b',
+    re.IGNORECASE
+)
+
+
+def notes_signal(notes: str) -> float:
+    """Net notes signal in -1..1 from a single scan of the notes text."""
+    total = sum(NOTE_SIGNALS[match.group(0).lower()] for match in _NOTES_PATTERN.finditer(notes or ''))
+    # Two strong phrases saturate the signal
+    return max(-1.0, min(1.0, total / 2))
+
+
+def lead_features(prospect: dict, report=None) -> Dict:
+    """Scoring inputs for a prospect, enriched with its IntelligenceReport if available.
+
+    prospect is a prospect-file or campaign_drafts.json record; report may be
+    an IntelligenceReport or a campaign_store.CampaignRecord.
+    """
+    features = {
+        "local_interest_score": prospect.get("local_interest_score"),
+        "curiosity_mentions": prospect.get("curiosity_mentions"),
+        "has_open_kitchen": prospect.get("has_open_kitchen"),
+        "monthly_revenue": prospect.get("monthly_revenue"),
+        "notes": prospect.get("notes", "")
+    }
+    if report is not None:
+        if hasattr(report, "revenue_projections"):
+            features.update(
+                local_interest_score=report.location_demand.local_interest_score,
+                curiosity_mentions=report.reviews_analysis.curiosity_mentions,
+                has_open_kitchen=report.website_analysis.has_open_kitchen,
+                monthly_revenue=report.revenue_projections.monthly_revenue
+            )
+        else:
+            features.update(
+                local_interest_score=report.local_interest_score,
+                curiosity_mentions=report.curiosity_mentions,
+                has_open_kitchen=report.has_open_kitchen,
+                monthly_revenue=report.monthly_revenue
+            )
+    return features
+
+
+def score_lead(features: Dict) -> float:
+    """Priority score in 0..100. Missing signals count as neutral (half weight)."""
+    def ratio(value, cap):
+        return 0.5 if value is None else max(0.0, min(1.0, value / cap))
+
+    score = (
+        WEIGHTS["local_interest"] * ratio(features.get("local_interest_score"), MAX_INTEREST_SCORE)
+        + WEIGHTS["curiosity"] * ratio(features.get("curiosity_mentions"), MAX_CURIOSITY_MENTIONS)
+        + WEIGHTS["revenue"] * ratio(features.get("monthly_revenue"), MAX_MONTHLY_REVENUE)
+        + WEIGHTS["notes"] * (notes_signal(features.get("notes", "")) + 1) / 2
+    )
+    open_kitchen = features.get("has_open_kitchen")
+    score += WEIGHTS["open_kitchen"] * (0.5 if open_kitchen is None else float(bool(open_kitchen)))
+    return round(score, 2)
+
+
+class LeadQueue:
+    """Max-priority queue of leads with O(log n) push, update and pop.
+
+    Updating a lead's score pushes a new heap entry and marks the old one
+    stale; stale entries are skipped when they reach the top.
+    """
+
+    _REMOVED = object()
+
+    def __init__(self):
+        self._heap: List[list] = []
+        self._entries: Dict[str, list] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def push(self, key: str, score: float, item=None) -> None:
+        """Add a lead, or re-prioritize it if already queued."""
+        if key in self._entries:
+            self.remove(key)
+        # Ties go to the lead queued first
+        entry = [-score, next(self._counter), key, item]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        entry[2] = self._REMOVED
+
+    def pop(self) -> Tuple[str, float, object]:
+        """Remove and return (key, score, item) for the highest-priority lead."""
+        while self._heap:
+            neg_score, _, key, item = heapq.heappop(self._heap)
+            if key is not self._REMOVED:
+                del self._entries[key]
+                return key, -neg_score, item
+        raise KeyError("pop from an empty LeadQueue")
+
+    def drain(self, limit: Optional[int] = None) -> Iterator[Tuple[str, float, object]]:
+        """Pop leads in priority order, at most limit of them."""
+        popped = 0
+        while self._entries and (limit is None or popped < limit):
+            yield self.pop()
+            popped += 1
+
+
+def _signature(features: Dict) -> str:
+    return hashlib.sha1(json.dumps(features, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class LeadScorer:
+    """Scores leads incrementally, caching scores by a hash of their inputs.
+
+    Only leads whose inputs changed since the last run are rescored; the
+    cache persists in lead_scores.json between runs.
+    """
+
+    def __init__(self, path: str = SCORES_FILE):
+        self.path = path
+        self.cache: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.cache = json.load(f)
+        self.rescored = 0
+
+    def score(self, key: str, features: Dict) -> float:
+        signature = _signature(features)
+        cached = self.cache.get(key)
+        if cached and cached["signature"] == signature:
+            return cached["score"]
+        score = score_lead(features)
+        self.cache[key] = {"signature": signature, "score": score}
+        self.rescored += 1
+        return score
+
+    def rescore(self, leads: Iterable[Tuple[str, Dict, object]], queue: Optional[LeadQueue] = None) -> LeadQueue:
+        """Score (key, features, item) leads into queue, recomputing only changed scores.
+
+        Every lead's queue entry is replaced (the old one is left stale), so
+        a lead already queued carries the new item even when its score is
+        unchanged.
+        """
+        queue = queue if queue is not None else LeadQueue()
+        for key, features, item in leads:
+            queue.push(key, self.score(key, features), item)
+        return queue
+
+    def save(self) -> None:
+        with open(self.path, 'w') as f:
+            json.dump(self.cache, f)
+
+
+def prioritize_drafts(drafts: List[dict], campaign_db: Optional[str] = 'campaigns.db',
+                      save_scores: bool = True) -> LeadQueue:
+    """Queue campaign_drafts.json records by priority score.
+
+    Drafts are enriched with intelligence from the campaign store when a
+    campaign exists for the same email. save_scores=False leaves the score
+    cache file untouched (for dry runs).
+    """
+    reports = {}
+    if campaign_db and os.path.exists(campaign_db):
+        from campaign_store import CampaignStore
+        store = CampaignStore(campaign_db)
+        try:
+            reports = {record.email: record for record in store.iter_campaigns()}
+        finally:
+            store.close()
+
+    scorer = LeadScorer()
+    queue = scorer.rescore(
+        (draft['draft_id'], lead_features(draft, reports.get(draft['email'])), draft) for draft in drafts
+    )
+    if save_scores:
+        scorer.save()
+    return queue
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Location Normalization
+Parses the "City, ST" strings in prospect files into canonical place IDs
+using the bundled offline gazetteer (gazetteer.json) and looks up regional
+demand for each place.
+"""
+
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.json')
+
+
+@dataclass
+class Place:
+    __slots__ = ("place_id", "city", "state", "region")
+
+    place_id: str
+    city: Optional[str]
+    state: Optional[str]
+    region: Optional[str]
+
+
+def _normalize(text: str) -> str:
+    """Lowercase, drop periods and collapse whitespace: ' St. Louis ' -> 'st louis'."""
+    return ' '.join(text.replace('.', '').lower().split())
+
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', _normalize(text)).strip('-')
+
+
+class Gazetteer:
+    """In-memory index over the gazetteer with memoized resolution.
+
+    Places are indexed by (normalized name, state) for every city name and
+    alias, so resolving a location is a couple of dict lookups; results are
+    cached per input string.
+    """
+
+    def __init__(self, data: Dict):
+        self.states = {code.upper(): name for code, name in data["states"].items()}
+        self._state_codes = {_normalize(name): code for code, name in self.states.items()}
+        self._state_codes.update({code.lower(): code for code in self.states})
+
+        self.region_demand: Dict[str, Tuple[int, int]] = {
+            region: tuple(info["demand"]) for region, info in data.get("regions", {}).items()
+        }
+        self.default_demand: Tuple[int, int] = tuple(data.get("default_demand", [30, 80]))
+
+        self.places: Dict[str, Place] = {}
+        self._by_name_state: Dict[Tuple[str, str], Place] = {}
+        self._by_name: Dict[str, List[Place]] = {}
+        for entry in data["places"]:
+            place = Place(entry["id"], entry["city"], entry["state"].upper(), entry.get("region"))
+            self.places[place.place_id] = place
+            for name in [entry["city"]] + entry.get("aliases", []):
+                key = _normalize(name)
+                self._by_name_state[(key, place.state)] = place
+                self._by_name.setdefault(key, []).append(place)
+
+        self._cache: Dict[str, Optional[Place]] = {}
+
+    @classmethod
+    def load(cls, path: str = GAZETTEER_FILE) -> 'Gazetteer':
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def _state_code(self, text: str) -> Optional[str]:
+        return self._state_codes.get(_normalize(text))
+
+    def _resolve(self, location: str) -> Optional[Place]:
+        if not location or not location.strip():
+            return None
+
+        city, _, state_text = location.rpartition(',')
+        if not city:
+            # No comma: a bare state ("Vermont") or a bare city / alias ("SF")
+            state = self._state_code(location)
+            if state:
+                return Place(f"us-{state.lower()}", None, state, None)
+            candidates = self._by_name.get(_normalize(location), [])
+            # Ambiguous bare names ("Portland") are left unresolved
+            return candidates[0] if len(candidates) == 1 else None
+
+        state = self._state_code(state_text)
+        if state is None:
+            return None
+        place = self._by_name_state.get((_normalize(city), state))
+        if place is not None:
+            return place
+        # Not in the gazetteer: still canonicalize, with no regional demand data
+        return Place(f"us-{state.lower()}-{_slug(city)}", city.strip(), state, None)
+
+    def resolve(self, location: str) -> Optional[Place]:
+        """Canonical place for a location string, or None if it can't be parsed."""
+        try:
+            return self._cache[location]
+        except KeyError:
+            place = self._cache[location] = self._resolve(location)
+            return place
+
+    def demand_range(self, location: str) -> Tuple[int, int]:
+        """(low, high) base monthly demand for a location's region."""
+        place = self.resolve(location)
+        if place is None or place.region is None:
+            return self.default_demand
+        return self.region_demand.get(place.region, self.default_demand)
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def get_gazetteer() -> Gazetteer:
+    """The shared gazetteer, loaded on first use."""
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer.load()
+    return _gazetteer
+
+
+def resolve_location(location: str) -> Optional[Place]:
+    return get_gazetteer().resolve(location)
+
+
+def demand_range(location: str) -> Tuple[int, int]:
+    return get_gazetteer().demand_range(location)
@@ -6,106 +6,130 @@ Creates targeted email drafts for behind-the-scenes experience platform.
 
 import json
 import sys
+from business_types import resolve_business_type
 from gmail_sender import GmailSender
 from email_templates import customize_template
+from campaign_sharding import ShardError, enumerate_prospects, load_business_prospects, run_sharded
+from email_validation import filter_valid_prospects
+from config import get_config
+from lead_scoring import lead_features, prioritize_drafts, score_lead
+from mail_transport import is_quota_error
+from run_snapshots import snapshot_run
+from send_drafts import CLAIMED, FAILED, SENT, SendJournal, load_drafts
+from sequence_engine import SequenceEngine
+from subject_experiments import SubjectExperiment
 
-# Your contact info - UPDATE THESE
-SENDER_NAME = "Sameera"
-SENDER_EMAIL = "sameeramudigonda@gmail.com" 
-SENDER_PHONE = "+1 (916) 607-8474"  # Update with your actual phone
+def create_business_draft(sender, business, template_type, account=None):
+    """Create the outreach draft for one business and return its draft record.
+    
+    account is the sender's mailbox (sender.account), looked up once by the
+    caller so nothing can fail between creating the draft and recording it.
+    """
+    # Customize email template (sender details come from config.py)
+    config = get_config()
+    email_content = customize_template(
+        business_type=template_type,
+        business_name=business['name'],
+        sender_name=config.sender_name,
+        sender_email=config.sender_email,
+        sender_phone=config.sender_phone
+    )
+    
+    # Prepare draft data
+    draft_data = {
+        'to_emails': [business['email']],
+        'subject': email_content['subject'],
+        'body': email_content['body'],
+        'campaign': template_type
+    }
+    
+    # Create draft
+    result = sender.create_draft(**draft_data)
+    
+    return {
+        'business_name': business['name'],
+        'business_type': business['type'],
+        'email': business['email'],
+        'draft_id': result['id'],
+        'account': account,
+        'subject': email_content['subject'],
+        'template_used': template_type,
+        'location': business.get('location'),
+        'notes': business.get('notes', ''),
+        'priority_score': score_lead(lead_features(business))
+    }
+
+def _create_drafts(sender, items):
+    """Create drafts for (position, category, business) items; returns (position, draft) pairs."""
+    drafts = []
+    # Before any draft exists: a failed lookup must not strand drafts without records
+    account = sender.account
+    for position, category, business in items:
+        template_type = resolve_business_type(category)
+        if not template_type:
+            continue
+        reason = sender.suppression.check(business['email'])
+        if reason:
+            print(f"  - Skipped {business['name']}: {business['email']} is suppressed ({reason})")
+            continue
+        try:
+            drafts.append((position, create_business_draft(sender, business, template_type, account)))
+            print(f"  ✓ Created draft for {business['name']}")
+        except Exception as e:
+            print(f"  ✗ Failed to create draft for {business['name']}: {e}")
+    return drafts
 
-def load_business_prospects():
-    """Load business prospects from JSON file."""
-    with open('business_prospects.json', 'r') as f:
-        return json.load(f)
+def _draft_shard(items, sender_factory):
+    """Process-pool worker: draft one shard of prospects with its own sender."""
+    return _create_drafts(sender_factory(), items)
 
-def create_campaign_drafts():
-    """Create email drafts for all business prospects."""
+def create_campaign_drafts(sender=None, workers=1, sender_factory=GmailSender.from_config, validator=None):
+    """Create email drafts for all business prospects.
+    
+    Prospect emails are validated first (syntax, disposable domains, MX
+    records) so invalid addresses don't use up draft quota; pass an
+    email_validation.EmailValidator to change how.
     
-    # Initialize Gmail sender
-    sender = GmailSender()
+    With workers > 1 the prospects are hash-partitioned across a process pool;
+    each worker builds its own sender with sender_factory and the per-shard
+    drafts are merged back into prospect order. If a shard fails, the drafts
+    the other shards created are added to campaign_drafts.json (keeping the
+    drafts already there) and the ShardError is re-raised.
+    """
     
     # Load prospects
     prospects = load_business_prospects()
     
-    # Mapping business categories to template types
-    business_type_mapping = {
-        'coffee_roasters': 'coffee_roaster',
-        'boutique_bakeries': 'bakery',
-        'flower_studios': 'florist',
-        'craft_breweries': 'brewery',
-        'specialty_tea': 'tea_shop',
-        'chocolate_makers': 'chocolate_maker'
-    }
+    print("Creating email drafts for outreach campaign...\n")
     
-    all_drafts = []
+    for category in prospects:
+        if not resolve_business_type(category):
+            print(f"  Warning: No template found for category {category}, skipping...")
     
-    print("Creating email drafts for outreach campaign...\n")
+    items = filter_valid_prospects(enumerate_prospects(prospects), validator)
     
-    # Process each business category
-    for category, businesses in prospects.items():
-        print(f"Processing {category}...")
-        
-        # Map category to template type
-        template_type = business_type_mapping.get(category)
-        if not template_type:
-            # Try to map more flexibly
-            if 'coffee' in category:
-                template_type = 'coffee_roaster'
-            elif 'bakery' in category or 'baking' in category:
-                template_type = 'bakery'
-            elif 'flower' in category or 'florist' in category:
-                template_type = 'florist'
-            elif 'brew' in category:
-                template_type = 'brewery'
-            elif 'tea' in category:
-                template_type = 'tea_shop'
-            elif 'chocolate' in category:
-                template_type = 'chocolate_maker'
-            else:
-                print(f"  Warning: No template found for category {category}, skipping...")
-                continue
-        
-        # Create drafts for each business in category
-        for business in businesses:
-            try:
-                # Customize email template
-                email_content = customize_template(
-                    business_type=template_type,
-                    business_name=business['name'],
-                    sender_name=SENDER_NAME,
-                    sender_email=SENDER_EMAIL,
-                    sender_phone=SENDER_PHONE
-                )
-                
-                # Prepare draft data
-                draft_data = {
-                    'to_emails': [business['email']],
-                    'subject': email_content['subject'],
-                    'body': email_content['body']
-                }
-                
-                # Create draft
-                result = sender.create_draft(**draft_data)
-                
-                draft_info = {
-                    'business_name': business['name'],
-                    'business_type': business['type'],
-                    'email': business['email'],
-                    'draft_id': result['id'],
-                    'subject': email_content['subject'],
-                    'template_used': template_type
-                }
-                
-                all_drafts.append(draft_info)
-                print(f"  ✓ Created draft for {business['name']}")
-                
-            except Exception as e:
-                print(f"  ✗ Failed to create draft for {business['name']}: {e}")
+    if workers > 1:
+        if sender is None and sender_factory == GmailSender.from_config:
+            # Authorize once up front so workers reuse the saved token instead
+            # of each starting an OAuth flow. No sender is built here: forked
+            # workers would inherit its connections.
+            GmailSender.authorize_from_config()
+        print(f"Sharding {len(items)} prospects across {workers} worker processes...")
+        try:
+            all_drafts = run_sharded(_draft_shard, items, workers, sender_factory)
+        except ShardError as e:
+            _save_partial_drafts(e.results)
+            raise
+    else:
+        # Initialize Gmail sender
+        if sender is None:
+            sender = sender_factory()
+        all_drafts = [draft for _, draft in _create_drafts(sender, items)]
     
     # Save draft information for later reference
     with open('campaign_drafts.json', 'w') as f:
         json.dump(all_drafts, f, indent=2)
+    snapshot_run("drafts")
     
     print(f"\n📧 Campaign Summary:")
     print(f"Total drafts created: {len(all_drafts)}")
@@ -117,15 +141,36 @@ def create_campaign_drafts():
     
     return all_drafts
 
-def send_campaign_drafts(draft_ids_to_send=None):
-    """Send previously created drafts."""
+def _save_partial_drafts(drafts, path='campaign_drafts.json'):
+    """Add the drafts of a partly failed run to the drafts file instead of replacing it."""
+    try:
+        with open(path, 'r') as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        saved = []
+    known = {draft['draft_id'] for draft in saved}
+    added = [draft for draft in drafts if draft['draft_id'] not in known]
+    with open(path, 'w') as f:
+        json.dump(saved + added, f, indent=2)
+    print(f"\n⚠️  Some shards failed; added {len(added)} new drafts to {path} "
+          f"alongside the {len(known)} already there.")
+    print("   After fixing the failure, re-run and then remove duplicates with draft_gc.py")
+
+def send_campaign_drafts(draft_ids_to_send=None, daily_quota=None):
+    """Send previously created drafts.
+    
+    Selected drafts are sent highest priority score first; with daily_quota
+    only that many are sent and the rest wait for the next run. Sends are
+    recorded in the send journal (send_drafts.py), so drafts an earlier run
+    sent are skipped, and only successful sends count against the quota.
+    Each sent draft is enrolled in the follow-up sequence as its day-0 touch.
+    """
     
-    sender = GmailSender()
+    sender = GmailSender.from_config()
     
-    # Load draft information
+    # Load draft information (personalized campaign drafts included)
     try:
-        with open('campaign_drafts.json', 'r') as f:
-            all_drafts = json.load(f)
+        all_drafts = load_drafts()
     except FileNotFoundError:
         print("No campaign drafts found. Run create_campaign_drafts() first.")
         return
@@ -152,16 +197,57 @@ def send_campaign_drafts(draft_ids_to_send=None):
                 print("Invalid selection. Cancelling.")
                 return
     
+    # Settle sends an interrupted run left in flight, then queue the selected
+    # drafts that haven't gone out yet by lead priority
+    journal = SendJournal()
+    if journal.in_doubt():
+        journal.reconcile(draft['id'] for draft in sender.list_drafts())
+    selected = set(draft_ids_to_send)
+    already_sent = {draft_id for draft_id in selected if journal.states.get(draft_id) == SENT}
+    if already_sent:
+        print(f"Skipping {len(already_sent)} drafts already sent by an earlier run")
+    queue = prioritize_drafts([draft for draft in all_drafts
+                               if draft['draft_id'] in selected and draft['draft_id'] not in already_sent])
+    
     # Send selected drafts
+    sequences = SequenceEngine(sender)
+    experiment = SubjectExperiment.load_existing()
     sent_count = 0
-    for draft_id in draft_ids_to_send:
+    while len(queue) and (daily_quota is None or sent_count < daily_quota):
+        draft_id, score, draft = queue.pop()
+        # Drafts can sit for days; re-check right before sending
+        reason = sender.suppression.check(draft['email'])
+        if reason:
+            print(f"Skipped draft {draft_id}: {draft['email']} is suppressed ({reason})")
+            continue
+        journal.record(draft_id, CLAIMED, email=draft['email'])
         try:
-            sender.send_draft(draft_id)
-            sent_count += 1
+            result = sender.send_draft(draft_id)
         except Exception as e:
+            journal.record(draft_id, FAILED, error=str(e))
             print(f"Failed to send draft {draft_id}: {e}")
+            if is_quota_error(e):
+                # Everything after this would fail too; leave it for the next run
+                queue.push(draft_id, score, draft)
+                print("Gmail sending quota reached; stopping. Plan large sends with send_planner.py")
+                break
+            continue
+        journal.record(draft_id, SENT, message_id=result.get('id'))
+        sender.suppression.record_contact([draft['email']])
+        sent_count += 1
+        sequences.enroll(draft['email'], draft['business_name'], draft['template_used'],
+                         subject=draft['subject'], first_touch_sent=True, sent=result)
+        if experiment is not None:
+            experiment.record_draft_sent(draft_id)
+    
+    sequences.close()
+    if experiment is not None:
+        experiment.save()
+    journal.close()
     
     print(f"\n📤 Sent {sent_count} emails successfully!")
+    if len(queue):
+        print(f"⏳ {len(queue)} lower-priority drafts held back for the next run")
 
 def list_campaign_status():
     """Show status of campaign drafts."""
@@ -193,9 +279,13 @@ if __name__ == '__main__':
     if len(sys.argv) > 1:
         command = sys.argv[1]
         if command == 'create':
-            create_campaign_drafts()
+            # --workers N shards draft creation across processes
+            workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else 1
+            create_campaign_drafts(workers=workers)
         elif command == 'send':
-            send_campaign_drafts()
+            # --quota N sends only the N highest-priority drafts
+            quota = int(sys.argv[sys.argv.index('--quota') + 1]) if '--quota' in sys.argv else None
+            send_campaign_drafts(daily_quota=quota)
         elif command == 'status':
             list_campaign_status()
         else:
@@ -203,7 +293,8 @@ if __name__ == '__main__':
     else:
         print("SMB Outreach Campaign Manager")
         print("Available commands:")
-        print("  create - Create email drafts for all prospects")
-        print("  send   - Send previously created drafts")
+        print("  create - Create email drafts for all prospects (--workers N to shard)")
+        print("  send   - Send previously created drafts, best leads first (--quota N)")
         print("  status - Show campaign status")
+        print("\nFor unattended sends (cron, workers) use: python send_drafts.py --help")
         print("\nExample: python outreach_campaign.py create")
\ No newline at end of file
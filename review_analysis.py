@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Review Text Analytics
+Scores curiosity mentions in customer reviews and extracts the best quotes
+for personalized outreach.
+"""
+
+import bisect
+import heapq
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CURIOSITY_KEYWORDS = [
+    "watch", "see how", "behind the scenes", "process", "making",
+    "curious", "fascinated", "observe", "see them make", "wonder how"
+]
+
+# Inflections accepted on a keyword's final word ("watching", "observed");
+# a final "e" is dropped before "ing" ("observing"). Anything longer, like
+# "watchdog", is a different word and doesn't match.
+INFLECTION_SUFFIXES = ("s", "es", "d", "ed", "ing")
+
+# Keywords whose inflections mean something else ("processing plant")
+KEYWORD_SUFFIXES = {
+    "process": ("es",)
+}
+
+# Quotes outside this length range read badly in an email opening
+MIN_QUOTE_LENGTH = 20
+MAX_QUOTE_LENGTH = 160
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+class ReviewAnalyzer:
+    """Matches a keyword/phrase set against review text in a single pass.
+
+    All keywords are compiled into one case-insensitive alternation (longest
+    phrases first, on word boundaries, tolerant of extra whitespace), so each
+    review is scanned once however many keywords there are.
+    """
+
+    def __init__(self, keywords: Optional[Iterable[str]] = None):
+        self.keywords = list(keywords or CURIOSITY_KEYWORDS)
+        canonical = {self._normalize(keyword): keyword for keyword in self.keywords}
+        # One named group per keyword, so a match names its keyword directly
+        self._groups: Dict[str, str] = {}
+        alternatives = []
+        for index, normalized in enumerate(sorted(canonical, key=len, reverse=True)):
+            group = f"k{index}"
+            self._groups[group] = canonical[normalized]
+            alternatives.append(f"(?P<{group}>{self._keyword_pattern(normalized)})")
+        self.pattern = re.compile(rf'\b(?:{"|".join(alternatives)})\b', re.IGNORECASE)
+
+    @staticmethod
+    def _keyword_pattern(keyword: str) -> str:
+        """Regex for a normalized keyword, allowing the listed inflections of its last word."""
+        *words, last = keyword.split()
+        suffixes = KEYWORD_SUFFIXES.get(keyword, INFLECTION_SUFFIXES)
+        forms = [re.escape(last + suffix) for suffix in suffixes]
+        if last.endswith('e') and 'ing' in suffixes:
+            forms.append(re.escape(last[:-1] + 'ing'))
+        # Longest forms first so "watches" isn't cut short at "watch"
+        forms = sorted(forms, key=len, reverse=True) + [re.escape(last)]
+        return r'\s+'.join([re.escape(word) for word in words] + [f"(?:{'|'.join(forms)})"])
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return ' '.join(text.lower().split())
+
+    def _scan(self, text: str) -> List[Tuple[int, str]]:
+        """(offset, canonical keyword) for every mention in text."""
+        found = []
+        for match in self.pattern.finditer(text):
+            found.append((match.start(), self._groups[match.lastgroup]))
+        return found
+
+    def matches(self, text: str) -> List[str]:
+        """Canonical keywords mentioned in text, in order of appearance."""
+        return [keyword for _, keyword in self._scan(text)]
+
+    @staticmethod
+    def _quote_candidates(review: str, found: List[Tuple[int, str]]) -> Iterable[Tuple[float, str]]:
+        """Score the sentences containing mentions, reusing the review's single scan."""
+        starts = [0] + [separator.end() for separator in _SENTENCE_SPLIT.finditer(review)]
+        sentence_keywords: Dict[int, set] = {}
+        for offset, keyword in found:
+            sentence_keywords.setdefault(bisect.bisect_right(starts, offset) - 1, set()).add(keyword)
+
+        for index, keywords in sentence_keywords.items():
+            end = starts[index + 1] if index + 1 < len(starts) else len(review)
+            sentence = review[starts[index]:end].strip().strip('"')
+            if MIN_QUOTE_LENGTH <= len(sentence) <= MAX_QUOTE_LENGTH:
+                # Favour sentences hitting several distinct keywords, then shorter ones
+                yield len(keywords) - len(sentence) / (MAX_QUOTE_LENGTH * 2), sentence
+
+    def analyze(self, reviews: Iterable[str], max_quotes: int = 3) -> Dict:
+        """Score curiosity mentions across one business's reviews."""
+        total = 0
+        mentions = 0
+        keyword_counts: Dict[str, int] = {}
+        quotes: List[Tuple[float, str]] = []
+
+        for review in reviews:
+            total += 1
+            found = self._scan(review)
+            if not found:
+                continue
+            mentions += 1
+            for _, keyword in found:
+                keyword_counts[keyword] = keyword_counts.get(keyword, 0) + 1
+            for candidate in self._quote_candidates(review, found):
+                if len(quotes) < max_quotes:
+                    heapq.heappush(quotes, candidate)
+                else:
+                    heapq.heappushpop(quotes, candidate)
+
+        return {
+            "curiosity_mentions": mentions,
+            "sample_quotes": [quote for _, quote in sorted(quotes, reverse=True)],
+            "total_reviews_analyzed": total,
+            "keyword_counts": keyword_counts
+        }
+
+    def _analyze_batch(self, batch: List[Tuple[str, List[str]]], max_quotes: int) -> List[Tuple[str, Dict]]:
+        return [(business, self.analyze(reviews, max_quotes)) for business, reviews in batch]
+
+    def analyze_corpora(self,
+                        corpora: Dict[str, Iterable[str]],
+                        max_quotes: int = 3,
+                        workers: int = 1,
+                        batch_size: int = 64) -> Dict[str, Dict]:
+        """Analyze review corpora for many businesses.
+
+        Businesses are processed in batches of batch_size; with workers > 1
+        the batches are spread over a process pool.
+        """
+        items = [(business, list(reviews)) for business, reviews in corpora.items()]
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+        if workers <= 1:
+            results = [pair for batch in batches for pair in self._analyze_batch(batch, max_quotes)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self._analyze_batch, batch, max_quotes) for batch in batches]
+                results = [pair for future in futures for pair in future.result()]
+
+        return dict(results)
+
+
+_default_analyzer: Optional[ReviewAnalyzer] = None
+
+
+def analyze_reviews(reviews: Iterable[str], max_quotes: int = 3) -> Dict:
+    """Analyze reviews with the shared curiosity-keyword analyzer."""
+    global _default_analyzer
+    if _default_analyzer is None:
+        _default_analyzer = ReviewAnalyzer()
+    return _default_analyzer.analyze(reviews, max_quotes)
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Run Snapshots
+Each drafts or campaign run overwrites campaign_drafts.json and the
+campaign store, so this keeps a snapshot of every run: one record per
+prospect (keyed by email) with its draft, revenue projection and send
+status, sorted by prospect ID and written as gzipped JSON lines to
+snapshots/snapshot-NNNNNN.jsonl.gz.
+
+Because snapshots are sorted, two of them are compared with a streaming
+merge join: memory stays proportional to what changed, not to the number
+of prospects.
+
+    python run_snapshots.py take [--label LABEL]
+    python run_snapshots.py list
+    python run_snapshots.py diff [OLD [NEW]] [--json]    (default: the last two)
+
+Snapshots are also taken automatically after each drafts and campaign run.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SNAPSHOT_DIR = 'snapshots'
+# Bumped whenever the record layout changes; diff refuses to mix formats
+SNAPSHOT_FORMAT = 1
+
+_SNAPSHOT_NAME = re.compile(r'^snapshot-(\d{6})\.jsonl\.gz$')
+
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED = 'changed'
+
+# Fields compared between runs. Draft IDs change on every run and are kept
+# for reference only.
+COMPARED_FIELDS = (
+    "business_name", "business_type", "location", "subject", "template_used", "priority_score",
+    "campaign_subject", "landing_url", "hourly_rate", "monthly_revenue", "annual_revenue",
+    "local_interest_score", "send_status", "sequence_status",
+)
+
+
+def prospect_id(email: str) -> str:
+    return email.strip().lower()
+
+
+def build_records(drafts_file: str = 'campaign_drafts.json',
+                  campaign_db: str = 'campaigns.db',
+                  journal_file: str = 'send_journal.jsonl',
+                  sequences_db: str = 'sequences.db') -> List[dict]:
+    """One record per prospect from the current drafts, campaigns and send state, sorted by ID."""
+    records: Dict[str, dict] = {}
+
+    def record_for(email: str) -> dict:
+        key = prospect_id(email)
+        record = records.get(key)
+        if record is None:
+            record = records[key] = {"id": key}
+        return record
+
+    if os.path.exists(drafts_file):
+        with open(drafts_file, 'r') as f:
+            for draft in json.load(f):
+                record_for(draft['email']).update(
+                    business_name=draft.get('business_name'),
+                    business_type=draft.get('business_type'),
+                    location=draft.get('location'),
+                    draft_id=draft.get('draft_id'),
+                    subject=draft.get('subject'),
+                    template_used=draft.get('template_used'),
+                    priority_score=draft.get('priority_score'))
+
+    if os.path.exists(campaign_db):
+        from campaign_store import CampaignStore
+        store = CampaignStore(campaign_db)
+        try:
+            for campaign in store.iter_campaigns():
+                record = record_for(campaign.email)
+                record.setdefault("business_name", campaign.business_name)
+                record.setdefault("business_type", campaign.business_type)
+                record.setdefault("location", campaign.location)
+                record.update(
+                    campaign_draft_id=campaign.draft_id,
+                    campaign_subject=campaign.subject_line,
+                    landing_url=campaign.landing_url,
+                    hourly_rate=campaign.hourly_rate,
+                    monthly_revenue=campaign.monthly_revenue,
+                    annual_revenue=campaign.annual_revenue,
+                    local_interest_score=campaign.local_interest_score)
+        finally:
+            store.close()
+
+    if os.path.exists(journal_file):
+        from send_drafts import SendJournal
+        journal = SendJournal(journal_file)
+        journal.close()
+        for record in records.values():
+            states = [journal.states.get(record.get(key)) for key in ("draft_id", "campaign_draft_id")]
+            record["send_status"] = next((state for state in states if state), None)
+
+    if os.path.exists(sequences_db):
+        conn = sqlite3.connect(sequences_db)
+        try:
+            for email, status in conn.execute("SELECT email, status FROM sequences"):
+                key = prospect_id(email)
+                if key in records:
+                    records[key]["sequence_status"] = status
+        finally:
+            conn.close()
+
+    return [records[key] for key in sorted(records)]
+
+
+def list_snapshots(directory: str = SNAPSHOT_DIR) -> List[Tuple[int, str]]:
+    """(version, path) of every snapshot, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for name in os.listdir(directory):
+        match = _SNAPSHOT_NAME.match(name)
+        if match:
+            snapshots.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(snapshots)
+
+
+def write_snapshot(records: List[dict], label: Optional[str] = None, directory: str = SNAPSHOT_DIR) -> str:
+    """Write records (sorted by ID) as the next snapshot version; returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    existing = list_snapshots(directory)
+    version = existing[-1][0] + 1 if existing else 1
+    path = os.path.join(directory, f"snapshot-{version:06d}.jsonl.gz")
+    header = {"snapshot": version, "format": SNAPSHOT_FORMAT, "label": label,
+              "created_at": time.strftime("%Y-%m-%d %H:%M:%S"), "prospects": len(records)}
+
+    # Write-then-rename so a crash never leaves a truncated snapshot behind
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps(header) + '\n')
+        for record in records:
+            f.write(json.dumps(record, sort_keys=True) + '\n')
+    os.replace(tmp_path, path)
+    return path
+
+
+def take_snapshot(label: Optional[str] = None, directory: str = SNAPSHOT_DIR, **sources) -> str:
+    """Snapshot the current run state; sources override build_records' file paths."""
+    return write_snapshot(build_records(**sources), label, directory)
+
+
+def snapshot_run(label: str) -> Optional[str]:
+    """Snapshot after a drafts or campaign run; a failure is reported, never raised."""
+    try:
+        path = take_snapshot(label)
+    except Exception as e:
+        print(f"⚠️  Could not save run snapshot: {e}")
+        return None
+    print(f"Run snapshot saved to: {path}")
+    return path
+
+
+def read_header(path: str) -> dict:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.loads(f.readline())
+
+
+def iter_snapshot(path: str) -> Iterator[dict]:
+    """Stream a snapshot's records, checking they are in ID order.
+
+    A snapshot that is in the wrong format, unsorted, truncated or otherwise
+    corrupt raises ValueError (OSError if it can't be opened at all).
+    """
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get("format") != SNAPSHOT_FORMAT:
+                raise ValueError(f"{path} is snapshot format {header.get('format')}, expected {SNAPSHOT_FORMAT}")
+            previous = None
+            for line in f:
+                record = json.loads(line)
+                if previous is not None and record["id"] <= previous:
+                    raise ValueError(f"{path} is not sorted by prospect ID at {record['id']}")
+                previous = record["id"]
+                yield record
+    except (EOFError, zlib.error) as e:
+        # gzip reports a file cut short (or a damaged stream) as these, not OSError
+        raise ValueError(f"{path} is truncated or corrupt: {e}") from e
+
+
+def check_snapshot(path: str) -> int:
+    """Read a snapshot to the end, raising like iter_snapshot if it is unreadable; returns its record count."""
+    return sum(1 for _ in iter_snapshot(path))
+
+
+@dataclass
+class Change:
+    __slots__ = ("kind", "id", "old", "new", "fields")
+
+    kind: str
+    id: str
+    old: Optional[dict]
+    new: Optional[dict]
+    # Names of the compared fields that differ (CHANGED only)
+    fields: Tuple[str, ...]
+
+    def revenue_delta(self) -> int:
+        """Change in projected monthly revenue this change accounts for."""
+        old = (self.old or {}).get("monthly_revenue") or 0
+        new = (self.new or {}).get("monthly_revenue") or 0
+        return new - old
+
+    def to_dict(self) -> dict:
+        change = {"kind": self.kind, "id": self.id}
+        if self.kind == CHANGED:
+            change["fields"] = {field: [self.old.get(field), self.new.get(field)] for field in self.fields}
+        else:
+            change["record"] = self.new if self.kind == ADDED else self.old
+        revenue_delta = self.revenue_delta()
+        if revenue_delta:
+            change["revenue_delta"] = revenue_delta
+        return change
+
+
+def diff_records(old_records: Iterator[dict], new_records: Iterator[dict]) -> Iterator[Change]:
+    """Merge-join two ID-sorted record streams, yielding what was added, removed or changed."""
+    old = next(old_records, None)
+    new = next(new_records, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old["id"] < new["id"]):
+            yield Change(REMOVED, old["id"], old, None, ())
+            old = next(old_records, None)
+        elif old is None or new["id"] < old["id"]:
+            yield Change(ADDED, new["id"], None, new, ())
+            new = next(new_records, None)
+        else:
+            fields = tuple(field for field in COMPARED_FIELDS if old.get(field) != new.get(field))
+            if fields:
+                yield Change(CHANGED, new["id"], old, new, fields)
+            old = next(old_records, None)
+            new = next(new_records, None)
+
+
+def diff_snapshots(old_path: str, new_path: str) -> Iterator[Change]:
+    return diff_records(iter_snapshot(old_path), iter_snapshot(new_path))
+
+
+class DiffSummary:
+    """Running totals over a diff: counts, revenue deltas and send-status transitions."""
+
+    def __init__(self):
+        self.counts = {ADDED: 0, REMOVED: 0, CHANGED: 0}
+        self.revenue_delta = 0
+        self.revenue_changes = 0
+        self.field_counts: Dict[str, int] = {}
+        # (old status, new status) -> prospects
+        self.status_transitions: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+
+    def add(self, change: Change) -> None:
+        self.counts[change.kind] += 1
+        self.revenue_delta += change.revenue_delta()
+        for field in change.fields:
+            self.field_counts[field] = self.field_counts.get(field, 0) + 1
+        if change.kind == CHANGED and "monthly_revenue" in change.fields:
+            self.revenue_changes += 1
+        if "send_status" in change.fields:
+            transition = (change.old.get("send_status"), change.new.get("send_status"))
+            self.status_transitions[transition] = self.status_transitions.get(transition, 0) + 1
+
+    def to_dict(self) -> dict:
+        return {
+            "counts": self.counts,
+            "revenue_delta": self.revenue_delta,
+            "revenue_changes": self.revenue_changes,
+            "fields": self.field_counts,
+            "send_status": [{"from": old, "to": new, "prospects": count}
+                            for (old, new), count in sorted(self.status_transitions.items(), key=str)]
+        }
+
+
+def _describe(change: Change) -> str:
+    if change.kind != CHANGED:
+        record = change.new if change.kind == ADDED else change.old
+        revenue = record.get("monthly_revenue")
+        details = f"{record.get('business_name')} ({record.get('business_type')})"
+        if revenue is not None:
+            details += f" ${revenue:,}/month"
+        return f"{'+' if change.kind == ADDED else '-'} {change.id}  {details}"
+    parts = []
+    for field in change.fields:
+        old, new = change.old.get(field), change.new.get(field)
+        if field == "monthly_revenue" and old is not None and new is not None:
+            parts.append(f"monthly_revenue ${old:,} -> ${new:,} ({new - old:+,})")
+        else:
+            parts.append(f"{field} {old} -> {new}")
+    return f"~ {change.id}  " + '; '.join(parts)
+
+
+def _resolve(reference: str, snapshots: List[Tuple[int, str]]) -> str:
+    """A snapshot path from a version number or a path."""
+    if reference.isdigit():
+        for version, path in snapshots:
+            if version == int(reference):
+                return path
+        raise ValueError(f"No snapshot version {reference}")
+    return reference
+
+
+def build_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description="Take, list and compare run snapshots.")
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help=f"snapshot directory (default {SNAPSHOT_DIR})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    take = commands.add_parser('take', help="snapshot the current drafts, campaigns and send state")
+    take.add_argument('--label', help="note stored with the snapshot")
+    commands.add_parser('list', help="list snapshots")
+    diff = commands.add_parser('diff', help="compare two snapshots (default: the last two)")
+    diff.add_argument('old', nargs='?', help="snapshot version or path (default: second newest)")
+    diff.add_argument('new', nargs='?', help="snapshot version or path (default: newest)")
+    diff.add_argument('--json', action='store_true', help="print changes and summary as JSON lines")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None) -> int:
+    args = build_parser(prog).parse_args(argv)
+
+    if args.command == 'take':
+        path = take_snapshot(args.label, args.dir)
+        print(f"Saved {read_header(path)['prospects']} prospects to {path}")
+        return 0
+
+    snapshots = list_snapshots(args.dir)
+    if args.command == 'list':
+        for version, path in snapshots:
+            header = read_header(path)
+            print(f"{version:>6}  {header['created_at']}  {header['prospects']:>7} prospects  {header.get('label') or ''}")
+        if not snapshots:
+            print("No snapshots yet. Run: python run_snapshots.py take")
+        return 0
+
+    try:
+        if args.old and args.new:
+            old_path, new_path = _resolve(args.old, snapshots), _resolve(args.new, snapshots)
+        elif args.old and snapshots:
+            old_path, new_path = _resolve(args.old, snapshots), snapshots[-1][1]
+        elif not args.old and len(snapshots) >= 2:
+            old_path, new_path = snapshots[-2][1], snapshots[-1][1]
+        else:
+            print("Need two snapshots to compare")
+            return 1
+    except ValueError as e:
+        print(e)
+        return 1
+    for path in (old_path, new_path):
+        if not os.path.isfile(path):
+            print(f"No snapshot at {path}")
+            return 1
+
+    summary = DiffSummary()
+    try:
+        # Both files must read to the end before any change is printed, so a
+        # damaged snapshot never produces a partial change list
+        for path in (old_path, new_path):
+            check_snapshot(path)
+        for change in diff_snapshots(old_path, new_path):
+            summary.add(change)
+            print(json.dumps(change.to_dict()) if args.json else _describe(change))
+    except (OSError, ValueError) as e:
+        # Wrong format version, unsorted or corrupt snapshot (not gzip, truncated, torn line)
+        print(f"Cannot compare snapshots: {e}")
+        return 1
+
+    if args.json:
+        print(json.dumps({"summary": summary.to_dict()}))
+        return 0
+    counts = summary.counts
+    print(f"\n{os.path.basename(old_path)} -> {os.path.basename(new_path)}: "
+          f"{counts[ADDED]} new, {counts[REMOVED]} removed, {counts[CHANGED]} changed")
+    print(f"Projected revenue: {summary.revenue_delta:+,}/month "
+          f"({summary.revenue_changes} prospects with changed projections)")
+    for (old, new), count in sorted(summary.status_transitions.items(), key=str):
+        print(f"Send status {old or 'unsent'} -> {new or 'unsent'}: {count}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
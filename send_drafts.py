@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Non-interactive Draft Sender
+Sends campaign drafts (from campaign_drafts.json and the personalized
+campaigns in campaigns.db) chosen by selectors (business type, location, score,
+draft IDs) without prompts, so it can run from cron or a worker. Sends are
+dispatched concurrently, best leads first, up to a quota; progress streams
+to stdout as JSON lines.
+
+Every send is claimed in an append-only journal before it is attempted and
+resolved after, so a run stopped by SIGINT/SIGTERM (or a crash) can be
+resumed without sending any draft twice.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DRAFTS_FILE = 'campaign_drafts.json'
+CAMPAIGN_DB = 'campaigns.db'
+JOURNAL_FILE = 'send_journal.jsonl'
+
+CLAIMED = 'claimed'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+class SendJournal:
+    """Append-only JSON-lines log of send claims and outcomes.
+
+    A draft whose last entry is CLAIMED was in flight when a run stopped;
+    whether it went out is settled by reconcile() before it is retried.
+    """
+
+    def __init__(self, path: str = JOURNAL_FILE):
+        self.path = path
+        self.states: Dict[str, str] = {}
+        # Recipient of each claim, for settling in-doubt sends
+        self.claimed_emails: Dict[str, Optional[str]] = {}
+        # (time, account) of every send, for quota accounting (send_planner.py)
+        self.sends: List[Tuple[float, Optional[str]]] = []
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write
+                        continue
+                    self.states[entry["draft_id"]] = entry["state"]
+                    if entry["state"] == CLAIMED:
+                        self.claimed_emails[entry["draft_id"]] = entry.get("email")
+                    elif entry["state"] == SENT:
+                        self.sends.append((entry["at"], entry.get("account")))
+        # Opened on the first record, so a dry run never creates the file
+        self._file = None
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+    def record(self, draft_id: str, state: str, **details) -> None:
+        """Append an entry and flush it to disk before returning."""
+        entry = {"draft_id": draft_id, "state": state, "at": time.time()}
+        entry.update(details)
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.states[draft_id] = state
+        if state == CLAIMED:
+            self.claimed_emails[draft_id] = entry.get("email")
+        elif state == SENT:
+            self.sends.append((entry["at"], entry.get("account")))
+
+    def in_doubt(self) -> List[str]:
+        return [draft_id for draft_id, state in self.states.items() if state == CLAIMED]
+
+    def reconcile(self, existing_draft_ids: Iterable[str]) -> Dict[str, str]:
+        """Resolve in-doubt claims against the drafts still in the mailbox.
+
+        Sending a draft removes it from the drafts folder, so a claimed draft
+        that is gone was sent; one that is still there was not.
+        """
+        existing = set(existing_draft_ids)
+        resolved = {}
+        for draft_id in self.in_doubt():
+            state = FAILED if draft_id in existing else SENT
+            self.record(draft_id, state, reconciled=True)
+            resolved[draft_id] = state
+        return resolved
+
+
+def _place_matches(selector, place) -> bool:
+    if selector is None or place is None:
+        return False
+    if selector.city is None:
+        # A bare state selects every place in it
+        return selector.state == place.state
+    return selector.place_id == place.place_id
+
+
+def select_drafts(drafts: List[dict],
+                  types: Optional[Iterable[str]] = None,
+                  locations: Optional[Iterable[str]] = None,
+                  min_score: Optional[float] = None,
+                  draft_ids: Optional[Iterable[str]] = None) -> List[dict]:
+    """Drafts matching every given selector; each selector accepts any of its values.
+
+    types match business_type or template_used; locations are resolved
+    through the gazetteer, so "CA" selects every Californian draft and
+    "SF, CA" matches "San Francisco, CA".
+    """
+    from locations import resolve_location
+
+    types = set(types) if types else None
+    draft_ids = set(draft_ids) if draft_ids else None
+    places = [resolve_location(location) for location in locations] if locations else None
+
+    selected = []
+    for draft in drafts:
+        if types is not None and draft.get('business_type') not in types and draft.get('template_used') not in types:
+            continue
+        if draft_ids is not None and draft['draft_id'] not in draft_ids:
+            continue
+        if min_score is not None and (draft.get('priority_score') or 0) < min_score:
+            continue
+        if places is not None:
+            place = resolve_location(draft.get('location') or '')
+            if not any(_place_matches(selector, place) for selector in places):
+                continue
+        selected.append(draft)
+    return selected
+
+
+class DraftDispatcher:
+    """Sends drafts concurrently with journaled claims and a graceful stop.
+
+    Each worker thread builds its own sender with sender_factory (Gmail API
+    clients are not thread-safe); journal, suppression and sequence updates
+    all happen on the dispatching thread.
+    """
+
+    def __init__(self,
+                 sender_factory: Optional[Callable] = None,
+                 workers: int = 4,
+                 journal: Optional[SendJournal] = None,
+                 out=None):
+        if sender_factory is None:
+            from gmail_sender import GmailSender
+            sender_factory = GmailSender.from_config
+        self.sender_factory = sender_factory
+        self.workers = max(1, workers)
+        self.journal = journal if journal is not None else SendJournal()
+        self.out = out if out is not None else sys.stdout
+        self.stop_requested = threading.Event()
+        self._stop_signal = None
+        self._stop_reported = False
+        self._local = threading.local()
+        # Subject experiment (subject_experiments.py) credited as drafts go out
+        self.experiment = None
+
+    def emit(self, event: str, **fields) -> None:
+        fields = dict(event=event, at=round(time.time(), 3), **fields)
+        self.out.write(json.dumps(fields) + '\n')
+        self.out.flush()
+
+    def request_stop(self, signum=None, frame=None) -> None:
+        # Runs in a signal handler: only set the flag, the run loop reports it
+        if not self.stop_requested.is_set():
+            self._stop_signal = signum
+            self.stop_requested.set()
+
+    def _stopping(self) -> bool:
+        """True once a stop was requested, emitting "stopping" the first time."""
+        if not self.stop_requested.is_set():
+            return False
+        if not self._stop_reported:
+            self._stop_reported = True
+            self.emit("stopping", signal=self._stop_signal)
+        return True
+
+    def install_signal_handlers(self) -> None:
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGTERM, self.request_stop)
+
+    def _sender(self):
+        sender = getattr(self._local, 'sender', None)
+        if sender is None:
+            sender = self._local.sender = self.sender_factory()
+        return sender
+
+    def _send(self, draft_id: str) -> dict:
+        return self._sender().send_draft(draft_id)
+
+    def _record_failed(self, draft_id: str, draft: dict, error: Exception, counts: Dict[str, int],
+                       **details) -> None:
+        self.journal.record(draft_id, FAILED, error=str(error), **details)
+        counts["failed"] += 1
+        self.emit("failed", draft_id=draft_id, email=draft['email'], error=str(error), **details)
+
+    def _record_sent(self, draft_id: str, score: float, draft: dict, result: dict, sequences, suppression,
+                     counts: Dict[str, int], **details) -> None:
+        """Journal a completed send, start the contact cooldown and enroll the follow-ups."""
+        self.journal.record(draft_id, SENT, message_id=result.get('id'), **details)
+        self._after_send(draft_id, draft['email'], draft, sequences, suppression, sent=result)
+        counts["sent"] += 1
+        self.emit("sent", draft_id=draft_id, email=draft['email'], score=score,
+                  message_id=result.get('id'), **details)
+
+    def _after_send(self, draft_id: str, email: Optional[str], draft: Optional[dict], sequences, suppression,
+                    sent: Optional[dict] = None) -> None:
+        """Contact cooldown, follow-up enrollment and experiment credit for a sent draft.
+
+        Follow-ups need the draft record; without one only the cooldown and
+        the experiment are updated.
+        """
+        if email:
+            suppression.record_contact([email])
+        if draft is not None:
+            sequences.enroll(draft['email'], draft['business_name'], draft['template_used'],
+                             subject=draft['subject'], first_touch_sent=True, sent=sent)
+        if self.experiment is not None:
+            self.experiment.record_draft_sent(draft_id)
+
+    def _open_experiment(self) -> None:
+        from subject_experiments import SubjectExperiment
+        self.experiment = SubjectExperiment.load_existing()
+
+    def _close_experiment(self) -> None:
+        if self.experiment is not None:
+            self.experiment.save()
+            self.experiment = None
+
+    def _reconcile(self, existing_draft_ids: Iterable[str], drafts: List[dict], sequences, suppression) -> None:
+        """Settle in-doubt claims; a draft that turns out to have been sent gets the usual bookkeeping."""
+        by_id = {draft['draft_id']: draft for draft in drafts}
+        for draft_id, state in self.journal.reconcile(existing_draft_ids).items():
+            if state == SENT:
+                draft = by_id.get(draft_id)
+                email = draft['email'] if draft is not None else self.journal.claimed_emails.get(draft_id)
+                self._after_send(draft_id, email, draft, sequences, suppression)
+            self.emit("reconciled", draft_id=draft_id, state=state)
+
+    def _pending(self, drafts: List[dict], counts: Dict[str, int]) -> List[dict]:
+        """Drafts not already sent by an earlier run."""
+        pending = []
+        for draft in drafts:
+            if self.journal.states.get(draft['draft_id']) == SENT:
+                counts["skipped"] += 1
+                self.emit("skipped", draft_id=draft['draft_id'], email=draft['email'], reason="already sent")
+            else:
+                pending.append(draft)
+        return pending
+
+    def run(self, drafts: List[dict], quota: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
+        """Send the selected drafts, best leads first, at most quota of them.
+
+        Only successful sends count against quota (sends in flight are held
+        against it until they finish). A Gmail quota error stops the run:
+        the draft is left queued for the next run and nothing more is claimed.
+
+        A dry run writes nothing (journal, lead scores, sequences, experiment)
+        and counts the drafts it would send as "would_send".
+        """
+        from lead_scoring import prioritize_drafts
+        from mail_transport import is_quota_error
+
+        counts = {"sent": 0, "failed": 0, "skipped": 0}
+        if dry_run:
+            counts["would_send"] = 0
+        sender = self._sender()
+
+        sequences = None
+        if not dry_run:
+            from sequence_engine import SequenceEngine
+            sequences = SequenceEngine(sender)
+            self._open_experiment()
+            if self.journal.in_doubt():
+                self._reconcile((draft['id'] for draft in sender.list_drafts()), drafts, sequences,
+                                sender.suppression)
+
+        queue = prioritize_drafts(self._pending(drafts, counts), save_scores=not dry_run)
+        self.emit("start", selected=len(drafts), pending=len(queue), quota=quota, dry_run=dry_run)
+
+        in_flight = {}
+        quota_reached = False
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                # Keep at most `workers` sends in flight; stop claiming new ones once asked to stop
+                # or Gmail reports a quota error. Suppressed drafts don't use up the quota.
+                while (len(in_flight) < self.workers and len(queue)
+                       and (quota is None or counts["sent"] + counts.get("would_send", 0) + len(in_flight) < quota)
+                       and not quota_reached and not self._stopping()):
+                    draft_id, score, draft = queue.pop()
+                    reason = sender.suppression.check(draft['email'])
+                    if reason:
+                        counts["skipped"] += 1
+                        self.emit("skipped", draft_id=draft_id, email=draft['email'], reason=f"suppressed ({reason})")
+                        continue
+                    if dry_run:
+                        counts["would_send"] += 1
+                        self.emit("would_send", draft_id=draft_id, email=draft['email'], score=score)
+                        continue
+                    self.journal.record(draft_id, CLAIMED, email=draft['email'])
+                    in_flight[executor.submit(self._send, draft_id)] = (draft_id, score, draft)
+
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+                self._stopping()
+                for future in done:
+                    draft_id, score, draft = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if not is_quota_error(e):
+                            self._record_failed(draft_id, draft, e, counts)
+                            continue
+                        # Every later send would fail too; leave this one for the next run
+                        self.journal.record(draft_id, FAILED, error=str(e))
+                        queue.push(draft_id, score, draft)
+                        if not quota_reached:
+                            quota_reached = True
+                            self.emit("quota_reached", draft_id=draft_id, error=str(e))
+                        continue
+                    self._record_sent(draft_id, score, draft, result, sequences, sender.suppression, counts)
+
+        if sequences is not None:
+            sequences.close()
+            self._close_experiment()
+        self.emit("done", interrupted=self._stopping(), quota_reached=quota_reached,
+                  remaining=len(queue), **counts)
+        return counts
+
+
+def load_drafts(path: str = DRAFTS_FILE, campaign_db: Optional[str] = CAMPAIGN_DB) -> List[dict]:
+    """Drafts from the drafts file and the personalized campaigns in campaign_db.
+
+    Raises FileNotFoundError when neither has any drafts recorded.
+    """
+    from campaign_store import load_campaign_drafts
+
+    try:
+        with open(path, 'r') as f:
+            drafts = json.load(f)
+    except FileNotFoundError:
+        drafts = None
+    campaign_drafts = load_campaign_drafts(campaign_db) if campaign_db else []
+    if drafts is None and not campaign_drafts:
+        raise FileNotFoundError(path)
+    drafts = drafts or []
+    known = {draft['draft_id'] for draft in drafts}
+    return drafts + [draft for draft in campaign_drafts if draft['draft_id'] not in known]
+
+
+def build_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description="Send campaign drafts without prompts, streaming JSON-lines progress.")
+    parser.add_argument('--type', dest='types', action='append', help="business type or template (repeatable)")
+    parser.add_argument('--location', dest='locations', action='append',
+                        help='"City, ST" or a state (repeatable)')
+    parser.add_argument('--min-score', type=float, help="minimum lead priority score")
+    parser.add_argument('--ids', help="comma-separated draft IDs")
+    parser.add_argument('--quota', type=int, help="send at most this many drafts")
+    parser.add_argument('--workers', type=int, default=4, help="concurrent sends (default 4)")
+    parser.add_argument('--dry-run', action='store_true', help="report what would be sent without sending")
+    parser.add_argument('--drafts', default=DRAFTS_FILE, help=f"drafts file (default {DRAFTS_FILE})")
+    parser.add_argument('--journal', default=JOURNAL_FILE, help=f"send journal (default {JOURNAL_FILE})")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None) -> int:
+    args = build_parser(prog).parse_args(argv)
+    try:
+        drafts = load_drafts(args.drafts)
+    except FileNotFoundError:
+        print(json.dumps({"event": "error",
+                          "error": f"no drafts in {args.drafts} or {CAMPAIGN_DB}; create drafts first"}))
+        return 1
+
+    selected = select_drafts(drafts, args.types, args.locations, args.min_score,
+                             args.ids.split(',') if args.ids else None)
+
+    journal = SendJournal(args.journal)
+    try:
+        dispatcher = DraftDispatcher(workers=args.workers, journal=journal)
+        dispatcher.install_signal_handlers()
+        counts = dispatcher.run(selected, quota=args.quota, dry_run=args.dry_run)
+        if dispatcher.stop_requested.is_set():
+            return 130
+        return 1 if counts["failed"] else 0
+    finally:
+        journal.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
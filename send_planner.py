@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Quota-aware Send Planner
+Turns the queued drafts and each sending account's quota into a paced plan:
+which draft goes out when, from which account, at what rate, and when the
+whole queue is predicted to finish. Gmail caps sends per rolling 24 hours
+(500 for consumer accounts, 2000 for Workspace) and throttles bursts, so
+the plan spaces sends by each account's per-minute rate and carries what
+does not fit today over to the following days.
+
+The executor follows the plan and replans from actual usage (the send
+journal) every few minutes, and immediately when Gmail reports a rate
+limit or the daily cap.
+
+Accounts are listed in send_accounts.json:
+
+    [{"email": "me@example.com", "daily_quota": 500, "per_minute": 20,
+      "reserve": 50, "token_file": "token.json"}]
+
+reserve holds back part of the quota for follow-ups and manual mail.
+Without the file, the configured sender is planned as one consumer account.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from send_drafts import (CAMPAIGN_DB, CLAIMED, DRAFTS_FILE, FAILED, JOURNAL_FILE, SENT, DraftDispatcher,
+                         SendJournal, load_drafts, select_drafts)
+
+ACCOUNTS_FILE = 'send_accounts.json'
+
+# Gmail's consumer-account cap per rolling 24 hours, and a pace that stays
+# well inside its burst limits
+GMAIL_DAILY_QUOTA = 500
+DEFAULT_PER_MINUTE = 20
+
+QUOTA_WINDOW = 24 * 60 * 60
+
+# The executor replans this often, and backs an account off this long after
+# a rate-limit error (or a daily-cap error)
+REPLAN_INTERVAL = 5 * 60
+RATE_LIMIT_BACKOFF = 60
+DAILY_LIMIT_BACKOFF = 60 * 60
+
+
+@dataclass
+class Account:
+    __slots__ = ("email", "daily_quota", "per_minute", "reserve", "token_file", "transport_url")
+
+    email: str
+    daily_quota: int
+    per_minute: float
+    # Sends per window kept back for follow-ups and mail sent by hand
+    reserve: int
+    token_file: str
+    # Non-Gmail transport, e.g. "smtp://localhost:8025"
+    transport_url: Optional[str]
+
+    @property
+    def capacity(self) -> int:
+        return max(0, self.daily_quota - self.reserve)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Account':
+        from gmail_sender import TOKEN_FILE
+        return cls(email=data['email'].lower(),
+                   daily_quota=int(data.get('daily_quota', GMAIL_DAILY_QUOTA)),
+                   per_minute=float(data.get('per_minute', DEFAULT_PER_MINUTE)),
+                   reserve=int(data.get('reserve', 0)),
+                   token_file=data.get('token_file', TOKEN_FILE),
+                   transport_url=data.get('transport_url'))
+
+
+def load_accounts(path: str = ACCOUNTS_FILE) -> List[Account]:
+    """Sending accounts from path, or the configured sender alone."""
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            accounts = [Account.from_dict(data) for data in json.load(f)]
+        if not accounts:
+            raise ValueError(f"No accounts in {path}")
+        return accounts
+    from config import get_config
+    config = get_config()
+    return [Account.from_dict({"email": config.sender_email, "transport_url": config.transport_url})]
+
+
+def account_sender(account: Account):
+    """A GmailSender that sends as account."""
+    from gmail_sender import GmailSender
+    if account.transport_url:
+        return GmailSender.from_transport_url(account.transport_url)
+    return GmailSender(token_file=account.token_file)
+
+
+@dataclass
+class PlannedSend:
+    __slots__ = ("draft_id", "email", "account", "at", "score")
+
+    draft_id: str
+    email: str
+    account: str
+    at: float
+    score: float
+
+
+class SendPlan:
+    """Planned sends in time order, plus the drafts no account can send."""
+
+    def __init__(self, sends: List[PlannedSend], unplanned: List[Tuple[str, str]], created_at: float):
+        self.sends = sends
+        # (draft_id, reason) pairs
+        self.unplanned = unplanned
+        self.created_at = created_at
+
+    def __len__(self) -> int:
+        return len(self.sends)
+
+    @property
+    def completion(self) -> Optional[float]:
+        """Predicted time of the last send."""
+        return self.sends[-1].at if self.sends else None
+
+    def by_account(self) -> Dict[str, deque]:
+        """Each account's sends in time order."""
+        queues = {}
+        for send in self.sends:
+            queues.setdefault(send.account, deque()).append(send)
+        return queues
+
+    def schedule(self) -> List[dict]:
+        """Per day and account: how many sends, between when, at what rate."""
+        rows = {}
+        for send in self.sends:
+            key = (datetime.fromtimestamp(send.at).date().isoformat(), send.account)
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = {"day": key[0], "account": key[1], "sends": 0, "first": send.at, "last": send.at}
+            row["sends"] += 1
+            row["last"] = send.at
+        for row in rows.values():
+            # Average pace over the day's sending span
+            span_minutes = (row["last"] - row["first"]) / 60
+            row["per_minute"] = round((row["sends"] - 1) / span_minutes, 2) if span_minutes > 0 else None
+        return sorted(rows.values(), key=lambda row: (row["day"], row["account"]))
+
+    def to_dict(self) -> dict:
+        return {
+            "created_at": self.created_at,
+            "completion": self.completion,
+            "schedule": self.schedule(),
+            "unplanned": [{"draft_id": draft_id, "reason": reason} for draft_id, reason in self.unplanned],
+            "sends": [{"draft_id": send.draft_id, "email": send.email, "account": send.account,
+                       "at": round(send.at, 3), "score": send.score} for send in self.sends]
+        }
+
+
+class _AccountSlots:
+    """An account's rolling 24-hour window of sends, handing out paced slots."""
+
+    def __init__(self, account: Account, sent_at: Iterable[float], not_before: float):
+        self.account = account
+        self.interval = 60.0 / account.per_minute if account.per_minute > 0 else 0.0
+        self.window = deque(sorted(sent_at))
+        self.last = self.window[-1] if self.window else float('-inf')
+        self.not_before = not_before
+
+    def next_slot(self) -> Optional[float]:
+        """Earliest time the next send fits the pace and the window; None if it never can."""
+        capacity = self.account.capacity
+        if capacity <= 0:
+            return None
+        at = max(self.not_before, self.last + self.interval)
+        while True:
+            while self.window and self.window[0] <= at - QUOTA_WINDOW:
+                self.window.popleft()
+            if len(self.window) < capacity:
+                return at
+            # Full: wait for the oldest send in the window to age out
+            at = self.window[0] + QUOTA_WINDOW
+
+    def take(self, at: float) -> None:
+        self.window.append(at)
+        self.last = at
+
+
+class SendPlanner:
+    """Gives each queued draft, best first, the earliest slot its account allows.
+
+    A draft can only be sent from the mailbox it was created in, so it is
+    planned on its 'account' (the default account when unset); accounts
+    fill their own windows independently and in parallel.
+    """
+
+    def __init__(self, accounts: List[Account], default_account: Optional[str] = None):
+        self.accounts = {account.email: account for account in accounts}
+        default_account = (default_account or '').lower()
+        self.default_account = default_account if default_account in self.accounts else accounts[0].email
+
+    def account_for(self, draft: dict) -> str:
+        return (draft.get('account') or self.default_account).lower()
+
+    def usage(self, journal: SendJournal, now: float) -> Dict[str, List[float]]:
+        """Send times per account within the current quota window, from the journal."""
+        usage = {email: [] for email in self.accounts}
+        for at, account in journal.sends:
+            if at > now - QUOTA_WINDOW:
+                usage.setdefault((account or self.default_account).lower(), []).append(at)
+        return usage
+
+    def plan(self, queue: Iterable[Tuple[str, float, dict]],
+             usage: Dict[str, List[float]],
+             now: float,
+             blocked_until: Optional[Dict[str, float]] = None,
+             horizon_days: Optional[float] = None) -> SendPlan:
+        """Plan (draft_id, score, draft) items, given in priority order.
+
+        usage holds each account's recent send times; blocked_until keeps an
+        account idle until then (after a quota error). Sends that would land
+        past horizon_days are left unplanned.
+        """
+        blocked_until = blocked_until or {}
+        horizon = now + horizon_days * 24 * 60 * 60 if horizon_days is not None else None
+        slots = {email: _AccountSlots(account, usage.get(email, ()), max(now, blocked_until.get(email, now)))
+                 for email, account in self.accounts.items()}
+
+        sends = []
+        unplanned = []
+        for draft_id, score, draft in queue:
+            email = self.account_for(draft)
+            account_slots = slots.get(email)
+            if account_slots is None:
+                unplanned.append((draft_id, f"account {email} is not configured"))
+                continue
+            at = account_slots.next_slot()
+            if at is None:
+                unplanned.append((draft_id, "no sending capacity"))
+            elif horizon is not None and at > horizon:
+                unplanned.append((draft_id, "beyond the planning horizon"))
+            else:
+                account_slots.take(at)
+                sends.append(PlannedSend(draft_id, draft['email'], email, at, score))
+
+        sends.sort(key=lambda send: send.at)
+        return SendPlan(sends, unplanned, now)
+
+
+class PlanExecutor(DraftDispatcher):
+    """Sends drafts on the plan's schedule, one send in flight per account.
+
+    The plan is rebuilt from the journal every REPLAN_INTERVAL seconds, so
+    slow sends, failures and sends made elsewhere shift the schedule
+    instead of piling up; a quota error backs the account off and replans
+    at once.
+    """
+
+    def __init__(self,
+                 planner: SendPlanner,
+                 sender_factory: Callable = account_sender,
+                 journal: Optional[SendJournal] = None,
+                 out=None,
+                 clock: Callable[[], float] = time.time):
+        super().__init__(sender_factory=sender_factory, workers=len(planner.accounts), journal=journal, out=out)
+        self.planner = planner
+        self.clock = clock
+        self._senders = {}
+
+    def _account_sender(self, email: str):
+        # Built on the dispatching thread (authentication may prompt); each
+        # account has at most one send in flight, so its client is never shared
+        if email not in self._senders:
+            self._senders[email] = self.sender_factory(self.planner.accounts[email])
+        return self._senders[email]
+
+    def _send_as(self, email: str, draft_id: str) -> dict:
+        return self._senders[email].send_draft(draft_id)
+
+    def _emit_plan(self, plan: SendPlan) -> None:
+        self.emit("plan", planned=len(plan), unplanned=len(plan.unplanned),
+                  completion=round(plan.completion, 3) if plan.completion else None,
+                  schedule=[{key: (round(value, 3) if isinstance(value, float) else value)
+                             for key, value in row.items()} for row in plan.schedule()])
+
+    def run(self, drafts: List[dict], hours: Optional[float] = None,
+            horizon_days: Optional[float] = None) -> Dict[str, int]:
+        """Send drafts as planned until done, stopped, or hours have passed."""
+        from lead_scoring import prioritize_drafts
+        from mail_transport import is_daily_quota_error, is_quota_error
+        from sequence_engine import SequenceEngine
+        from suppression import get_suppression_list
+
+        counts = {"sent": 0, "failed": 0, "skipped": 0}
+        suppression = get_suppression_list()
+        deadline = self.clock() + hours * 3600 if hours is not None else None
+
+        sequences = SequenceEngine(self._account_sender(self.planner.default_account))
+        self._open_experiment()
+        if self.journal.in_doubt():
+            self._reconcile((draft['id'] for email in self.planner.accounts
+                             for draft in self._account_sender(email).list_drafts()), drafts, sequences, suppression)
+
+        # Priority order is fixed for the run; replanning only moves sends in time
+        queue = prioritize_drafts(self._pending(drafts, counts))
+        pending = {draft_id: (draft_id, score, draft) for draft_id, score, draft in queue.drain()}
+        self.emit("start", selected=len(drafts), pending=len(pending),
+                  accounts=sorted(self.planner.accounts))
+
+        blocked_until: Dict[str, float] = {}
+        in_flight = {}
+        busy = set()
+        plan_queues: Dict[str, deque] = {}
+        replan_at = 0.0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                now = self.clock()
+                stopping = self._stopping() or (deadline is not None and now >= deadline)
+                if not stopping and now >= replan_at:
+                    sending = {draft_id for draft_id, _ in in_flight.values()}
+                    plan = self.planner.plan(
+                        (item for draft_id, item in pending.items() if draft_id not in sending),
+                        self.planner.usage(self.journal, now), now, blocked_until, horizon_days)
+                    plan_queues = plan.by_account()
+                    replan_at = now + REPLAN_INTERVAL
+                    self._emit_plan(plan)
+
+                # Claim every send that is due, one per idle account
+                while not stopping:
+                    claimed = False
+                    for email, planned in plan_queues.items():
+                        if email in busy or not planned or planned[0].at > now:
+                            continue
+                        send = planned.popleft()
+                        _, score, draft = pending[send.draft_id]
+                        reason = suppression.check(draft['email'])
+                        if reason:
+                            del pending[send.draft_id]
+                            counts["skipped"] += 1
+                            self.emit("skipped", draft_id=send.draft_id, email=draft['email'],
+                                      reason=f"suppressed ({reason})")
+                            continue
+                        self._account_sender(email)
+                        self.journal.record(send.draft_id, CLAIMED, email=draft['email'], account=email)
+                        future = executor.submit(self._send_as, email, send.draft_id)
+                        in_flight[future] = (send.draft_id, email)
+                        busy.add(email)
+                        claimed = True
+                    if not claimed:
+                        break
+
+                waiting = [planned[0].at for email, planned in plan_queues.items() if planned and email not in busy]
+                if not in_flight and (stopping or not waiting):
+                    break
+
+                timeout = min([replan_at - now] + [at - now for at in waiting])
+                if deadline is not None:
+                    timeout = min(timeout, deadline - now)
+                timeout = max(0.05, timeout)
+                if in_flight:
+                    done, _ = wait(in_flight, timeout=min(timeout, 1.0), return_when=FIRST_COMPLETED)
+                else:
+                    self.stop_requested.wait(timeout)
+                    done = ()
+
+                for future in done:
+                    draft_id, email = in_flight.pop(future)
+                    _, score, draft = pending.pop(draft_id)
+                    busy.discard(email)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if not is_quota_error(e):
+                            self._record_failed(draft_id, draft, e, counts, account=email)
+                            continue
+                        # Not the draft's fault: keep it queued, rest the account and replan
+                        self.journal.record(draft_id, FAILED, error=str(e), account=email)
+                        pending[draft_id] = (draft_id, score, draft)
+                        backoff = DAILY_LIMIT_BACKOFF if is_daily_quota_error(e) else RATE_LIMIT_BACKOFF
+                        blocked_until[email] = self.clock() + backoff
+                        replan_at = 0.0
+                        self.emit("deferred", draft_id=draft_id, email=draft['email'], account=email,
+                                  error=str(e), retry_after=round(blocked_until[email], 3))
+                        continue
+                    self._record_sent(draft_id, score, draft, result, sequences, suppression, counts,
+                                      account=email)
+
+        sequences.close()
+        self._close_experiment()
+        self.emit("done", interrupted=self._stopping(), remaining=len(pending), **counts)
+        return counts
+
+
+def build_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description="Plan and pace draft sends within each account's quota.")
+    parser.add_argument('action', nargs='?', choices=['plan', 'run'], default='plan',
+                        help="show the plan (default), or send by it")
+    parser.add_argument('--type', dest='types', action='append', help="business type or template (repeatable)")
+    parser.add_argument('--location', dest='locations', action='append',
+                        help='"City, ST" or a state (repeatable)')
+    parser.add_argument('--min-score', type=float, help="minimum lead priority score")
+    parser.add_argument('--days', type=float, help="plan at most this many days ahead")
+    parser.add_argument('--hours', type=float, help="run: stop after this many hours")
+    parser.add_argument('--json', action='store_true', help="plan: print the full plan as JSON")
+    parser.add_argument('--accounts', default=ACCOUNTS_FILE, help=f"accounts file (default {ACCOUNTS_FILE})")
+    parser.add_argument('--drafts', default=DRAFTS_FILE, help=f"drafts file (default {DRAFTS_FILE})")
+    parser.add_argument('--journal', default=JOURNAL_FILE, help=f"send journal (default {JOURNAL_FILE})")
+    return parser
+
+
+def print_plan(plan: SendPlan) -> None:
+    def clock(at: float) -> str:
+        return datetime.fromtimestamp(at).strftime('%H:%M')
+
+    for row in plan.schedule():
+        pace = f" (~{row['per_minute']}/minute)" if row['per_minute'] else ""
+        print(f"{row['day']}  {row['account']}: {row['sends']} sends "
+              f"{clock(row['first'])}-{clock(row['last'])}{pace}")
+    if plan.completion:
+        print(f"Predicted completion: {datetime.fromtimestamp(plan.completion).strftime('%Y-%m-%d %H:%M')}")
+    reasons = {}
+    for _, reason in plan.unplanned:
+        reasons[reason] = reasons.get(reason, 0) + 1
+    for reason, count in sorted(reasons.items()):
+        print(f"Not planned: {count} ({reason})")
+
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None) -> int:
+    args = build_parser(prog).parse_args(argv)
+    try:
+        drafts = load_drafts(args.drafts)
+    except FileNotFoundError:
+        print(f"No drafts in {args.drafts} or {CAMPAIGN_DB}; create drafts first")
+        return 1
+    selected = select_drafts(drafts, args.types, args.locations, args.min_score)
+
+    from config import get_config
+    planner = SendPlanner(load_accounts(args.accounts), get_config().sender_email)
+    journal = SendJournal(args.journal)
+    try:
+        if args.action == 'plan':
+            from lead_scoring import prioritize_drafts
+            now = time.time()
+            pending = [draft for draft in selected if journal.states.get(draft['draft_id']) != SENT]
+            plan = planner.plan(prioritize_drafts(pending).drain(), planner.usage(journal, now), now,
+                                horizon_days=args.days)
+            if args.json:
+                print(json.dumps(plan.to_dict(), indent=2))
+            else:
+                print_plan(plan)
+            return 0
+
+        executor = PlanExecutor(planner, journal=journal)
+        executor.install_signal_handlers()
+        counts = executor.run(selected, hours=args.hours, horizon_days=args.days)
+        if executor.stop_requested.is_set():
+            return 130
+        return 1 if counts["failed"] else 0
+    finally:
+        journal.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Follow-up Sequence Engine
+Moves each prospect through a series of timed touches (day 0 email, day 4
+follow-up, ...) and stops automatically on reply or bounce: before each run
+the sender's inbox is checked for replies from prospects and for bounce
+notices (reply/bounce on the command line record them by hand). Sequence
+state lives in SQLite; a heap of due times decides what to send next, so
+only sequences that are actually due are ever touched. Follow-ups carry
+In-Reply-To/References so they thread under the first email.
+"""
+
+import heapq
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import get_config
+from email_templates import customize_follow_up, customize_template
+from mail_transport import is_daily_quota_error, is_quota_error
+from suppression import SuppressedRecipientError, get_suppression_list
+
+SEQUENCES_DB = 'sequences.db'
+
+DAY = 24 * 60 * 60
+
+# Failed sends are retried after RETRY_DELAY, up to MAX_SEND_ATTEMPTS times per touch
+RETRY_DELAY = 60 * 60
+MAX_SEND_ATTEMPTS = 3
+
+# A Gmail rate limit or daily cap defers the due touches by this long without
+# using up an attempt (as send_planner.PlanExecutor backs an account off)
+RATE_LIMIT_DELAY = 60
+DAILY_LIMIT_DELAY = 60 * 60
+
+# The run loop wakes at least this often to pick up enrollments and
+# replies recorded by other processes
+MAX_SLEEP = 15 * 60
+
+# Inbox checks re-read this much before the previous check, for mail that
+# arrived late or carries an earlier timestamp
+INBOX_OVERLAP = 60 * 60
+
+# Sequences pause while the inbox can't be read (a follow-up could go to
+# someone who already replied); after this many failed checks in a row the
+# run fails instead
+INBOX_FAILURE_LIMIT = 3
+
+ACTIVE = 'active'
+COMPLETED = 'completed'
+REPLIED = 'replied'
+BOUNCED = 'bounced'
+FAILED = 'failed'
+SUPPRESSED = 'suppressed'
+
+
+class InboxCheckError(Exception):
+    """The inbox could not be checked for replies and bounces, so sequences can't safely continue."""
+
+
+@dataclass
+class Touch:
+    __slots__ = ("delay_days", "template")
+
+    delay_days: int
+    # 'initial' for the business-type outreach email, otherwise a FOLLOW_UP_TEMPLATES key
+    template: str
+
+
+DEFAULT_SEQUENCE = [
+    Touch(0, "initial"),
+    Touch(4, "follow_up_1"),
+    Touch(10, "follow_up_2")
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sequences (
+    email TEXT PRIMARY KEY,
+    business_name TEXT NOT NULL,
+    template_type TEXT NOT NULL,
+    subject TEXT,
+    started_at REAL NOT NULL,
+    step INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_due REAL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    sent_id TEXT,
+    message_id TEXT
+);
+CREATE INDEX IF NOT EXISTS sequences_due ON sequences(status, next_due);
+CREATE TABLE IF NOT EXISTS touches (
+    id INTEGER PRIMARY KEY,
+    email TEXT NOT NULL,
+    step INTEGER NOT NULL,
+    template TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    message_id TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS engine_state (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+# Columns added to sequences after the first release: (name, SQL type)
+_ADDED_COLUMNS = [("sent_id", "TEXT"), ("message_id", "TEXT")]
+
+
+def _header_message_id(result: dict) -> Optional[str]:
+    """The Message-ID a send result carries, when the transport reports it directly."""
+    message_id = result.get('message_id') or result.get('id') or ''
+    return message_id if message_id.startswith('<') else None
+
+
+class SequenceEngine:
+    """Durable multi-touch sequences driven by a min-heap of due times.
+
+    The heap holds (next_due, email, step) for every active sequence. Replies,
+    bounces and rescheduling don't touch the heap; instead each popped entry
+    is checked against the stored row and dropped if it is stale.
+    """
+
+    def __init__(self,
+                 sender=None,
+                 path: str = SEQUENCES_DB,
+                 touches: Optional[List[Touch]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.sender = sender
+        self.path = path
+        self.touches = touches or DEFAULT_SEQUENCE
+        self.clock = clock
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self._heap: List[Tuple[float, str, int]] = []
+        self._quota_retry_at: Optional[float] = None
+        self.reload()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _migrate(self) -> None:
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(sequences)")}
+        with self.conn:
+            for name, sql_type in _ADDED_COLUMNS:
+                if name not in columns:
+                    self.conn.execute(f"ALTER TABLE sequences ADD COLUMN {name} {sql_type}")
+
+    def reload(self) -> None:
+        """Rebuild the heap from the active sequences in the store."""
+        self._heap = list(self.conn.execute(
+            "SELECT next_due, email, step FROM sequences WHERE status = ? AND next_due IS NOT NULL", (ACTIVE,)))
+        heapq.heapify(self._heap)
+
+    def _due_at(self, started_at: float, step: int) -> float:
+        return started_at + self.touches[step].delay_days * DAY
+
+    def enroll(self,
+               email: str,
+               business_name: str,
+               template_type: str,
+               subject: Optional[str] = None,
+               first_touch_sent: bool = False,
+               started_at: Optional[float] = None,
+               sent: Optional[dict] = None) -> bool:
+        """Start a sequence for a prospect; returns False if already enrolled.
+
+        With first_touch_sent the day-0 email has gone out already (e.g. as a
+        campaign draft), subject should be its subject line and sent the
+        send result, so follow-ups thread under it.
+        """
+        now = self.clock()
+        started_at = now if started_at is None else started_at
+        step = 1 if first_touch_sent else 0
+        status, next_due = ACTIVE, None
+        if step < len(self.touches):
+            next_due = self._due_at(started_at, step)
+        else:
+            status = COMPLETED
+
+        sent_id = sent.get('id') if sent else None
+        message_id = _header_message_id(sent) if sent else None
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO sequences (email, business_name, template_type, subject, started_at, "
+                "step, next_due, status, updated_at, sent_id, message_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (email, business_name, template_type, subject, started_at, step, next_due, status, now,
+                 sent_id, message_id))
+        if cursor.rowcount and next_due is not None:
+            heapq.heappush(self._heap, (next_due, email, step))
+        return bool(cursor.rowcount)
+
+    def stop(self, email: str, status: str) -> bool:
+        """End an active sequence (REPLIED, BOUNCED, ...); returns False if it wasn't active."""
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE sequences SET status = ?, next_due = NULL, updated_at = ? WHERE email = ? AND status = ?",
+                (status, self.clock(), email, ACTIVE))
+        return bool(cursor.rowcount)
+
+    def record_reply(self, email: str) -> bool:
+        return self.stop(email, REPLIED)
+
+    def record_bounce(self, email: str) -> bool:
+        get_suppression_list().suppress(email, BOUNCED)
+        return self.stop(email, BOUNCED)
+
+    def check_inbox(self, now: Optional[float] = None) -> Dict[str, List[str]]:
+        """Stop the sequences whose prospect replied or whose email bounced, from the sender's inbox.
+
+        A bounce is matched by the addresses it reports as failed (or the
+        message it answers); a reply by its sender or the message it answers.
+        Auto-replies such as out-of-office notices are ignored. Returns the
+        emails stopped, by status.
+        """
+        stopped = {REPLIED: [], BOUNCED: []}
+        inbound_messages = getattr(self.sender, 'inbound_messages', None)
+        if inbound_messages is None:
+            return stopped
+        now = self.clock() if now is None else now
+        row = self.conn.execute("SELECT value FROM engine_state WHERE key = 'inbox_checked_at'").fetchone()
+        if row is not None:
+            since = row[0] - INBOX_OVERLAP
+        else:
+            since = self.conn.execute("SELECT MIN(started_at) FROM sequences WHERE status = ?",
+                                      (ACTIVE,)).fetchone()[0] or now
+
+        active = {}
+        threads = {}
+        for email, message_id in self.conn.execute(
+                "SELECT email, message_id FROM sequences WHERE status = ?", (ACTIVE,)):
+            active[email.lower()] = email
+            if message_id:
+                threads[message_id] = email
+
+        for message in inbound_messages(since):
+            answered = [threads[reference] for reference in message['references'] if reference in threads]
+            if message['bounce']:
+                failed = [active[address] for address in message['failed_recipients'] if address in active]
+                for email in failed or answered:
+                    if self.record_bounce(email):
+                        stopped[BOUNCED].append(email)
+            elif not message['automatic']:
+                email = active.get(message['from']) or next(iter(answered), None)
+                if email is not None and self.record_reply(email):
+                    stopped[REPLIED].append(email)
+
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO engine_state (key, value) VALUES ('inbox_checked_at', ?)",
+                              (now,))
+        if stopped[REPLIED]:
+            credit_replies(stopped[REPLIED])
+        return stopped
+
+    def next_wakeup(self) -> Optional[float]:
+        """Due time of the earliest queued touch, or None if nothing is queued."""
+        return self._heap[0][0] if self._heap else None
+
+    def due(self, now: Optional[float] = None) -> Iterator[sqlite3.Row]:
+        """Pop and yield the stored rows of sequences due at now, skipping stale entries."""
+        now = self.clock() if now is None else now
+        self.conn.row_factory = sqlite3.Row
+        try:
+            while self._heap and self._heap[0][0] <= now:
+                next_due, email, step = heapq.heappop(self._heap)
+                row = self.conn.execute("SELECT * FROM sequences WHERE email = ?", (email,)).fetchone()
+                if row and row['status'] == ACTIVE and row['step'] == step and row['next_due'] == next_due:
+                    yield row
+        finally:
+            self.conn.row_factory = None
+
+    def _compose(self, row: sqlite3.Row, touch: Touch) -> dict:
+        config = get_config()
+        if touch.template == "initial":
+            return customize_template(row['template_type'], row['business_name'],
+                                      config.sender_name, config.sender_email, config.sender_phone)
+        return customize_follow_up(touch.template, row['business_name'], row['subject'] or "Outbound",
+                                   config.sender_name, config.sender_email, config.sender_phone)
+
+    def _thread_message_id(self, row: sqlite3.Row) -> Optional[str]:
+        """Message-ID of the sequence's first email, looked up (and stored) on first use."""
+        if row['message_id'] or not row['sent_id']:
+            return row['message_id']
+        try:
+            message_id = self.sender.sent_message_id({'id': row['sent_id']})
+        except Exception as e:
+            print(f"Could not look up the first email to {row['email']}; sending unthreaded: {e}")
+            return None
+        if message_id:
+            with self.conn:
+                self.conn.execute("UPDATE sequences SET message_id = ? WHERE email = ?", (message_id, row['email']))
+        return message_id
+
+    def _send_touch(self, row: sqlite3.Row, now: float) -> bool:
+        email, step = row['email'], row['step']
+        touch = self.touches[step]
+        content = self._compose(row, touch)
+        try:
+            if step == 0:
+                # A new contact, so the recent-contact cooldown applies too
+                self.sender.check_recipients([email])
+                result = self.sender.send_email(to_emails=[email], subject=content['subject'], body=content['body'])
+            else:
+                result = self.sender.send_email(to_emails=[email], subject=content['subject'], body=content['body'],
+                                                in_reply_to=self._thread_message_id(row))
+        except SuppressedRecipientError:
+            self.stop(email, SUPPRESSED)
+            return False
+        except Exception as e:
+            if is_quota_error(e):
+                # Not the touch's fault: keep it queued and hold back the rest of this run
+                self._quota_retry_at = now + (DAILY_LIMIT_DELAY if is_daily_quota_error(e) else RATE_LIMIT_DELAY)
+                self._defer(row, self._quota_retry_at, now, error=str(e))
+                return False
+            attempts = row['attempts'] + 1
+            status, next_due = ACTIVE, now + RETRY_DELAY
+            if attempts >= MAX_SEND_ATTEMPTS:
+                status, next_due = FAILED, None
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO touches (email, step, template, sent_at, error) VALUES (?, ?, ?, ?, ?)",
+                    (email, step, touch.template, now, str(e)))
+                self.conn.execute(
+                    "UPDATE sequences SET attempts = ?, next_due = ?, status = ?, updated_at = ? WHERE email = ?",
+                    (attempts, next_due, status, now, email))
+            if next_due is not None:
+                heapq.heappush(self._heap, (next_due, email, step))
+            return False
+
+        step += 1
+        status, next_due = ACTIVE, None
+        if step < len(self.touches):
+            next_due = self._due_at(row['started_at'], step)
+        else:
+            status = COMPLETED
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO touches (email, step, template, sent_at, message_id) VALUES (?, ?, ?, ?, ?)",
+                (email, step - 1, touch.template, now, result.get('id')))
+            self.conn.execute(
+                "UPDATE sequences SET subject = COALESCE(subject, ?), sent_id = COALESCE(sent_id, ?), "
+                "message_id = COALESCE(message_id, ?), step = ?, attempts = 0, next_due = ?, "
+                "status = ?, updated_at = ? WHERE email = ?",
+                (content['subject'], result.get('id'), _header_message_id(result), step, next_due, status,
+                 now, email))
+        if next_due is not None:
+            heapq.heappush(self._heap, (next_due, email, step))
+        return True
+
+    def _defer(self, row: sqlite3.Row, until: float, now: float, error: Optional[str] = None) -> None:
+        """Requeue a due touch for until without using up a send attempt."""
+        email, step = row['email'], row['step']
+        with self.conn:
+            if error is not None:
+                self.conn.execute(
+                    "INSERT INTO touches (email, step, template, sent_at, error) VALUES (?, ?, ?, ?, ?)",
+                    (email, step, self.touches[step].template, now, error))
+            self.conn.execute("UPDATE sequences SET next_due = ?, updated_at = ? WHERE email = ?",
+                              (until, now, email))
+        heapq.heappush(self._heap, (until, email, step))
+
+    def _inbox_failures(self, failures: Optional[int] = None) -> int:
+        """Consecutive failed inbox checks; sets the count when failures is given."""
+        if failures is not None:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO engine_state (key, value) VALUES ('inbox_failures', ?)",
+                                  (failures,))
+            return failures
+        row = self.conn.execute("SELECT value FROM engine_state WHERE key = 'inbox_failures'").fetchone()
+        return int(row[0]) if row is not None else 0
+
+    def run_due(self, now: Optional[float] = None) -> int:
+        """Stop sequences that got a reply or bounced, then send every touch that is due; returns the number sent.
+
+        If the inbox can't be read nothing is sent: touches stay queued for
+        the next run. A permission error, or INBOX_FAILURE_LIMIT failures in
+        a row, raises InboxCheckError. A Gmail quota error defers the touch
+        and every other due touch without counting it as a failed attempt.
+        """
+        now = self.clock() if now is None else now
+        try:
+            stopped = self.check_inbox(now)
+        except Exception as e:
+            failures = self._inbox_failures(self._inbox_failures() + 1)
+            print(f"⚠️  Could not check the inbox for replies and bounces ({failures} failed checks in a row): {e}")
+            if getattr(getattr(e, 'resp', None), 'status', None) in (401, 403):
+                raise InboxCheckError(f"The sender can't read its inbox ({e}); re-authorize Gmail with the "
+                                      f"scopes in gmail_sender.SCOPES (delete the token file and run again)") from e
+            if failures >= INBOX_FAILURE_LIMIT:
+                raise InboxCheckError(f"Inbox check failed {failures} times in a row: {e}") from e
+            print("   Follow-ups are paused until the inbox can be checked")
+            return 0
+        if self._inbox_failures():
+            self._inbox_failures(0)
+        if stopped[REPLIED] or stopped[BOUNCED]:
+            print(f"Stopped {len(stopped[REPLIED])} sequences on reply, {len(stopped[BOUNCED])} on bounce")
+
+        sent = deferred = 0
+        self._quota_retry_at = None
+        for row in list(self.due(now)):
+            if self._quota_retry_at is not None:
+                # Every later send would hit the quota too
+                self._defer(row, self._quota_retry_at, now)
+                deferred += 1
+                continue
+            sent += self._send_touch(row, now)
+        if self._quota_retry_at is not None:
+            print(f"⏳ Gmail sending quota reached; {deferred + 1} follow-ups deferred "
+                  f"for {round(self._quota_retry_at - now)}s")
+        return sent
+
+    def run_forever(self, sleep: Callable[[float], None] = time.sleep) -> None:
+        """Send touches as they fall due, sleeping until the next one in between."""
+        while True:
+            sent = self.run_due()
+            if sent:
+                print(f"📤 Sent {sent} sequence emails")
+            wakeup = self.next_wakeup()
+            delay = MAX_SLEEP if wakeup is None else min(MAX_SLEEP, wakeup - self.clock())
+            sleep(max(0.0, delay))
+            self.reload()
+
+    def status_counts(self) -> dict:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM sequences GROUP BY status"))
+
+
+def credit_replies(emails: List[str]) -> None:
+    """Credit replies to the subject-line experiment variants the prospects received."""
+    from subject_experiments import SubjectExperiment
+    experiment = SubjectExperiment.load()
+    if sum(experiment.record_reply(email) for email in emails):
+        experiment.save()
+
+
+def enroll_prospects(engine: SequenceEngine, prospects: dict, validator=None) -> int:
+    """Enroll every prospect with a valid email and a template, starting now; returns the number enrolled."""
+    from campaign_sharding import enumerate_prospects
+    from email_validation import filter_valid_prospects
+    from business_types import resolve_business_type
+
+    enrolled = 0
+    for _, category, business in filter_valid_prospects(enumerate_prospects(prospects), validator):
+        template_type = resolve_business_type(category)
+        if template_type and engine.enroll(business['email'], business['name'], template_type):
+            enrolled += 1
+    return enrolled
+
+
+def main():
+    """Manage follow-up sequences from the command line."""
+    usage = "Usage: python sequence_engine.py [enroll|run [--loop]|reply EMAIL|bounce EMAIL|status]"
+    if len(sys.argv) < 2:
+        print(usage)
+        return
+
+    command = sys.argv[1]
+    if command in ('reply', 'bounce'):
+        if len(sys.argv) < 3:
+            print(usage)
+            return
+        engine = SequenceEngine()
+        stopped = engine.record_reply(sys.argv[2]) if command == 'reply' else engine.record_bounce(sys.argv[2])
+        print(f"Stopped sequence for {sys.argv[2]}" if stopped else f"No active sequence for {sys.argv[2]}")
+        if command == 'reply':
+            credit_replies([sys.argv[2]])
+    elif command == 'enroll':
+        import json
+        with open('business_prospects.json', 'r') as f:
+            prospects = json.load(f)
+        engine = SequenceEngine()
+        print(f"Enrolled {enroll_prospects(engine, prospects)} prospects")
+    elif command == 'run':
+        from gmail_sender import GmailSender
+        engine = SequenceEngine(GmailSender.from_config())
+        try:
+            if '--loop' in sys.argv:
+                engine.run_forever()
+            else:
+                print(f"📤 Sent {engine.run_due()} sequence emails")
+        except InboxCheckError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    elif command == 'status':
+        engine = SequenceEngine()
+        for status, count in sorted(engine.status_counts().items()):
+            print(f"  {status}: {count}")
+        wakeup = engine.next_wakeup()
+        if wakeup is not None:
+            print(f"Next touch due: {time.strftime('%Y-%m-%d %H:%M', time.localtime(wakeup))}")
+    else:
+        print(usage)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Subject Line Experiments
+Keeps several subject-line and opening variants per business type and
+assigns them with a Thompson-sampling bandit, so a campaign shifts toward
+the variants that get replies. Each variant's Beta posterior is just a
+(sends, replies) pair, updated in O(1) per event and saved to JSON.
+
+Variants are assigned when a draft is created but only counted as sent
+once the send path reports the draft went out (record_draft_sent).
+
+Several processes update the file (the send path, sequence_engine.py
+crediting replies, draft_gc.py), so save() replays this process's updates
+onto the file's current contents under a lock instead of overwriting it.
+"""
+
+import json
+import os
+import random
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from business_types import BUSINESS_TYPES, DEFAULT_SUBJECT_VARIANTS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+EXPERIMENTS_FILE = 'experiments.json'
+
+# Subject variants per business type (from the business type registry);
+# the first is the original control copy
+SUBJECT_VARIANTS = {key: business_type.subject_variants for key, business_type in BUSINESS_TYPES.items()}
+
+# Opening variants, used when the reviews give us a quote to work with
+OPENING_VARIANTS = {
+    "mentions": 'Your reviews mention curiosity about your process {curiosity_mentions} times. Recent quote: "{quote}"',
+    "quote_first": '"{quote}" - that\'s one of your customers, and {curiosity_mentions} of your reviews say something similar.',
+    "guests": '{curiosity_mentions} of your reviewers are curious how you work. One of them wrote: "{quote}"'
+}
+
+
+@contextmanager
+def _locked(path: str):
+    """Hold an exclusive lock on path's lock file (path + '.lock')."""
+    with open(path + '.lock', 'a+') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@dataclass
+class Arm:
+    """Beta(1 + replies, 1 + sends - replies) posterior for one variant."""
+
+    __slots__ = ("sends", "replies")
+
+    sends: int
+    replies: int
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.betavariate(1 + self.replies, 1 + max(0, self.sends - self.replies))
+
+    @property
+    def reply_rate(self) -> float:
+        return (1 + self.replies) / (2 + self.sends)
+
+
+class SubjectExperiment:
+    """Thompson-sampling allocation of subject and opening variants.
+
+    Variant ids look like "bakery:subject:question". Sends and replies are
+    attributed per recipient email through the recorded assignments; drafts
+    not yet sent wait in pending, keyed by draft ID.
+
+    Updates apply immediately and are also kept until save(), which replays
+    them onto the saved experiment so concurrent writers don't lose each
+    other's counts.
+    """
+
+    def __init__(self,
+                 arms: Optional[Dict[str, Arm]] = None,
+                 assignments: Optional[Dict[str, Dict]] = None,
+                 seed: Optional[int] = None,
+                 pending: Optional[Dict[str, Dict]] = None):
+        self.arms: Dict[str, Arm] = arms or {}
+        self.assignments: Dict[str, Dict] = assignments or {}
+        self.pending: Dict[str, Dict] = pending or {}
+        self.rng = random.Random(seed)
+        # (method, args) of the updates made since the last save
+        self._unsaved: List[Tuple[str, tuple]] = []
+
+    @classmethod
+    def load(cls, path: str = EXPERIMENTS_FILE, seed: Optional[int] = None) -> 'SubjectExperiment':
+        if not os.path.exists(path):
+            return cls(seed=seed)
+        with open(path, 'r') as f:
+            data = json.load(f)
+        arms = {variant_id: Arm(counts["sends"], counts["replies"]) for variant_id, counts in data["arms"].items()}
+        return cls(arms, data.get("assignments", {}), seed, data.get("pending", {}))
+
+    @classmethod
+    def load_existing(cls, path: str = EXPERIMENTS_FILE) -> Optional['SubjectExperiment']:
+        """The saved experiment at path, or None when no experiment has been run."""
+        return cls.load(path) if os.path.exists(path) else None
+
+    def save(self, path: str = EXPERIMENTS_FILE) -> None:
+        """Replay the updates made since loading onto the saved experiment and write it back.
+
+        Afterwards this experiment holds the merged state, including other
+        processes' updates.
+        """
+        with _locked(path):
+            current = SubjectExperiment.load(path)
+            for method, args in self._unsaved:
+                getattr(current, method)(*args)
+            data = {
+                "arms": {variant_id: {"sends": arm.sends, "replies": arm.replies}
+                         for variant_id, arm in current.arms.items()},
+                "assignments": current.assignments,
+                "pending": current.pending
+            }
+            # Write-then-rename so a crash never leaves half a file behind
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        self.arms, self.assignments, self.pending = current.arms, current.assignments, current.pending
+        self._unsaved = []
+
+    def _update(self, method: str, *args):
+        """Apply an update now and keep it for save() to replay."""
+        self._unsaved.append((method, args))
+        return getattr(self, method)(*args)
+
+    def _arm(self, variant_id: str) -> Arm:
+        arm = self.arms.get(variant_id)
+        if arm is None:
+            arm = self.arms[variant_id] = Arm(0, 0)
+        return arm
+
+    def choose(self, prefix: str, variants: Iterable[str]) -> str:
+        """Draw from each variant's posterior and return the id of the best draw."""
+        return max((f"{prefix}:{name}" for name in variants), key=lambda variant_id: self._arm(variant_id).sample(self.rng))
+
+    def subject(self, report) -> Tuple[str, str]:
+        """(variant id, subject line) for an IntelligenceReport."""
+        variants = SUBJECT_VARIANTS.get(report.business_type, DEFAULT_SUBJECT_VARIANTS)
+        variant_id = self.choose(f"{report.business_type}:subject", variants)
+        subject = variants[variant_id.rsplit(':', 1)[1]].format(
+            business_name=report.business_name,
+            monthly_revenue=report.revenue_projections.monthly_revenue
+        )
+        return variant_id, subject
+
+    def opening(self, report) -> Optional[Tuple[str, str]]:
+        """(variant id, opening) for a report, or None when its reviews have no quote."""
+        reviews = report.reviews_analysis
+        if not reviews.curiosity_mentions or not reviews.sample_quotes:
+            return None
+        variant_id = self.choose(f"{report.business_type}:opening", OPENING_VARIANTS)
+        opening = OPENING_VARIANTS[variant_id.rsplit(':', 1)[1]].format(
+            curiosity_mentions=reviews.curiosity_mentions,
+            quote=reviews.sample_quotes[0]
+        )
+        return variant_id, opening
+
+    def assign(self, draft_id: str, email: str, variant_ids: Iterable[str]) -> None:
+        """Remember which variants a draft was written with, until it is sent."""
+        self._update('_assign', draft_id, email, list(variant_ids))
+
+    def _assign(self, draft_id: str, email: str, variant_ids: List[str]) -> None:
+        self.pending[draft_id] = {"email": email, "variants": list(variant_ids)}
+
+    def assign_campaigns(self, campaigns: Iterable[dict]) -> int:
+        """Assign the variants of created campaigns; returns how many were in the experiment."""
+        assigned = 0
+        for campaign in campaigns:
+            variants = getattr(campaign["personalized_copy"], "variants", None)
+            if variants and campaign.get("draft_id"):
+                self.assign(campaign["draft_id"], campaign["email"], variants.values())
+                assigned += 1
+        return assigned
+
+    def discard_drafts(self, draft_ids: Iterable[str]) -> int:
+        """Forget the assignments of drafts deleted unsent; returns how many were pending."""
+        return self._update('_discard_drafts', list(draft_ids))
+
+    def _discard_drafts(self, draft_ids: List[str]) -> int:
+        return sum(self.pending.pop(draft_id, None) is not None for draft_id in draft_ids)
+
+    def record_send(self, email: str, variant_ids: Iterable[str]) -> bool:
+        """Count a send for each variant an email went out with.
+
+        Returns False, counting nothing, when the email was already recorded
+        with the same variants (a resent or duplicate draft).
+        """
+        return self._update('_record_send', email, list(variant_ids))
+
+    def _record_send(self, email: str, variant_ids: List[str]) -> bool:
+        assignment = self.assignments.get(email)
+        if assignment is not None and assignment["variants"] == variant_ids:
+            return False
+        for variant_id in variant_ids:
+            self._arm(variant_id).sends += 1
+        self.assignments[email] = {"variants": variant_ids, "replied": False}
+        return True
+
+    def record_draft_sent(self, draft_id: str) -> bool:
+        """Count the send of an assigned draft; returns False for drafts outside the experiment."""
+        return self._update('_record_draft_sent', draft_id)
+
+    def _record_draft_sent(self, draft_id: str) -> bool:
+        assignment = self.pending.pop(draft_id, None)
+        if assignment is None:
+            return False
+        return self._record_send(assignment["email"], assignment["variants"])
+
+    def record_reply(self, email: str) -> bool:
+        """Credit a reply to the email's variants; returns False if unknown or already credited."""
+        return self._update('_record_reply', email)
+
+    def _record_reply(self, email: str) -> bool:
+        assignment = self.assignments.get(email)
+        if assignment is None or assignment["replied"]:
+            return False
+        for variant_id in assignment["variants"]:
+            self._arm(variant_id).replies += 1
+        assignment["replied"] = True
+        return True
+
+    def summary(self) -> List[Tuple[str, int, int, float]]:
+        """(variant id, sends, replies, posterior mean reply rate), best first within each slot."""
+        return sorted(
+            ((variant_id, arm.sends, arm.replies, arm.reply_rate) for variant_id, arm in self.arms.items()),
+            key=lambda row: (row[0].rsplit(':', 1)[0], -row[3])
+        )
+
+
+def main():
+    """Show experiment results or credit a reply."""
+    experiment = SubjectExperiment.load()
+    if len(sys.argv) > 2 and sys.argv[1] == 'reply':
+        if experiment.record_reply(sys.argv[2]):
+            experiment.save()
+            print(f"Credited reply from {sys.argv[2]}")
+        else:
+            print(f"No uncredited experiment send to {sys.argv[2]}")
+    elif len(sys.argv) == 1 or sys.argv[1] == 'report':
+        print(f"{'Variant':45} {'Sends':>6} {'Replies':>8} {'Rate':>6}")
+        for variant_id, sends, replies, rate in experiment.summary():
+            print(f"{variant_id:45} {sends:>6} {replies:>8} {rate:>6.1%}")
+    else:
+        print("Usage: python subject_experiments.py [report|reply EMAIL]")
+
+
+if __name__ == '__main__':
+    main()
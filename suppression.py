@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Suppression List
+Persistent list of addresses and domains that must not be emailed
+(unsubscribed, bounced, complained, or contacted recently). Checks go
+through an in-memory Bloom filter first, so the common "not suppressed"
+answer costs a few hashes however large the list grows; only possible hits
+are confirmed against SQLite. Entries other processes commit are picked up
+before the next check (PRAGMA data_version tells when there are any).
+"""
+
+import csv
+import hashlib
+import math
+import sqlite3
+import sys
+import threading
+import time
+from typing import Iterable, Optional, Tuple
+
+SUPPRESSION_DB = 'suppression.db'
+
+UNSUBSCRIBED = 'unsubscribed'
+BOUNCED = 'bounced'
+COMPLAINED = 'complained'
+MANUAL = 'manual'
+CONTACTED = 'contacted'
+
+# Recently contacted addresses are held back from new outreach this long
+CONTACT_COOLDOWN_DAYS = 30
+
+# The Bloom filter is sized for twice the current list (and at least this),
+# keeping false positives near BLOOM_ERROR_RATE as the list grows
+MIN_BLOOM_CAPACITY = 100000
+BLOOM_ERROR_RATE = 0.001
+
+# Entries committed by other processes are read back from this long before
+# the newest entry already in the filter, covering writers whose added_at
+# was stamped a while before their commit landed
+REFRESH_OVERLAP = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS suppressions (
+    entry TEXT PRIMARY KEY,
+    reason TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    expires_at REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS suppressions_added ON suppressions(added_at);
+"""
+
+
+class SuppressedRecipientError(Exception):
+    """Raised when a send is attempted to a suppressed address."""
+
+    def __init__(self, email: str, reason: str):
+        super().__init__(f"{email} is suppressed ({reason})")
+        self.email = email
+        self.reason = reason
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using blake2b double hashing."""
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def normalize_entry(entry: str) -> str:
+    """Canonical key: a lowercased address, or '@domain' for a whole domain."""
+    entry = entry.strip().lower()
+    if '@' not in entry:
+        entry = '@' + entry
+    return entry
+
+
+class SuppressionList:
+    """SQLite-backed suppression list with a Bloom filter in front.
+
+    Safe to share between threads (send_bulk_emails checks from a pool).
+    """
+
+    def __init__(self, path: str = SUPPRESSION_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        # Contact records are written on every send; keep those commits cheap
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        self._load()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _load(self) -> None:
+        now = time.time()
+        # Read first, so a commit racing the load shows up as a new version
+        self._data_version = self._version()
+        count = self.conn.execute(
+            "SELECT COUNT(*) FROM suppressions WHERE expires_at IS NULL OR expires_at > ?", (now,)).fetchone()[0]
+        self.capacity = max(MIN_BLOOM_CAPACITY, 2 * count)
+        self.bloom = BloomFilter(self.capacity)
+        self._entries = 0
+        self._watermark = -1.0
+        self._add_rows(self.conn.execute(
+            "SELECT entry, added_at FROM suppressions WHERE expires_at IS NULL OR expires_at > ?", (now,)))
+
+    def _add_rows(self, rows: Iterable[Tuple[str, float]]) -> None:
+        since = self._watermark
+        for entry, added_at in rows:
+            self.bloom.add(entry)
+            if added_at > since:
+                # Rows in the overlap were counted the first time round
+                self._entries += 1
+                self._watermark = max(self._watermark, added_at)
+
+    def _version(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh(self) -> None:
+        """Add the entries other processes committed since the filter was built.
+
+        data_version only changes on other connections' commits, so this is
+        one cheap pragma when nothing new was written.
+        """
+        with self._lock:
+            version = self._version()
+            if version == self._data_version:
+                return
+            self._data_version = version
+            self._add_rows(self.conn.execute(
+                "SELECT entry, added_at FROM suppressions WHERE added_at >= ?",
+                (self._watermark - REFRESH_OVERLAP,)))
+            if self._entries > self.capacity:
+                # Grown past its sizing; rebuild so false positives stay rare
+                self._load()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM suppressions").fetchone()[0]
+
+    def _reason(self, entry: str, include_recent: bool) -> Optional[str]:
+        if entry not in self.bloom:
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT reason FROM suppressions WHERE entry = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (entry, time.time())).fetchone()
+        if row is None or (row[0] == CONTACTED and not include_recent):
+            return None
+        return row[0]
+
+    def check(self, email: str, include_recent: bool = True) -> Optional[str]:
+        """Suppression reason for an address (or its domain), or None if it may be emailed.
+
+        include_recent=False ignores the contact cooldown, for follow-ups to
+        prospects that were contacted on purpose.
+        """
+        self._refresh()
+        email = normalize_entry(email)
+        return self._reason(email, include_recent) or self._reason('@' + email.rpartition('@')[2], include_recent)
+
+    def is_suppressed(self, email: str, include_recent: bool = True) -> bool:
+        return self.check(email, include_recent) is not None
+
+    def suppress_many(self, entries: Iterable[Tuple[str, str, Optional[float]]]) -> int:
+        """Add (entry, reason, expires_at) rows in one transaction; returns the number written.
+
+        A permanent suppression is never downgraded to an expiring one, and a
+        contact record never replaces another reason (an expiring unsubscribe
+        must not turn into a cooldown that follow-ups ignore).
+        """
+        now = time.time()
+        rows = [(normalize_entry(entry), reason, now, expires_at) for entry, reason, expires_at in entries]
+        with self._lock, self.conn:
+            inserted = self.conn.executemany(
+                "INSERT OR IGNORE INTO suppressions (entry, reason, added_at, expires_at) VALUES (?, ?, ?, ?)",
+                rows).rowcount
+            updated = self.conn.executemany(
+                "UPDATE suppressions SET reason = ?2, added_at = ?3, expires_at = ?4 "
+                "WHERE entry = ?1 AND expires_at IS NOT NULL AND (?4 IS NULL OR expires_at < ?4) "
+                f"AND (?2 != '{CONTACTED}' OR reason = '{CONTACTED}')",
+                rows).rowcount
+        for entry, _, _, _ in rows:
+            self.bloom.add(entry)
+        self._entries += len(rows)
+        return inserted + updated
+
+    def suppress(self, entry: str, reason: str = MANUAL, expires_at: Optional[float] = None) -> None:
+        self.suppress_many([(entry, reason, expires_at)])
+
+    def record_contact(self, emails: Iterable[str], days: float = CONTACT_COOLDOWN_DAYS) -> None:
+        """Hold addresses back from new outreach for the contact cooldown."""
+        expires_at = time.time() + days * 24 * 60 * 60
+        self.suppress_many((email, CONTACTED, expires_at) for email in emails)
+
+    def remove(self, entry: str) -> bool:
+        """Lift a suppression. The Bloom filter keeps the key until the next load,
+        which only costs an extra exact lookup."""
+        with self._lock, self.conn:
+            return bool(self.conn.execute(
+                "DELETE FROM suppressions WHERE entry = ?", (normalize_entry(entry),)).rowcount)
+
+    def import_csv(self, path: str) -> int:
+        """Bulk-load an entry,reason[,expires_at] CSV (header optional)."""
+        def rows():
+            with open(path, 'r', newline='') as f:
+                for row in csv.reader(f):
+                    if not row or row[0].strip().lower() in ('', 'entry', 'email'):
+                        continue
+                    reason = row[1].strip() if len(row) > 1 and row[1].strip() else MANUAL
+                    expires_at = float(row[2]) if len(row) > 2 and row[2].strip() else None
+                    yield row[0], reason, expires_at
+        return self.suppress_many(rows())
+
+    def export_csv(self, path: str) -> int:
+        """Write every active entry to a CSV; returns the number of rows."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT entry, reason, expires_at FROM suppressions WHERE expires_at IS NULL OR expires_at > ? "
+                "ORDER BY entry", (time.time(),)).fetchall()
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['entry', 'reason', 'expires_at'])
+            writer.writerows(rows)
+        return len(rows)
+
+
+_lists = {}
+_lists_lock = threading.Lock()
+
+
+def get_suppression_list(path: str = SUPPRESSION_DB) -> SuppressionList:
+    """The shared suppression list for path, loaded on first use."""
+    with _lists_lock:
+        if path not in _lists:
+            _lists[path] = SuppressionList(path)
+        return _lists[path]
+
+
+def forget_suppression_lists() -> None:
+    """Drop the shared lists without closing them.
+
+    For forked worker processes: the SQLite connections they inherit belong
+    to the parent and must not be used from the child, so the child opens its
+    own on first use. The lock is replaced too, in case the fork caught
+    another thread holding it.
+    """
+    global _lists, _lists_lock
+    _lists = {}
+    _lists_lock = threading.Lock()
+
+
+def main():
+    """Manage the suppression list from the command line."""
+    usage = ("Usage: python suppression.py add EMAIL|DOMAIN [--reason R] [--days N] | remove ENTRY | "
+             "check EMAIL | import FILE.csv | export FILE.csv | count")
+    if len(sys.argv) < 2 or (sys.argv[1] != 'count' and len(sys.argv) < 3):
+        print(usage)
+        return
+
+    suppression = get_suppression_list()
+    command = sys.argv[1]
+    if command == 'add':
+        reason = sys.argv[sys.argv.index('--reason') + 1] if '--reason' in sys.argv else MANUAL
+        expires_at = None
+        if '--days' in sys.argv:
+            expires_at = time.time() + float(sys.argv[sys.argv.index('--days') + 1]) * 24 * 60 * 60
+        suppression.suppress(sys.argv[2], reason, expires_at)
+        print(f"Suppressed {normalize_entry(sys.argv[2])} ({reason})")
+    elif command == 'remove':
+        print("Removed" if suppression.remove(sys.argv[2]) else "Not on the suppression list")
+    elif command == 'check':
+        reason = suppression.check(sys.argv[2])
+        print(f"Suppressed ({reason})" if reason else "OK to email")
+    elif command == 'import':
+        print(f"Imported {suppression.import_csv(sys.argv[2])} entries")
+    elif command == 'export':
+        print(f"Exported {suppression.export_csv(sys.argv[2])} entries to {sys.argv[2]}")
+    elif command == 'count':
+        print(f"{len(suppression)} suppressed entries")
+    else:
+        print(usage)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Business type registry tests: category resolution and initial email templates
+"""
+
+import dataclasses
+
+import pytest
+
+from business_types import BUSINESS_TYPES, resolve_business_type
+from email_templates import DEFAULT_EMAIL_TEMPLATE, EMAIL_TEMPLATES, customize_template
+
+
+@pytest.mark.parametrize("category, expected", [
+    ("modest_coffee_roasters", "coffee_roaster"),
+    ("family_bakery", "bakery"),
+    ("artisan_bakeries", "bakery"),
+    ("local_breweries", "brewery"),
+    ("Tea Room", "tea_shop"),
+    ("tea_houses", "tea_shop"),
+    # Keywords only match whole words, give or take an ending
+    ("steak_house", None),
+    ("team_building", None),
+    ("pottery_studios", None),
+])
+def test_resolve_business_type(category, expected):
+    assert resolve_business_type(category) == expected
+
+
+def test_every_registered_type_has_an_initial_email():
+    for key in BUSINESS_TYPES:
+        email = customize_template(key, "Acme", "Sam", "sam@example.com", "555-0100")
+        assert email["body"].startswith("Hi Acme")
+    with pytest.raises(ValueError):
+        customize_template("unregistered", "Acme", "Sam", "sam@example.com", "555-0100")
+
+
+def test_new_vertical_uses_the_default_template(monkeypatch):
+    pottery = dataclasses.replace(BUSINESS_TYPES["florist"], key="pottery_studio", label="pottery studio",
+                                  categories=("pottery_studios",), keywords=("pottery",), hourly_rate=55)
+    monkeypatch.setitem(BUSINESS_TYPES, "pottery_studio", pottery)
+    assert "pottery_studio" not in EMAIL_TEMPLATES
+
+    email = customize_template("pottery_studio", "Clay Co", "Sam", "sam@example.com", "555-0100")
+    assert email["subject"] == DEFAULT_EMAIL_TEMPLATE["subject"]
+    assert "how a pottery studio works" in email["body"]
+    assert "$55 per hour" in email["body"]
+    assert "{" not in email["body"]
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Campaign sharding tests: ordering, failures, and worker process state
+"""
+
+import os
+
+import pytest
+
+import suppression
+from campaign_sharding import ShardError, enumerate_prospects, run_sharded
+
+
+def prospects(count):
+    return {"bakery": [{"name": f"Bakery {i}", "email": f"owner{i}@example.com"} for i in range(count)]}
+
+
+def echo_shard(items):
+    return [(position, business['email']) for position, _, business in items]
+
+
+def failing_shard(items):
+    if any(business['email'] == "owner0@example.com" for _, _, business in items):
+        raise RuntimeError("boom")
+    return echo_shard(items)
+
+
+def suppression_shard(items, path):
+    inherited = path in suppression._lists
+    suppression.get_suppression_list(path).record_contact([business['email'] for _, _, business in items])
+    return [(position, (inherited, os.getpid())) for position, _, _ in items]
+
+
+def test_results_come_back_in_prospect_order():
+    items = enumerate_prospects(prospects(40))
+    assert run_sharded(echo_shard, items, 4) == [f"owner{i}@example.com" for i in range(40)]
+
+
+def test_failed_shard_keeps_the_other_shards_results():
+    items = enumerate_prospects(prospects(40))
+    with pytest.raises(ShardError) as raised:
+        run_sharded(failing_shard, items, 4)
+    assert len(raised.value.failures) == 1
+    assert 0 < len(raised.value.results) < 40
+    assert "owner0@example.com" not in raised.value.results
+
+
+def test_workers_open_their_own_suppression_list(tmp_path):
+    path = str(tmp_path / "suppression.db")
+    parent = suppression.get_suppression_list(path)
+    try:
+        results = run_sharded(suppression_shard, enumerate_prospects(prospects(20)), 2, path)
+        assert not any(inherited for inherited, _ in results)
+        assert os.getpid() not in {pid for _, pid in results}
+        # The parent's connection still works and sees what the workers wrote
+        assert parent.is_suppressed("owner7@example.com")
+    finally:
+        with suppression._lists_lock:
+            suppression._lists.pop(path).conn.close()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Campaign store round-trip tests
+"""
+
+import pytest
+
+from campaign_store import CampaignStore
+from config import get_config
+from email_templates import campaign_email_template, html_email_body
+from intelligence_records import PersonalizedCopy
+
+
+def make_campaign(name, email, tracked=True):
+    config = get_config()
+    template = campaign_email_template(config.sender_name, config.sender_email, config.sender_phone)
+    landing_url = f"https://example.com/{name.lower()}-preview"
+    email_link = f"https://track.example.com/c?u={name}" if tracked else f"{landing_url}?c=bakery"
+    copy = PersonalizedCopy("Subject", "Opening", "Hook", "Proof",
+                            {"subject": "bakery:subject:question", "opening": "bakery:opening:mentions"})
+    body = template.format(business_name=name, personalized_opening=copy.personalized_opening,
+                           revenue_hook=copy.revenue_hook, landing_url=email_link, monthly_revenue=1200)
+    pixel = f"https://track.example.com/o.gif?e={email}" if tracked else None
+    return {
+        "business_name": name,
+        "email": email,
+        "intelligence": {"business_type": "bakery", "revenue_projections": {"monthly_revenue": 1200}},
+        "personalized_copy": copy,
+        "landing_url": landing_url,
+        "email_link": email_link,
+        "draft_id": f"draft-{name}",
+        "account": "sender@example.com",
+        "email_body": body,
+        "pixel_url": pixel,
+        "html_body": html_email_body(body, pixel) if pixel else None
+    }
+
+
+def test_round_trip_keeps_account_variants_and_html(tmp_path):
+    campaigns = [make_campaign("Alpha", "alpha@example.com"),
+                 make_campaign("Beta", "beta@example.com", tracked=False)]
+    store = CampaignStore(str(tmp_path / "campaigns.db"))
+    try:
+        store.save_campaigns(campaigns)
+        records = store.load_campaigns()
+        template_count = store.conn.execute("SELECT COUNT(*) FROM templates").fetchone()[0]
+    finally:
+        store.close()
+
+    assert template_count == 1
+    for campaign, record in zip(campaigns, records):
+        assert record.account == campaign["account"]
+        assert record.variants == campaign["personalized_copy"].variants
+        assert record.email_body == campaign["email_body"]
+        assert record.html_body == campaign["html_body"]
+
+        exported = record.to_dict()
+        assert exported["account"] == campaign["account"]
+        assert exported["personalized_copy"]["variants"] == campaign["personalized_copy"].variants
+        assert exported.get("html_body") == campaign["html_body"]
+
+
+def test_rolled_back_save_does_not_leave_template_ids_behind(tmp_path):
+    def campaigns_then_failure():
+        yield make_campaign("Alpha", "alpha@example.com")
+        raise RuntimeError("prospect file went away")
+
+    store = CampaignStore(str(tmp_path / "campaigns.db"))
+    try:
+        with pytest.raises(RuntimeError):
+            store.save_campaigns(campaigns_then_failure())
+        assert store.conn.execute("SELECT COUNT(*) FROM templates").fetchone()[0] == 0
+
+        store.save_campaigns([make_campaign("Beta", "beta@example.com")])
+        records = store.load_campaigns()
+    finally:
+        store.close()
+
+    assert [record.business_name for record in records] == ["Beta"]
+    assert records[0].email_body == make_campaign("Beta", "beta@example.com")["email_body"]
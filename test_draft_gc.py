@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Draft garbage collection tests
+"""
+
+import os
+
+from draft_gc import DUPLICATE, ORPHAN, UNRECOGNIZED, find_garbage, historical_draft_ids
+from run_snapshots import write_snapshot
+
+
+def test_truncated_snapshot_does_not_abort_history(tmp_path):
+    directory = str(tmp_path / "snapshots")
+    write_snapshot([{"id": "a@example.com", "draft_id": "d-1"}], directory=directory)
+    damaged = write_snapshot([{"id": f"p{i:04d}@example.com", "draft_id": f"d-x{i}"} for i in range(2000)],
+                             directory=directory)
+    with open(damaged, 'r+b') as f:
+        f.truncate(os.path.getsize(damaged) // 2)
+
+    draft_ids = historical_draft_ids(None, None, directory)
+    assert "d-1" in draft_ids
+
+
+def test_find_garbage_classifies_unreferenced_drafts():
+    mailbox = {
+        "kept": {"to": ["a@example.com"], "subject": "Hello", "campaign": "bakery"},
+        "copy": {"to": ["a@example.com"], "subject": "Hello", "campaign": "bakery"},
+        "old": {"to": ["b@example.com"], "subject": "Other", "campaign": "bakery"},
+        "mine": {"to": ["b@example.com"], "subject": "Personal note"},
+        "stranger": {"to": ["c@elsewhere.com"], "subject": "Hello", "campaign": "bakery"},
+    }
+    garbage = {draft_id: reason for draft_id, reason, _ in
+               find_garbage(mailbox, {"kept"}, {"a@example.com", "b@example.com"})}
+    assert garbage == {"copy": DUPLICATE, "old": ORPHAN, "mine": UNRECOGNIZED}
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Email validation tests against a local fake DNS server (stdlib UDP only)
+"""
+
+import socket
+import struct
+import threading
+
+import pytest
+
+from email_validation import (FAILURE_TTL, DnsError, DnsResolver, EmailValidator, MxCache, _TYPE_A, _TYPE_AAAA,
+                              _TYPE_MX, _encode_name)
+
+_RCODE_NXDOMAIN = 3
+
+
+def mx_rdata(preference, exchange, compress_to=None):
+    """MX rdata; with compress_to, the exchange is a label followed by a pointer to that offset."""
+    if compress_to is not None:
+        label = exchange.encode('ascii')
+        return struct.pack('>H', preference) + bytes([len(label)]) + label + struct.pack('>H', 0xC000 | compress_to)
+    return struct.pack('>H', preference) + (_encode_name(exchange) if exchange else b'\x00')
+
+
+class FakeDnsServer:
+    """Answers queries from a zone: {(name, qtype): (rcode, [(rtype, ttl, rdata)])}.
+
+    Names not in the zone get an empty NOERROR answer; names in silent get
+    no reply at all (a timeout).
+    """
+
+    def __init__(self, zone, silent=()):
+        self.zone = zone
+        self.silent = set(silent)
+        self.queries = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.sock.close()
+
+    def _serve(self):
+        while True:
+            try:
+                packet, address = self.sock.recvfrom(512)
+            except OSError:
+                return
+            query_id = packet[:2]
+            question_end = packet.index(b'\x00', 12) + 5
+            question = packet[12:question_end]
+            labels, offset = [], 12
+            while packet[offset]:
+                labels.append(packet[offset + 1:offset + 1 + packet[offset]].decode('ascii'))
+                offset += 1 + packet[offset]
+            name = '.'.join(labels)
+            qtype = struct.unpack('>H', packet[offset + 1:offset + 3])[0]
+            self.queries.append((name, qtype))
+            if name in self.silent:
+                continue
+            rcode, answers = self.zone.get((name, qtype), (0, []))
+            reply = query_id + struct.pack('>HHHHH', 0x8180 | rcode, 1, len(answers), 0, 0) + question
+            for rtype, ttl, rdata in answers:
+                # Owner name as a pointer to the question name at offset 12
+                reply += struct.pack('>HHHIH', 0xC00C, rtype, 1, ttl, len(rdata)) + rdata
+            self.sock.sendto(reply, address)
+
+
+@pytest.fixture
+def dns():
+    zone = {
+        ("mx.test", _TYPE_MX): (0, [(_TYPE_MX, 600, mx_rdata(20, "backup.mx.test")),
+                                    (_TYPE_MX, 300, mx_rdata(10, "mail", compress_to=12))]),
+        ("nullmx.test", _TYPE_MX): (0, [(_TYPE_MX, 600, mx_rdata(0, ""))]),
+        ("nullmx.test", _TYPE_A): (0, [(_TYPE_A, 600, socket.inet_aton("192.0.2.1"))]),
+        ("aonly.test", _TYPE_A): (0, [(_TYPE_A, 120, socket.inet_aton("192.0.2.2"))]),
+        ("v6only.test", _TYPE_AAAA): (0, [(_TYPE_AAAA, 90, socket.inet_pton(socket.AF_INET6, "2001:db8::1"))]),
+        ("gone.test", _TYPE_MX): (_RCODE_NXDOMAIN, []),
+    }
+    server = FakeDnsServer(zone, silent={"dead.test"})
+    yield server
+    server.close()
+
+
+def resolver(server):
+    return DnsResolver('127.0.0.1', server.port, timeout=0.2, retries=0)
+
+
+def test_mx_hosts_sorted_by_preference_with_compressed_names(dns):
+    answer = resolver(dns).lookup_mx("mx.test")
+    assert answer.exists
+    assert answer.hosts == ["mail.mx.test", "backup.mx.test"]
+    assert answer.ttl == 300
+
+
+def test_null_mx_accepts_no_mail_and_skips_the_a_record(dns):
+    answer = resolver(dns).lookup_mx("nullmx.test")
+    assert answer.exists and answer.hosts == []
+    assert ("nullmx.test", _TYPE_A) not in dns.queries
+    result = EmailValidator(resolver(dns), MxCache()).validate("owner@nullmx.test")
+    assert not result.valid and result.reason == "no mail server"
+
+
+def test_implicit_mx_from_a_record(dns):
+    answer = resolver(dns).lookup_mx("aonly.test")
+    assert answer.hosts == ["aonly.test"] and answer.ttl == 120
+
+
+def test_implicit_mx_from_aaaa_record(dns):
+    answer = resolver(dns).lookup_mx("v6only.test")
+    assert answer.hosts == ["v6only.test"] and answer.ttl == 90
+    assert EmailValidator(resolver(dns), MxCache()).validate("owner@v6only.test").valid
+
+
+def test_nxdomain(dns):
+    result = EmailValidator(resolver(dns), MxCache()).validate("owner@gone.test")
+    assert not result.valid and result.reason == "domain does not exist"
+
+
+def test_timeout_raises_dns_error(dns):
+    with pytest.raises(DnsError):
+        resolver(dns).lookup_mx("dead.test")
+
+
+def test_failed_lookups_are_remembered_for_failure_ttl(dns):
+    now = [1000.0]
+    validator = EmailValidator(resolver(dns), MxCache(clock=lambda: now[0]))
+
+    results = validator.validate_many([f"user{i}@dead.test" for i in range(5)])
+    # DNS trouble never rejects an address, and the dead domain is asked once
+    assert all(result.valid for result in results.values())
+    assert dns.queries.count(("dead.test", _TYPE_MX)) == 1
+
+    now[0] += FAILURE_TTL - 1
+    validator.validate("again@dead.test")
+    assert dns.queries.count(("dead.test", _TYPE_MX)) == 1
+
+    now[0] += 2
+    validator.validate("later@dead.test")
+    assert dns.queries.count(("dead.test", _TYPE_MX)) == 2
+
+
+def test_answers_are_cached_for_their_ttl(dns):
+    now = [1000.0]
+    validator = EmailValidator(resolver(dns), MxCache(clock=lambda: now[0]))
+    validator.validate_many(["a@mx.test", "b@mx.test"])
+    validator.validate("c@mx.test")
+    assert dns.queries.count(("mx.test", _TYPE_MX)) == 1
+    now[0] += 301
+    validator.validate("d@mx.test")
+    assert dns.queries.count(("mx.test", _TYPE_MX)) == 2
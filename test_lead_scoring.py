@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Lead scoring tests: the priority queue and incremental rescoring
+"""
+
+import pytest
+
+from lead_scoring import LeadQueue, LeadScorer
+
+
+def test_queue_pops_best_first_and_skips_stale_entries():
+    queue = LeadQueue()
+    queue.push("a", 10, "a1")
+    queue.push("b", 30, "b1")
+    queue.push("c", 20, "c1")
+    queue.push("a", 40, "a2")
+    queue.remove("c")
+
+    assert len(queue) == 2
+    assert list(queue.drain()) == [("a", 40, "a2"), ("b", 30, "b1")]
+    with pytest.raises(KeyError):
+        queue.pop()
+
+
+def test_ties_go_to_the_lead_queued_first():
+    queue = LeadQueue()
+    for key in ("x", "y", "z"):
+        queue.push(key, 50, key)
+    assert [key for key, _, _ in queue.drain()] == ["x", "y", "z"]
+
+
+def test_rescore_only_recomputes_changed_leads(tmp_path):
+    path = str(tmp_path / "lead_scores.json")
+    scorer = LeadScorer(path)
+    scorer.rescore([("a", {"monthly_revenue": 1000}, None), ("b", {"monthly_revenue": 5000}, None)])
+    scorer.save()
+
+    scorer = LeadScorer(path)
+    queue = scorer.rescore([("a", {"monthly_revenue": 1000}, None), ("b", {"monthly_revenue": 9000}, None)])
+    assert scorer.rescored == 1
+    assert len(queue) == 2
+
+
+def test_rescore_refreshes_the_item_of_an_unchanged_lead(tmp_path):
+    scorer = LeadScorer(str(tmp_path / "lead_scores.json"))
+    features = {"monthly_revenue": 2000, "notes": "open kitchen"}
+    queue = scorer.rescore([("lead", features, {"draft_id": "old-draft"})])
+    scorer.rescore([("lead", dict(features), {"draft_id": "new-draft"})], queue)
+
+    assert scorer.rescored == 1
+    assert len(queue) == 1
+    key, _, item = queue.pop()
+    assert key == "lead" and item == {"draft_id": "new-draft"}
+    assert len(queue) == 0
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+SMTP transport tests against a local SMTP stub (stdlib sockets only)
+"""
+
+import base64
+import socket
+import threading
+from email.mime.text import MIMEText
+
+import pytest
+
+from gmail_sender import GmailSender
+from mail_transport import MailTransportError, MemoryTransport, SmtpTransport, xoauth2_string
+from suppression import SuppressionList
+
+TOKEN = "ya29.test-token"
+USER = "me@example.com"
+
+
+class SmtpStub:
+    """Minimal threaded SMTP server.
+
+    pipelining/xoauth2 choose the EHLO extensions. reject_mail and
+    reject_rcpt make MAIL FROM / RCPT TO fail; drop_after is a list of
+    commands ('MAIL' before or 'MAIL-ACCEPTED' after replying to MAIL),
+    one per transaction, at which the server closes the connection.
+    """
+
+    def __init__(self, pipelining=True, xoauth2=False, reject_mail=False, reject_rcpt=()):
+        self.pipelining = pipelining
+        self.xoauth2 = xoauth2
+        self.reject_mail = reject_mail
+        self.reject_rcpt = set(reject_rcpt)
+        self.drop_after = []
+        self.connections = 0
+        self.mail_commands = 0
+        self.delivered = []
+        # For each MAIL: whether the rest of the envelope (through DATA) was already sent
+        self.pipelined = []
+        self.auth_strings = []
+        self.sockets = []
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def close(self):
+        self.listener.close()
+        for sock in self.sockets:
+            sock.close()
+
+    def drop_idle_connections(self):
+        for sock in self.sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                return
+            self.connections += 1
+            self.sockets.append(sock)
+            threading.Thread(target=self._session, args=(sock,), daemon=True).start()
+
+    def _session(self, sock):
+        buffer = b''
+
+        def reply(line):
+            sock.sendall(line.encode('ascii') + b'\r\n')
+
+        def read_line(timeout=None):
+            nonlocal buffer
+            sock.settimeout(timeout)
+            while b'\r\n' not in buffer:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    raise ConnectionError
+                buffer += chunk
+            line, buffer = buffer.split(b'\r\n', 1)
+            return line.decode('ascii')
+
+        def envelope_buffered():
+            """Wait briefly for the rest of a pipelined envelope; True if DATA arrived with MAIL."""
+            nonlocal buffer
+            sock.settimeout(0.3)
+            try:
+                while b'DATA\r\n' not in buffer:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    buffer += chunk
+            except socket.timeout:
+                pass
+            return b'DATA\r\n' in buffer
+
+        try:
+            reply("220 stub ESMTP")
+            mail_ok, recipients = False, []
+            while True:
+                line = read_line()
+                command = line[:4].upper()
+                if command in ('EHLO', 'HELO'):
+                    extensions = ["250-stub"]
+                    if self.pipelining:
+                        extensions.append("250-PIPELINING")
+                    if self.xoauth2:
+                        extensions.append("250-AUTH XOAUTH2")
+                    extensions.append("250 8BITMIME")
+                    reply('\r\n'.join(extensions))
+                elif command == 'AUTH':
+                    auth_string = base64.b64decode(line.split()[2]).decode()
+                    self.auth_strings.append(auth_string)
+                    if auth_string == xoauth2_string(USER, TOKEN):
+                        reply("235 2.7.0 Accepted")
+                    else:
+                        reply("334 " + base64.b64encode(b'{"status":"401"}').decode())
+                        read_line()
+                        reply("535 5.7.8 Username and Password not accepted")
+                elif command == 'MAIL':
+                    self.mail_commands += 1
+                    if self.pipelining:
+                        self.pipelined.append(envelope_buffered())
+                    drop = self.drop_after.pop(0) if self.drop_after else None
+                    if drop == 'MAIL':
+                        sock.close()
+                        return
+                    if self.reject_mail:
+                        reply("550 5.7.1 Sender rejected")
+                        continue
+                    mail_ok, recipients = True, []
+                    reply("250 OK")
+                    if drop == 'MAIL-ACCEPTED':
+                        sock.close()
+                        return
+                elif command == 'RCPT':
+                    address = line.split(':', 1)[1].strip().strip('<>')
+                    if address in self.reject_rcpt or not mail_ok:
+                        reply("550 5.1.1 No such user")
+                    else:
+                        recipients.append(address)
+                        reply("250 OK")
+                elif command == 'DATA':
+                    if not mail_ok or not recipients:
+                        reply("503 5.5.1 No valid recipients")
+                        continue
+                    reply("354 Go ahead")
+                    lines = []
+                    while True:
+                        data_line = read_line()
+                        if data_line == '.':
+                            break
+                        lines.append(data_line[1:] if data_line.startswith('..') else data_line)
+                    self.delivered.append((list(recipients), '\r\n'.join(lines)))
+                    mail_ok, recipients = False, []
+                    reply("250 OK queued")
+                elif command == 'RSET':
+                    mail_ok, recipients = False, []
+                    reply("250 OK")
+                elif command == 'QUIT':
+                    reply("221 Bye")
+                    sock.close()
+                    return
+                else:
+                    reply("502 Command not implemented")
+        except (ConnectionError, OSError):
+            sock.close()
+
+
+@pytest.fixture
+def stub_factory():
+    stubs = []
+
+    def make(**options):
+        stub = SmtpStub(**options)
+        stubs.append(stub)
+        return stub
+
+    yield make
+    for stub in stubs:
+        stub.close()
+
+
+def message(to, body="Hello\n.leading dot"):
+    msg = MIMEText(body)
+    msg['From'] = USER
+    msg['To'] = ', '.join(to)
+    msg['Subject'] = "Test"
+    return msg
+
+
+def transport_for(stub, **options):
+    return SmtpTransport('127.0.0.1', stub.port, from_address=USER, pool_size=1, timeout=5, **options)
+
+
+def test_envelope_is_pipelined_and_connection_reused(stub_factory):
+    stub = stub_factory()
+    transport = transport_for(stub)
+    try:
+        transport.send(message(["a@example.com", "b@example.com"]))
+        transport.send(message(["c@example.com"]))
+    finally:
+        transport.close()
+    assert stub.pipelined == [True, True]
+    assert stub.connections == 1
+    assert [recipients for recipients, _ in stub.delivered] == [["a@example.com", "b@example.com"], ["c@example.com"]]
+    # Dot-stuffing survives the round trip
+    assert "\r\n.leading dot" in stub.delivered[0][1]
+
+
+def test_pipelined_replies_report_refused_recipients(stub_factory):
+    stub = stub_factory(reject_rcpt={"gone@example.com"})
+    transport = transport_for(stub)
+    try:
+        result = transport.send(message(["a@example.com", "gone@example.com"]))
+        with pytest.raises(MailTransportError, match="gone@example.com"):
+            transport.send(message(["gone@example.com"]))
+        # The session was reset and is still usable
+        transport.send(message(["b@example.com"]))
+    finally:
+        transport.close()
+    assert result['refused'] == ["gone@example.com"]
+    assert [recipients for recipients, _ in stub.delivered] == [["a@example.com"], ["b@example.com"]]
+    assert stub.connections == 1
+
+
+def test_without_pipelining_falls_back_to_lockstep(stub_factory):
+    stub = stub_factory(pipelining=False)
+    transport = transport_for(stub)
+    try:
+        transport.send(message(["a@example.com"]))
+    finally:
+        transport.close()
+    assert len(stub.delivered) == 1
+
+
+def test_xoauth2_handshake_uses_fresh_token_per_connection(stub_factory):
+    stub = stub_factory(xoauth2=True)
+    tokens = []
+
+    def token():
+        tokens.append(TOKEN)
+        return TOKEN
+
+    transport = SmtpTransport('127.0.0.1', stub.port, username=USER, pool_size=1, timeout=5, oauth2_token=token)
+    try:
+        transport.send(message(["a@example.com"]))
+        transport.send(message(["b@example.com"]))
+    finally:
+        transport.close()
+    assert stub.auth_strings == [f"user={USER}\x01auth=Bearer {TOKEN}\x01\x01"]
+    assert len(tokens) == 1
+    assert len(stub.delivered) == 2
+
+
+def test_xoauth2_rejection_answers_the_error_challenge(stub_factory):
+    stub = stub_factory(xoauth2=True)
+    transport = SmtpTransport('127.0.0.1', stub.port, username=USER, pool_size=1, timeout=5,
+                              oauth2_token=lambda: "expired")
+    try:
+        with pytest.raises(MailTransportError, match="535"):
+            transport.send(message(["a@example.com"]))
+    finally:
+        transport.close()
+    assert stub.delivered == []
+
+
+def test_idle_disconnect_before_mail_is_retried(stub_factory):
+    stub = stub_factory()
+    transport = transport_for(stub)
+    try:
+        transport.send(message(["a@example.com"]))
+        stub.drop_idle_connections()
+        transport.send(message(["b@example.com"]))
+    finally:
+        transport.close()
+    assert stub.connections == 2
+    assert [recipients for recipients, _ in stub.delivered] == [["a@example.com"], ["b@example.com"]]
+
+
+def test_disconnect_before_mail_accepted_is_retried(stub_factory):
+    stub = stub_factory()
+    stub.drop_after = ['MAIL']
+    transport = transport_for(stub)
+    try:
+        transport.send(message(["a@example.com"]))
+    finally:
+        transport.close()
+    assert stub.mail_commands == 2
+    assert len(stub.delivered) == 1
+
+
+def test_disconnect_after_mail_accepted_is_not_retried(stub_factory):
+    stub = stub_factory()
+    stub.drop_after = ['MAIL-ACCEPTED']
+    transport = transport_for(stub)
+    try:
+        with pytest.raises(MailTransportError):
+            transport.send(message(["a@example.com"]))
+    finally:
+        transport.close()
+    # Possibly delivered already: a second attempt could duplicate it
+    assert stub.mail_commands == 1
+    assert stub.connections == 1
+
+
+def test_refused_sender_is_not_retried(stub_factory):
+    stub = stub_factory(reject_mail=True)
+    transport = transport_for(stub)
+    try:
+        with pytest.raises(MailTransportError, match="Sender rejected"):
+            transport.send(message(["a@example.com"]))
+    finally:
+        transport.close()
+    assert stub.mail_commands == 1
+    assert stub.delivered == []
+
+
+def test_bulk_sends_over_smtp_carry_the_account_from_header(stub_factory, tmp_path):
+    stub = stub_factory()
+    sender = GmailSender(transport=MemoryTransport(), suppression=SuppressionList(str(tmp_path / "suppression.db")))
+    sender.bulk_transport = transport_for(stub)
+    try:
+        results = sender.send_bulk_emails([{"to_emails": ["a@example.com"], "subject": "Hi", "body": "Hello"}])
+    finally:
+        sender.bulk_transport.close()
+    assert results[0]['success']
+    assert f"from: {USER}" in stub.delivered[0][1].split("\r\n\r\n")[0].lower()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Run snapshot tests: writing, diffing, and damaged snapshot files
+"""
+
+import os
+
+import pytest
+
+from run_snapshots import ADDED, CHANGED, REMOVED, diff_snapshots, iter_snapshot, main, write_snapshot
+
+
+def record(email, **fields):
+    return dict({"id": email, "business_name": email.split('@')[0], "monthly_revenue": 1000}, **fields)
+
+
+def truncate(path):
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        f.truncate(size // 2)
+
+
+@pytest.fixture
+def snapshots(tmp_path):
+    directory = str(tmp_path / "snapshots")
+    # Enough records that the gzip stream spans more than the first half of the file
+    old = [record(f"p{i:04d}@example.com") for i in range(2000)]
+    new = [record(f"p{i:04d}@example.com", monthly_revenue=1000 + (i % 3)) for i in range(1, 2001)]
+    return directory, write_snapshot(old, directory=directory), write_snapshot(new, directory=directory)
+
+
+def test_diff_reports_added_removed_and_changed(snapshots):
+    _, old_path, new_path = snapshots
+    kinds = {}
+    for change in diff_snapshots(old_path, new_path):
+        kinds[change.kind] = kinds.get(change.kind, 0) + 1
+    assert kinds == {REMOVED: 1, ADDED: 1, CHANGED: sum(1 for i in range(1, 2000) if i % 3)}
+
+
+def test_truncated_snapshot_raises_value_error(snapshots):
+    _, _, new_path = snapshots
+    truncate(new_path)
+    with pytest.raises(ValueError, match="truncated or corrupt"):
+        for _ in iter_snapshot(new_path):
+            pass
+
+
+def test_diff_of_truncated_snapshot_prints_no_changes(snapshots, capsys):
+    directory, _, new_path = snapshots
+    truncate(new_path)
+    assert main(['--dir', directory, 'diff']) == 1
+    out = capsys.readouterr().out
+    assert out.startswith("Cannot compare snapshots:")
+    assert "~ " not in out and "+ " not in out and "- " not in out
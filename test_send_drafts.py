@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Draft dispatcher tests: dry runs, stopping, and settling in-doubt sends
+"""
+
+import io
+import json
+import os
+
+import pytest
+
+import suppression
+from gmail_sender import GmailSender
+from mail_transport import MemoryTransport
+from send_drafts import CLAIMED, SENT, DraftDispatcher, SendJournal
+from sequence_engine import SequenceEngine
+from subject_experiments import SubjectExperiment
+from suppression import CONTACTED
+
+
+@pytest.fixture
+def sender(tmp_path, monkeypatch):
+    # The dispatcher uses the default journal, sequence, score and experiment files
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(suppression, '_lists', {})
+    sender = GmailSender(transport=MemoryTransport())
+    yield sender
+    sender.suppression.close()
+
+
+def make_drafts(sender, count):
+    drafts = []
+    for i in range(count):
+        email = f"owner{i}@shop.test"
+        result = sender.create_draft([email], f"Hello Shop {i}", "Body", campaign="bakery")
+        drafts.append({"draft_id": result['id'], "email": email, "business_name": f"Shop {i}",
+                       "template_used": "bakery", "subject": f"Hello Shop {i}", "monthly_revenue": 1000 + i})
+    return drafts
+
+
+def dispatcher_for(sender, journal=None):
+    out = io.StringIO()
+    dispatcher = DraftDispatcher(sender_factory=lambda: sender, workers=2,
+                                 journal=journal or SendJournal(), out=out)
+    return dispatcher, out
+
+
+def events(out):
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_dry_run_reports_would_send_and_writes_nothing(sender, tmp_path):
+    drafts = make_drafts(sender, 3)
+    before = set(os.listdir(tmp_path))
+    dispatcher, out = dispatcher_for(sender)
+    counts = dispatcher.run(drafts, quota=2, dry_run=True)
+    dispatcher.journal.close()
+
+    assert counts == {"sent": 0, "failed": 0, "skipped": 0, "would_send": 2}
+    assert [event["event"] for event in events(out)].count("would_send") == 2
+    assert set(os.listdir(tmp_path)) == before
+    assert sender.transport.sent == []
+
+
+def test_stop_is_reported_by_the_run_loop(sender):
+    drafts = make_drafts(sender, 3)
+    dispatcher, out = dispatcher_for(sender)
+    dispatcher.request_stop(15)
+    dispatcher.request_stop(15)
+    # The signal handler itself writes nothing
+    assert out.getvalue() == ""
+
+    counts = dispatcher.run(drafts)
+    dispatcher.journal.close()
+    assert counts["sent"] == 0
+    stopping = [event for event in events(out) if event["event"] == "stopping"]
+    assert len(stopping) == 1 and stopping[0]["signal"] == 15
+    assert events(out)[-1]["interrupted"]
+
+
+def test_sends_are_journaled_and_followed_up(sender):
+    drafts = make_drafts(sender, 2)
+    dispatcher, _ = dispatcher_for(sender)
+    assert dispatcher.run(drafts)["sent"] == 2
+    dispatcher.journal.close()
+
+    assert SendJournal().states == {draft["draft_id"]: SENT for draft in drafts}
+    assert sender.suppression.check("owner0@shop.test") == CONTACTED
+    engine = SequenceEngine()
+    try:
+        assert engine.status_counts() == {"active": 2}
+    finally:
+        engine.close()
+
+
+def test_vanished_claim_is_settled_as_sent_with_its_bookkeeping(sender):
+    drafts = make_drafts(sender, 2)
+    gone, kept = drafts
+    experiment = SubjectExperiment.load()
+    experiment.assign(gone["draft_id"], gone["email"], ["bakery:subject:question"])
+    experiment.save()
+
+    # A crash after the send went out but before it was journaled
+    journal = SendJournal()
+    journal.record(gone["draft_id"], CLAIMED, email=gone["email"])
+    journal.record(kept["draft_id"], CLAIMED, email=kept["email"])
+    journal.close()
+    sender.send_draft(gone["draft_id"])
+
+    dispatcher, out = dispatcher_for(sender)
+    counts = dispatcher.run(drafts)
+    dispatcher.journal.close()
+
+    reconciled = {event["draft_id"]: event["state"] for event in events(out) if event["event"] == "reconciled"}
+    assert reconciled == {gone["draft_id"]: SENT, kept["draft_id"]: "failed"}
+    # The settled draft is skipped; the one still in the mailbox is sent now
+    assert counts == {"sent": 1, "failed": 0, "skipped": 1}
+    assert sender.suppression.check(gone["email"]) == CONTACTED
+    engine = SequenceEngine()
+    try:
+        assert engine.status_counts() == {"active": 2}
+    finally:
+        engine.close()
+    arm = SubjectExperiment.load().arms["bakery:subject:question"]
+    assert arm.sends == 1
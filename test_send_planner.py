@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Send planner tests: the rolling quota window, per-account slots, and the
+executor on a fake clock
+"""
+
+import io
+import itertools
+import json
+import threading
+
+import pytest
+
+import suppression
+from gmail_sender import GmailSender
+from mail_transport import MailTransportError, MemoryTransport
+from send_drafts import FAILED, SENT, SendJournal
+from send_planner import DAILY_LIMIT_BACKOFF, QUOTA_WINDOW, Account, PlanExecutor, SendPlanner
+
+NOW = 1_700_000_000.0
+HOUR = 60 * 60
+
+
+def account(email, daily_quota=500, per_minute=20, reserve=0):
+    return Account(email, daily_quota, per_minute, reserve, "token.json", None)
+
+
+def queue(*drafts):
+    return [(draft["draft_id"], 1.0, draft) for draft in drafts]
+
+
+def draft(draft_id, account=None):
+    return {"draft_id": draft_id, "email": f"{draft_id}@shop.test", "account": account}
+
+
+def test_sends_are_paced_by_the_per_minute_rate():
+    planner = SendPlanner([account("a@example.com", per_minute=2)])
+    plan = planner.plan(queue(*(draft(f"d{i}") for i in range(3))), {}, NOW)
+    assert [send.at for send in plan.sends] == [NOW, NOW + 30, NOW + 60]
+    # Pacing continues from the last send already made
+    plan = planner.plan(queue(draft("d3")), {"a@example.com": [NOW - 10]}, NOW)
+    assert plan.sends[0].at == NOW + 20
+
+
+def test_full_window_waits_for_the_oldest_send_to_age_out():
+    # Capacity 2 after the reserve, both used within the last 24 hours
+    planner = SendPlanner([account("a@example.com", daily_quota=3, reserve=1)])
+    usage = {"a@example.com": [NOW - 23 * HOUR, NOW - HOUR]}
+    plan = planner.plan(queue(draft("d0"), draft("d1"), draft("d2")), usage, NOW)
+    assert [send.at for send in plan.sends] == [NOW + HOUR, NOW + 23 * HOUR, NOW + 25 * HOUR]
+
+    plan = planner.plan(queue(draft("d0"), draft("d1")), usage, NOW, horizon_days=0.5)
+    assert [send.draft_id for send in plan.sends] == ["d0"]
+    assert plan.unplanned == [("d1", "beyond the planning horizon")]
+
+
+def test_drafts_are_planned_on_their_own_account():
+    planner = SendPlanner([account("a@example.com", per_minute=1), account("b@example.com", per_minute=1),
+                           account("empty@example.com", daily_quota=10, reserve=10)], "b@example.com")
+    plan = planner.plan(queue(draft("a0", "A@example.com"), draft("b0"), draft("a1", "a@example.com"),
+                              draft("x0", "nobody@example.com"), draft("e0", "empty@example.com")), {}, NOW)
+
+    by_account = {email: [(send.draft_id, send.at) for send in sends] for email, sends in plan.by_account().items()}
+    # Accounts fill in parallel; the draft without an account goes to the default
+    assert by_account == {"a@example.com": [("a0", NOW), ("a1", NOW + 60)], "b@example.com": [("b0", NOW)]}
+    assert dict(plan.unplanned) == {"x0": "account nobody@example.com is not configured",
+                                    "e0": "no sending capacity"}
+
+
+def test_blocked_account_starts_after_its_backoff():
+    planner = SendPlanner([account("a@example.com"), account("b@example.com")])
+    plan = planner.plan(queue(draft("a0", "a@example.com"), draft("b0", "b@example.com")), {}, NOW,
+                        blocked_until={"a@example.com": NOW + HOUR})
+    assert {send.draft_id: send.at for send in plan.sends} == {"a0": NOW + HOUR, "b0": NOW}
+
+
+def test_usage_counts_journal_sends_inside_the_window(tmp_path):
+    journal = SendJournal(str(tmp_path / "journal.jsonl"))
+    journal.sends = [(NOW - QUOTA_WINDOW - 1, "a@example.com"), (NOW - HOUR, "A@example.com"), (NOW - 60, None)]
+    planner = SendPlanner([account("a@example.com"), account("b@example.com")], "b@example.com")
+    assert planner.usage(journal, NOW) == {"a@example.com": [NOW - HOUR], "b@example.com": [NOW - 60]}
+
+
+class FakeTransport(MemoryTransport):
+    """MemoryTransport whose next sends can be made to fail."""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = []
+
+    def send(self, message):
+        if self.failures:
+            raise self.failures.pop(0)
+        return super().send(message)
+
+
+class Clock:
+    def __init__(self, now=NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SleepingEvent(threading.Event):
+    """A stop flag whose timed waits advance the fake clock instead of blocking."""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def wait(self, timeout=None):
+        if not self.is_set() and timeout is not None:
+            self.clock.now += timeout
+        return self.is_set()
+
+
+@pytest.fixture
+def senders(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(suppression, '_lists', {})
+    senders = {}
+
+    def sender_for(account):
+        if account.email not in senders:
+            senders[account.email] = GmailSender(transport=FakeTransport())
+            senders[account.email]._account = account.email
+            # Draft IDs are unique across mailboxes, as Gmail's are
+            senders[account.email].transport._ids = itertools.count(100 * len(senders))
+        return senders[account.email]
+
+    yield sender_for
+    for sender in senders.values():
+        sender.suppression.close()
+
+
+def make_drafts(sender, account_email, count):
+    drafts = []
+    for i in range(count):
+        email = f"{account_email.split('@')[0]}{i}@shop.test"
+        draft_id = sender.create_draft([email], "Hello", "Body")['id']
+        drafts.append({"draft_id": draft_id, "email": email, "account": account_email, "business_name": f"Shop {i}",
+                       "template_used": "bakery", "subject": "Hello", "monthly_revenue": 1000})
+    return drafts
+
+
+def run_executor(senders, accounts, drafts, tmp_path, hours):
+    clock = Clock()
+    out = io.StringIO()
+    executor = PlanExecutor(SendPlanner(accounts), sender_factory=senders,
+                            journal=SendJournal(str(tmp_path / "journal.jsonl")), out=out, clock=clock)
+    executor.stop_requested = SleepingEvent(clock)
+    counts = executor.run(drafts, hours=hours)
+    executor.journal.close()
+    return counts, [json.loads(line) for line in out.getvalue().splitlines()], clock
+
+
+def test_executor_follows_the_planned_pace(senders, tmp_path):
+    accounts = [account("a@example.com", per_minute=1)]
+    drafts = make_drafts(senders(accounts[0]), "a@example.com", 3)
+    counts, events, clock = run_executor(senders, accounts, drafts, tmp_path, hours=1)
+
+    assert counts == {"sent": 3, "failed": 0, "skipped": 0}
+    assert [event["event"] for event in events].count("sent") == 3
+    # Three sends a minute apart fit in just over two minutes of fake time
+    assert 2 * 60 <= clock.now - NOW < 3 * 60
+
+
+def test_daily_cap_rests_the_account_and_keeps_the_draft(senders, tmp_path):
+    accounts = [account("a@example.com", per_minute=60), account("b@example.com", per_minute=60)]
+    capped = senders(accounts[0])
+    drafts = make_drafts(capped, "a@example.com", 3) + make_drafts(senders(accounts[1]), "b@example.com", 3)
+    capped.transport.failures = [MailTransportError("550 5.4.5 Daily user sending limit exceeded")]
+
+    counts, events, clock = run_executor(senders, accounts, drafts, tmp_path, hours=0.5)
+
+    deferred = [event for event in events if event["event"] == "deferred"]
+    assert len(deferred) == 1 and deferred[0]["account"] == "a@example.com"
+    assert deferred[0]["retry_after"] >= NOW + DAILY_LIMIT_BACKOFF
+    # The capped account sends nothing more before the run ends; the other one finishes
+    assert counts == {"sent": 3, "failed": 0, "skipped": 0}
+    assert len(capped.transport.sent) == 0
+    assert events[-1]["remaining"] == 3
+
+    states = SendJournal(str(tmp_path / "journal.jsonl")).states
+    assert [states[draft["draft_id"]] for draft in drafts[3:]] == [SENT] * 3
+    assert states[deferred[0]["draft_id"]] == FAILED
+    # Nothing was left claimed, so the next run has nothing in doubt
+    assert all(state in (SENT, FAILED) for state in states.values())
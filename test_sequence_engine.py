@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Sequence engine tests with an in-memory transport and a fake clock
+"""
+
+from email.mime.text import MIMEText
+
+import pytest
+
+import suppression
+from gmail_sender import GmailSender
+from mail_transport import MailTransportError, MemoryTransport
+from sequence_engine import (ACTIVE, BOUNCED, COMPLETED, DAILY_LIMIT_DELAY, DAY, FAILED, MAX_SEND_ATTEMPTS,
+                             RATE_LIMIT_DELAY, REPLIED, RETRY_DELAY, SequenceEngine)
+from subject_experiments import SubjectExperiment
+
+START = 1_700_000_000.0
+
+
+class FakeTransport(MemoryTransport):
+    """MemoryTransport whose next sends can be made to fail."""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = []
+
+    def send(self, message):
+        if self.failures:
+            raise self.failures.pop(0)
+        return super().send(message)
+
+
+class Clock:
+    def __init__(self, now=START):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    # credit_replies and record_bounce use the default experiment and suppression files
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(suppression, '_lists', {})
+    transport = FakeTransport()
+    sender = GmailSender(transport=transport)
+    clock = Clock()
+    engine = SequenceEngine(sender, path=str(tmp_path / "sequences.db"), clock=clock)
+    yield engine, transport, clock
+    engine.close()
+    sender.suppression.close()
+
+
+def inbound(sender, subject="Re: hello", in_reply_to=None, **headers):
+    message = MIMEText("Thanks!")
+    message['From'] = sender
+    message['Subject'] = subject
+    if in_reply_to:
+        message['In-Reply-To'] = in_reply_to
+    for name, value in headers.items():
+        message[name.replace('_', '-')] = value
+    return message
+
+
+def status(engine, email):
+    return engine.conn.execute("SELECT status, step, next_due FROM sequences WHERE email = ?", (email,)).fetchone()
+
+
+def test_touches_go_out_on_schedule_and_thread(setup):
+    engine, transport, clock = setup
+    engine.enroll("owner@bakery.test", "Bakery", "bakery")
+    assert engine.run_due() == 1
+    first_id = transport.sent[0]['Message-ID']
+
+    clock.now += 3 * DAY
+    assert engine.run_due() == 0
+    assert engine.next_wakeup() == START + 4 * DAY
+
+    clock.now = engine.next_wakeup()
+    assert engine.run_due() == 1
+    assert transport.sent[1]['In-Reply-To'] == first_id
+
+    clock.now = START + 10 * DAY
+    assert engine.run_due() == 1
+    assert status(engine, "owner@bakery.test") == (COMPLETED, 3, None)
+    assert engine.next_wakeup() is None
+
+
+def test_check_inbox_stops_on_reply_and_bounce_and_ignores_auto_replies(setup):
+    engine, transport, clock = setup
+    for name in ("replied", "threaded", "bounced", "away"):
+        engine.enroll(f"{name}@shop.test", name.title(), "bakery")
+    engine.run_due()
+    threaded_id = next(message['Message-ID'] for message in transport.sent if message['To'] == "threaded@shop.test")
+
+    clock.now += 60
+    transport.deliver(inbound("Replied <REPLIED@shop.test>"), received_at=clock.now)
+    # A reply from another address, matched by the message it answers
+    transport.deliver(inbound("colleague@shop.test", in_reply_to=threaded_id), received_at=clock.now)
+    transport.deliver(inbound("MAILER-DAEMON@mx.test", subject="Delivery Status Notification",
+                              X_Failed_Recipients="bounced@shop.test"), received_at=clock.now)
+    transport.deliver(inbound("away@shop.test", subject="Out of office", Auto_Submitted="auto-replied"),
+                      received_at=clock.now)
+
+    stopped = engine.check_inbox()
+    assert sorted(stopped[REPLIED]) == ["replied@shop.test", "threaded@shop.test"]
+    assert stopped[BOUNCED] == ["bounced@shop.test"]
+    assert status(engine, "away@shop.test")[0] == ACTIVE
+    assert engine.sender.suppression.check("bounced@shop.test") == BOUNCED
+
+    # Stopped sequences' queued follow-ups are dropped as stale
+    clock.now = START + 4 * DAY
+    assert engine.run_due() == 1
+    assert transport.sent[-1]['To'] == "away@shop.test"
+
+
+def test_replies_are_credited_to_the_experiment(setup):
+    engine, transport, clock = setup
+    experiment = SubjectExperiment.load()
+    experiment.record_send("owner@bakery.test", ["bakery:subject:question"])
+    experiment.save()
+    engine.enroll("owner@bakery.test", "Bakery", "bakery")
+    engine.run_due()
+
+    transport.deliver(inbound("owner@bakery.test"), received_at=clock.now)
+    assert engine.check_inbox()[REPLIED] == ["owner@bakery.test"]
+    arm = SubjectExperiment.load().arms["bakery:subject:question"]
+    assert (arm.sends, arm.replies) == (1, 1)
+
+
+def test_inbox_is_read_from_the_last_check_with_overlap(setup):
+    engine, transport, clock = setup
+    engine.enroll("owner@bakery.test", "Bakery", "bakery")
+    engine.run_due()
+    clock.now += 2 * DAY
+    engine.check_inbox()
+
+    # Too old to be read again; the next check starts an hour before the last one
+    transport.deliver(inbound("owner@bakery.test"), received_at=clock.now - 2 * 60 * 60)
+    assert engine.check_inbox()[REPLIED] == []
+    transport.deliver(inbound("owner@bakery.test"), received_at=clock.now - 30 * 60)
+    assert engine.check_inbox()[REPLIED] == ["owner@bakery.test"]
+
+
+def test_quota_error_defers_every_due_touch_without_using_attempts(setup):
+    engine, transport, clock = setup
+    for i in range(3):
+        engine.enroll(f"p{i}@shop.test", f"Shop {i}", "bakery")
+    transport.failures = [MailTransportError("550 5.4.5 Daily user sending limit exceeded")]
+
+    assert engine.run_due() == 0
+    retry_at = START + DAILY_LIMIT_DELAY
+    rows = engine.conn.execute("SELECT status, attempts, next_due FROM sequences").fetchall()
+    assert rows == [(ACTIVE, 0, retry_at)] * 3
+    assert engine.next_wakeup() == retry_at
+
+    clock.now = retry_at
+    assert engine.run_due() == 3
+
+
+def test_rate_limit_defers_for_a_minute(setup):
+    engine, transport, clock = setup
+    engine.enroll("owner@bakery.test", "Bakery", "bakery")
+    transport.failures = [MailTransportError("421 4.7.28 rate limit exceeded")]
+    engine.run_due()
+    assert status(engine, "owner@bakery.test") == (ACTIVE, 0, START + RATE_LIMIT_DELAY)
+
+
+def test_other_failures_retry_then_fail(setup):
+    engine, transport, clock = setup
+    engine.enroll("owner@bakery.test", "Bakery", "bakery")
+    transport.failures = [MailTransportError("550 5.1.1 No such user")] * MAX_SEND_ATTEMPTS
+
+    for _ in range(MAX_SEND_ATTEMPTS - 1):
+        engine.run_due()
+        assert status(engine, "owner@bakery.test") == (ACTIVE, 0, clock.now + RETRY_DELAY)
+        clock.now += RETRY_DELAY
+    engine.run_due()
+    assert status(engine, "owner@bakery.test") == (FAILED, 0, None)
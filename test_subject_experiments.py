@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Subject experiment tests: posterior updates, pending drafts, and concurrent writers
+"""
+
+import random
+
+import pytest
+
+from subject_experiments import Arm, SubjectExperiment
+
+VARIANTS = ["bakery:subject:question", "bakery:opening:mentions"]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "experiments.json")
+
+
+def test_reply_moves_the_posterior():
+    experiment = SubjectExperiment(seed=1)
+    experiment.record_send("a@example.com", VARIANTS)
+    experiment.record_send("b@example.com", VARIANTS[:1])
+    assert experiment.record_reply("a@example.com")
+    assert not experiment.record_reply("a@example.com")
+    assert not experiment.record_reply("stranger@example.com")
+
+    question = experiment.arms[VARIANTS[0]]
+    assert (question.sends, question.replies) == (2, 1)
+    assert question.reply_rate == pytest.approx(2 / 4)
+    assert experiment.arms[VARIANTS[1]].reply_rate == pytest.approx(2 / 3)
+
+
+def test_choose_favours_the_arm_that_gets_replies():
+    experiment = SubjectExperiment({"bakery:subject:a": Arm(200, 60), "bakery:subject:b": Arm(200, 2)}, seed=3)
+    picks = [experiment.choose("bakery:subject", ["a", "b"]) for _ in range(200)]
+    assert picks.count("bakery:subject:a") > 190
+
+
+def test_pending_draft_is_counted_only_once_sent(path):
+    experiment = SubjectExperiment.load(path)
+    experiment.assign("draft-1", "a@example.com", VARIANTS)
+    experiment.save(path)
+
+    experiment = SubjectExperiment.load(path)
+    assert VARIANTS[0] not in experiment.arms
+    # Replies before the draft went out credit nothing
+    assert not experiment.record_reply("a@example.com")
+    assert experiment.record_draft_sent("draft-1")
+    assert not experiment.record_draft_sent("draft-1")
+    experiment.save(path)
+
+    experiment = SubjectExperiment.load(path)
+    assert experiment.pending == {}
+    assert experiment.assignments["a@example.com"] == {"variants": VARIANTS, "replied": False}
+    assert experiment.record_reply("a@example.com")
+    experiment.save(path)
+
+    arm = SubjectExperiment.load(path).arms[VARIANTS[0]]
+    assert (arm.sends, arm.replies) == (1, 1)
+
+
+def test_concurrent_writers_keep_each_others_updates(path):
+    setup = SubjectExperiment.load(path)
+    for i in range(3):
+        setup.assign(f"draft-{i}", f"p{i}@example.com", VARIANTS)
+    setup.record_send("earlier@example.com", VARIANTS)
+    setup.save(path)
+
+    # The send path and the reply checker both load the same file...
+    sender = SubjectExperiment.load(path)
+    replies = SubjectExperiment.load(path)
+    for i in range(3):
+        sender.record_draft_sent(f"draft-{i}")
+    replies.record_reply("earlier@example.com")
+
+    # ...and save in either order without losing the other's counts
+    replies.save(path)
+    sender.save(path)
+
+    merged = SubjectExperiment.load(path)
+    arm = merged.arms[VARIANTS[0]]
+    assert (arm.sends, arm.replies) == (4, 1)
+    assert merged.pending == {}
+    assert merged.assignments["earlier@example.com"]["replied"]
+    # The saver picks up the other process's updates too
+    assert sender.assignments["earlier@example.com"]["replied"]
+
+
+def test_replayed_reply_is_not_credited_twice(path):
+    setup = SubjectExperiment.load(path)
+    setup.record_send("a@example.com", VARIANTS)
+    setup.save(path)
+
+    first = SubjectExperiment.load(path)
+    second = SubjectExperiment.load(path)
+    assert first.record_reply("a@example.com")
+    assert second.record_reply("a@example.com")
+    first.save(path)
+    second.save(path)
+
+    assert SubjectExperiment.load(path).arms[VARIANTS[0]].replies == 1
+
+
+def test_interleaved_saves_lose_nothing(path):
+    rng = random.Random(7)
+    writers = [SubjectExperiment.load(path) for _ in range(4)]
+    expected = 0
+    for step in range(200):
+        writer = rng.choice(writers)
+        writer.record_send(f"p{step}@example.com", VARIANTS[:1])
+        expected += 1
+        if rng.random() < 0.3:
+            writer.save(path)
+    for writer in writers:
+        writer.save(path)
+    assert SubjectExperiment.load(path).arms[VARIANTS[0]].sends == expected
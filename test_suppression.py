@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Suppression list tests: precedence between entries and cross-process refresh
+"""
+
+import time
+
+import pytest
+
+from suppression import BOUNCED, CONTACTED, UNSUBSCRIBED, SuppressionList
+
+
+@pytest.fixture
+def suppressions(tmp_path):
+    lists = []
+
+    def open_list():
+        suppression_list = SuppressionList(str(tmp_path / "suppression.db"))
+        lists.append(suppression_list)
+        return suppression_list
+
+    yield open_list
+    for suppression_list in lists:
+        suppression_list.close()
+
+
+def expiry(conn, entry):
+    return conn.execute("SELECT reason, expires_at FROM suppressions WHERE entry = ?", (entry,)).fetchone()
+
+
+def test_permanent_entry_survives_a_later_expiring_one(suppressions):
+    suppression_list = suppressions()
+    suppression_list.suppress("owner@example.com", BOUNCED)
+    suppression_list.suppress("owner@example.com", UNSUBSCRIBED, expires_at=time.time() + 3600)
+    suppression_list.record_contact(["owner@example.com"])
+
+    assert expiry(suppression_list.conn, "owner@example.com") == (BOUNCED, None)
+    assert suppression_list.check("owner@example.com", include_recent=False) == BOUNCED
+
+
+def test_expiring_unsubscribe_survives_record_contact(suppressions):
+    suppression_list = suppressions()
+    until = time.time() + 3600
+    suppression_list.suppress("owner@example.com", UNSUBSCRIBED, expires_at=until)
+    # The contact cooldown outlasts the unsubscribe, but must not replace it
+    suppression_list.record_contact(["owner@example.com"], days=30)
+
+    assert expiry(suppression_list.conn, "owner@example.com") == (UNSUBSCRIBED, until)
+    # Follow-ups ignore contact cooldowns, never unsubscribes
+    assert suppression_list.check("owner@example.com", include_recent=False) == UNSUBSCRIBED
+
+
+def test_contact_record_extends_an_earlier_contact_record(suppressions):
+    suppression_list = suppressions()
+    suppression_list.record_contact(["owner@example.com"], days=1)
+    suppression_list.record_contact(["owner@example.com"], days=30)
+
+    reason, expires_at = expiry(suppression_list.conn, "owner@example.com")
+    assert reason == CONTACTED and expires_at > time.time() + 29 * 24 * 60 * 60
+    assert suppression_list.check("owner@example.com") == CONTACTED
+    assert suppression_list.check("owner@example.com", include_recent=False) is None
+
+
+def test_other_connections_commits_are_picked_up(suppressions):
+    reader = suppressions()
+    writer = suppressions()
+    assert not reader.is_suppressed("owner@example.com")
+    version = reader._data_version
+
+    writer.suppress("owner@example.com", UNSUBSCRIBED)
+    writer.suppress("example.org", BOUNCED)
+
+    # Only the Bloom filter stands between the reader and SQLite, so these
+    # are found only if the other connection's commit was noticed
+    assert reader.check("owner@example.com") == UNSUBSCRIBED
+    assert reader.check("anyone@example.org") == BOUNCED
+    assert reader._data_version != version
+
+
+def test_own_commits_do_not_trigger_a_refresh(suppressions):
+    suppression_list = suppressions()
+    version = suppression_list._data_version
+    suppression_list.suppress("owner@example.com", UNSUBSCRIBED)
+    assert suppression_list.is_suppressed("owner@example.com")
+    assert suppression_list._data_version == version